@@ -1,14 +1,16 @@
 """论文分析Agent"""
 from autogen_core import MessageContext, RoutedAgent, TopicId, message_handler, type_subscription
 from autogen_core.models import ChatCompletionClient, SystemMessage, UserMessage
-from utils.message_types import SummaryData, AnalysisData
+from utils.message_types import SummaryData, AnalysisData, PaperFailure
+from utils.tracing import traced_handler
+from utils.failures import AbortableRun, reports_failures
 from knowledge_base.chroma_manager import ChromaManager
 from knowledge_base.embedding_service import EmbeddingService
 from loguru import logger
 
 
 @type_subscription(topic_type="AnalyzerAgent")
-class AnalyzerAgent(RoutedAgent):
+class AnalyzerAgent(AbortableRun, RoutedAgent):
     """分析Agent - 结合知识库进行深度分析"""
     
     def __init__(
@@ -34,14 +36,29 @@ class AnalyzerAgent(RoutedAgent):
         )
     
     @message_handler
+    @traced_handler
+    @reports_failures("analyze")
     async def handle_summary(self, message: SummaryData, ctx: MessageContext) -> None:
-        """处理摘要数据"""
+        """处理摘要数据（失败时通知协调器计入完成数）"""
+        if self.aborted:
+            return
+        try:
+            await self._analyze(message, ctx)
+        except Exception as e:
+            logger.exception(f"分析失败: {message.paper_id} - {e}")
+            await self.publish_message(
+                PaperFailure(paper_id=message.paper_id, title=message.title, stage="analyze", reason=str(e)[:200]),
+                topic_id=TopicId("CoordinatorAgent", source=self.id.key)
+            )
+
+    async def _analyze(self, message: SummaryData, ctx: MessageContext) -> None:
+        """检索相关文献、调用LLM分析、写入知识库并发布给评级Agent"""
         logger.info(f"分析论文: {message.title[:30]}...")
         
         # 检索相似论文
         query_text = f"{message.title} {message.summary.get('research_problem', '')}"
         query_embedding = self._embedding.encode_single(query_text)
-        similar_papers = self._chroma.retrieve_similar(query_embedding, n_results=3)
+        similar_papers = self._chroma.retrieve_similar(query_embedding, n_results=3, namespace=message.topic or None)
         
         # 构建上下文
         context = "相关文献：\n"
@@ -109,7 +126,7 @@ class AnalyzerAgent(RoutedAgent):
             ids=[f"{message.paper_id}-analysis"],
             embeddings=[embedding],
             documents=[doc_text],
-            metadatas=[{"title": message.title, "type": "analysis"}]
+            metadatas=[{"title": message.title, "type": "analysis", "topic": message.topic}]
         )
         
         # 发布到评级Agent
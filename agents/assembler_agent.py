@@ -2,52 +2,56 @@
 from autogen_core import MessageContext, RoutedAgent, TopicId, message_handler, type_subscription
 from autogen_core.models import ChatCompletionClient, SystemMessage, UserMessage
 from utils.message_types import SectionDraft, AssembleRequest, ReportData
+from utils.tracing import traced_handler
+from utils.failures import reports_failures
+from utils.draft_store import DraftStore, draft_store
+from utils.report_postprocess import build_glossary, join_sections, order_references, post_process_report, split_sections
+from config.settings import settings
 from loguru import logger
 from typing import Dict, List, Optional
-import re
+import asyncio
 
 
 @type_subscription(topic_type="AssemblerAgent")
 class AssemblerAgent(RoutedAgent):
     """装配Agent - 收集各章节草稿并统一合并与去重引用"""
 
-    def __init__(self, model_client: Optional[ChatCompletionClient] = None):
+    def __init__(self, model_client: Optional[ChatCompletionClient] = None, drafts: Optional[DraftStore] = None):
         super().__init__("装配Agent")
-        # 以 run_id 作为一次装配会话的键
-        self._drafts_by_run: Dict[str, Dict[str, SectionDraft]] = {}
+        # 以 run_id 作为一次装配会话的键；装配完成后移除（默认使用进程内共享的有界存储）
+        self._drafts = drafts if drafts is not None else draft_store
         self._model_client = model_client
 
     @message_handler
+    @traced_handler
     async def handle_section(self, message: SectionDraft, ctx: MessageContext) -> None:
         """收集单章草稿"""
-        run_store = self._drafts_by_run.setdefault(message.run_id, {})
-        run_store[message.section_id] = message
+        self._drafts.put(message)
         logger.info(f"收集章节草稿: run={message.run_id}, section={message.section_id}")
 
     @message_handler
+    @traced_handler
+    @reports_failures("assemble")
     async def handle_assemble(self, message: AssembleRequest, ctx: MessageContext) -> None:
         """根据给定章节顺序合并草稿，统一引用并发布最终报告"""
-        run_store = self._drafts_by_run.get(message.run_id, {})
-
         ordered_sections: List[str] = message.sections
         parts: List[str] = []
         citations: List[str] = []
 
-        for idx, sec in enumerate(ordered_sections):
-            draft = run_store.get(str(idx)) or run_store.get(sec)
-            if not draft:
-                logger.warning(f"缺少章节草稿: index={idx}, name={sec}")
-                continue
-            parts.append(f"## {sec}\n\n{draft.content}\n")
-            citations.extend(draft.citations)
-
-        # 引用去重，保持出现顺序
-        seen = set()
-        dedup_citations: List[str] = []
-        for c in citations:
-            if c not in seen:
-                seen.add(c)
-                dedup_citations.append(c)
+        run_store = self._drafts.pop(message.run_id)
+        try:
+            for idx, sec in enumerate(ordered_sections):
+                draft = run_store.get(str(idx)) or run_store.get(sec)
+                if not draft:
+                    logger.warning(f"缺少章节草稿: index={idx}, name={sec}")
+                    continue
+                parts.append(f"## {sec}\n\n{draft.get_content()}\n")
+                citations.extend(draft.citations)
+        finally:
+            run_store.close()
+
+        # 引用去重，按全局编号排序（各章正文中的 [n] 与参考文献编号一致）
+        dedup_citations = order_references(citations)
 
         draft_report = "\n".join(parts)
 
@@ -55,7 +59,7 @@ class AssemblerAgent(RoutedAgent):
         final_content = self._post_process_report(draft_report)
         
         # 若提供模型，做终稿润色
-        if self._model_client:
+        if self._model_client and settings.polish_mode != "off":
             try:
                 final_content = await self._polish_final_report(final_content, message.topic, ctx)
             except Exception as e:
@@ -68,71 +72,15 @@ class AssemblerAgent(RoutedAgent):
         logger.success("装配完成，已发布最终报告")
 
     def _post_process_report(self, raw: str) -> str:
-        """后处理报告：移除技术审校标记、AI衔接词、过度加粗、标准化格式"""
-        # 1. 移除技术审校章节标记
-        lines = raw.split("\n")
-        out_lines: List[str] = []
-        skip_block = False
-        for line in lines:
-            stripped = line.strip()
-            # 跳过技术审校标记行
-            if any(kw in stripped for kw in ["[章节修订稿]", "[章节核验后版本]", "技术审校结果", "修改后的章节", "主要修改说明", "修改要点", "主要调整"]):
-                skip_block = True
-                continue
-            # 遇到下一个二级标题，恢复正常
-            if line.startswith("##") and not any(kw in stripped for kw in ["修改", "审校"]):
-                skip_block = False
-            if not skip_block:
-                out_lines.append(line)
-        
-        text = "\n".join(out_lines)
-        
-        # 2. 移除 AI 常用机械衔接词（段首）
-        ai_transitions = [
-            r"^首先[，。、：]",
-            r"^其次[，。、：]", 
-            r"^再者[，。、：]",
-            r"^最后[，。、：]",
-            r"^总而言之[，。、：]",
-            r"^综上所述[，。、：]",
-            r"^值得注意的是[，。、：]",
-            r"^值得一提的是[，。、：]",
-            r"^需要指出的是[，。、：]",
-            r"^此外[，。、：]",
-            r"^另外[，。、：]",
-            r"^进一步地[，。、：]",
-            r"^与此同时[，。、：]",
-            r"^在此背景下[，。、：]",
-            r"^基于上述分析[，。、：]",
-            r"^具体而言[，。、：]",
-            r"^换言之[，。、：]",
-        ]
-        for pattern in ai_transitions:
-            text = re.sub(pattern, "", text, flags=re.MULTILINE)
-        
-        # 3. 减少过度加粗：每个自然段保留不超过 3 个加粗
-        paragraphs = text.split("\n\n")
-        cleaned_paragraphs = []
-        for para in paragraphs:
-            # 统计加粗数量
-            bold_matches = re.findall(r"\*\*(.+?)\*\*", para)
-            if len(bold_matches) > 3:
-                # 保留前 3 个，其余去掉加粗
-                for i, match in enumerate(bold_matches):
-                    if i >= 3:
-                        para = para.replace(f"**{match}**", match, 1)
-            cleaned_paragraphs.append(para)
-        text = "\n\n".join(cleaned_paragraphs)
-        
-        # 4. 清理重复空行
-        text = re.sub(r"\n{3,}", "\n\n", text)
-        
-        return text.strip()
+        """后处理报告：移除技术审校标记、AI衔接词、过度加粗、标准化格式（单遍扫描，见 utils.report_postprocess）"""
+        return post_process_report(raw)
 
     async def _polish_final_report(self, content: str, topic: str, ctx: MessageContext) -> str:
         """终稿润色：学术化、自然化、排版优化"""
         if not self._model_client:
             return content
+        if settings.polish_mode == "chunked":
+            return await self._polish_by_section(content, topic, ctx)
         
         prompt = f"""你是资深学术编审专家，正在对一份调研报告进行终稿润色。
 
@@ -212,6 +160,97 @@ class AssemblerAgent(RoutedAgent):
         except Exception:
             return content
 
+    async def _polish_by_section(self, content: str, topic: str, ctx: MessageContext) -> str:
+        """按章并行润色：每章附带相邻章节的衔接片段与共享术语表，失败的章节单独重试，最后按原顺序拼接"""
+        preamble, sections = split_sections(content)
+        if not sections:
+            return content
+        glossary = build_glossary(content, settings.polish_glossary_size)
+        n = settings.polish_context_chars
+        sem = asyncio.Semaphore(max(1, settings.polish_concurrency))
+
+        async def _one(idx: int) -> str:
+            heading, body = sections[idx]
+            if not body:
+                return body
+            prev_tail = sections[idx - 1][1][-n:] if idx > 0 and n > 0 else ""
+            next_head = sections[idx + 1][1][:n] if idx + 1 < len(sections) and n > 0 else ""
+            async with sem:
+                return await self._polish_section(heading, body, topic, glossary, prev_tail, next_head, ctx)
+
+        logger.info(f"按章润色: {len(sections)} 章，并发 {settings.polish_concurrency}，术语 {len(glossary)} 条")
+        bodies = await asyncio.gather(*(_one(i) for i in range(len(sections))))
+        return join_sections(preamble, [(heading, body) for (heading, _), body in zip(sections, bodies)])
+
+    async def _polish_section(
+        self,
+        heading: str,
+        body: str,
+        topic: str,
+        glossary: Dict[str, str],
+        prev_tail: str,
+        next_head: str,
+        ctx: MessageContext
+    ) -> str:
+        """润色单章正文（不含标题行）；重试用尽后返回原文"""
+        title = heading[3:].strip()
+        terms = "\n".join(f"- {zh}（{en}）" for en, zh in glossary.items()) or "（无）"
+        prompt = f"""你是资深学术编审专家，正在对调研报告中的一章进行终稿润色（各章并行润色，完成后按原顺序拼接）。
+
+【润色要求】
+1. 消除 AI 机械风格（"首先、其次、总之、值得注意的是"等），改用自然的学术表达
+2. 适度增加三级小标题（### ）划分小节，段落控制在 150-250 字，每段加粗不超过 2-3 个
+3. 保留所有引用标注 [编号]，不得删除、修改或添加；不得添加原文未提及的内容
+4. 术语写法与下方术语表保持一致，中英文混排时英文前后加空格
+5. 开头与结尾和相邻章节自然衔接，但不要复述相邻章节的内容
+6. 不要输出本章标题（## ），直接输出正文
+
+【报告主题】{topic}
+【本章标题】{title}
+
+【术语表】
+{terms}
+
+【上一章结尾（仅供衔接参考，不要输出）】
+{prev_tail or "（本章为第一章）"}
+
+【下一章开头（仅供衔接参考，不要输出）】
+{next_head or "（本章为最后一章）"}
+
+**原始章节**：
+{body}
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+请直接输出润色后的本章 Markdown 正文。"""
+
+        max_retries = max(1, settings.polish_max_retries)
+        for attempt in range(max_retries):
+            try:
+                result = await self._model_client.create(
+                    messages=[
+                        SystemMessage(content="你是专业学术编审，仅输出润色后的Markdown章节正文。"),
+                        UserMessage(content=prompt, source=self.id.key)
+                    ],
+                    cancellation_token=ctx.cancellation_token
+                )
+                polished = self._remove_think_tags(result.content) if isinstance(result.content, str) else ""
+                # 模型仍输出了标题行时去掉
+                first, _, rest = polished.partition("\n")
+                if first.lstrip("#").strip() == title:
+                    polished = rest.strip()
+                if getattr(result, "finish_reason", None) == "length":
+                    raise ValueError("输出达到长度上限被截断")
+                if len(polished) < len(body) * settings.polish_min_ratio:
+                    raise ValueError(f"润色结果过短（{len(polished)}/{len(body)} 字符）")
+                return polished
+            except Exception as e:
+                logger.warning(f"章节润色失败（尝试 {attempt + 1}/{max_retries}）: {title} - {e}")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(2 ** attempt)  # 指数退避
+        logger.warning(f"章节润色重试用尽，保留原文: {title}")
+        return body
+
     def _remove_think_tags(self, text: str) -> str:
         """移除 <think>...</think> 标签及其内部内容（用于 MiniMax-M2 等推理模型）"""
         import re
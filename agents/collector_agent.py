@@ -2,36 +2,56 @@
 from autogen_core import MessageContext, RoutedAgent, TopicId, message_handler, type_subscription
 from utils.message_types import PaperRequest, PaperData, ProcessingPlan
 from services.arxiv_service import ArxivService
+from utils.progress import progress_bus
+from utils.routing import shard_topic
+from utils.content_store import json_or_ref
+from utils.tracing import traced_handler
+from utils.failures import AbortableRun, reports_failures
 from loguru import logger
+import asyncio
 
 
 @type_subscription(topic_type="CollectorAgent")
-class CollectorAgent(RoutedAgent):
+class CollectorAgent(AbortableRun, RoutedAgent):
     """论文采集Agent"""
     
-    def __init__(self, arxiv_service: ArxivService):
+    def __init__(self, arxiv_service: ArxivService, summarizer_pool: int = 1):
         super().__init__("论文采集Agent")
         self.arxiv_service = arxiv_service
+        # 摘要Agent池大小（分布式模式下按论文分片到多个 worker）
+        self._summarizer_pool = summarizer_pool
     
     @message_handler
+    @traced_handler
+    @reports_failures("collect")
     async def handle_request(self, message: PaperRequest, ctx: MessageContext) -> None:
         """处理论文请求"""
         logger.info(f"开始采集论文: {message.keyword}")
         
-        # 搜索论文
-        papers = self.arxiv_service.search_papers(message.keyword, message.max_count)
+        # 搜索论文（放到线程中执行，避免阻塞事件循环与后台预热）
+        papers = await asyncio.to_thread(self.arxiv_service.search_papers, message.keyword, message.max_count)
+        if self.aborted:
+            logger.warning(f"运行已中止，丢弃采集结果: {message.keyword}")
+            return
         
+        progress_bus.emit(self.id.key, "collected", topic=message.keyword, count=len(papers))
+
         # 通知协调器本批次处理计划（总量与主题）
         await self.publish_message(
-            ProcessingPlan(topic=message.keyword, total_papers=len(papers)),
+            ProcessingPlan(topic=message.keyword, total_papers=len(papers), sections=message.sections),
             topic_id=TopicId("CoordinatorAgent", source=self.id.key)
         )
 
-        # 发布到摘要Agent
-        await self.publish_message(
-            PaperData(papers=papers),
-            topic_id=TopicId("SummarizerAgent", source=self.id.key)
-        )
+        # 发布到摘要Agent（池大小大于 1 时按论文 ID 分片）
+        shards = {}
+        for paper in papers:
+            shards.setdefault(shard_topic("SummarizerAgent", paper["id"], self._summarizer_pool), []).append(paper)
+        for topic_type, shard in shards.items():
+            inline, ref = json_or_ref(shard)
+            await self.publish_message(
+                PaperData(papers=inline or [], topic=message.keyword, papers_ref=ref),
+                topic_id=TopicId(topic_type, source=self.id.key)
+            )
         
         logger.success(f"论文采集完成，共 {len(papers)} 篇")
 
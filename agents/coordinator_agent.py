@@ -1,56 +1,237 @@
 """调度协调Agent"""
 from autogen_core import MessageContext, RoutedAgent, TopicId, message_handler, type_subscription
-from utils.message_types import ReportData, ProcessingPlan, GradeData, GradeBatchData
+from utils.message_types import (
+    AbortRun, AgentFailure, GradeBatchData, GradeData, PaperFailure, ProcessingPlan, ReportChunk, ReportData, StageDeadline
+)
+from utils.failures import PAPER_STAGES
+from utils.report_stream import ReportStream
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from config.settings import settings
+from utils.progress import progress_bus
+from utils.tracing import traced_handler, tracer, write_run_manifest
+import asyncio
 from loguru import logger
 
 
 @type_subscription(topic_type="CoordinatorAgent")
 class CoordinatorAgent(RoutedAgent):
-    """调度Agent - 统筹状态、汇总评级并保存报告"""
+    """调度Agent - 统筹状态、汇总评级并保存报告
+
+    按论文 ID 记录每篇论文的最终状态（通过/拒绝/失败），全部论文都有结论时触发撰写；
+    另有两个提前触发条件：收到处理计划后超过 coordinator_stage_timeout_s，
+    或通过数达到 coordinator_quorum（Writer 以已有论文先行撰写，迟到结果只计数不再纳入本次报告）。
+    阶段超时以 StageDeadline 消息经运行时投递给自身，与评级消息串行处理；
+    收到 AgentFailure（某阶段 Agent 构造失败或异常）时不再等待超时，能撰写则以现有评级撰写，否则中止。
+    收到 AbortRun（如服务模式任务超时）时直接中止，此后到达的报告不再保存。
+    """
     
-    def __init__(self):
+    def __init__(
+        self,
+        on_report: Optional[Callable[[str, Path], None]] = None,
+        on_abort: Optional[Callable[[str, str], None]] = None
+    ):
         super().__init__("调度Agent")
         self._topic: str | None = None
         self._total_papers: int = 0
+        self._sections: List[str] = []
         self._grades: list[GradeData] = []
+        # 论文 ID → approved/rejected/failed
+        self._outcomes: Dict[str, str] = {}
+        self._dispatched = False
+        self._aborted = False
+        self._deadline: Optional[asyncio.Task] = None
+        # 处理计划序号：过期计划的 StageDeadline 据此忽略
+        self._plan_seq = 0
+        # 报告保存后的回调（参数：运行键 source、报告路径），供批量/服务模式感知完成
+        self._on_report = on_report
+        # 无法生成报告时的回调（参数：运行键 source、原因）
+        self._on_abort = on_abort
+        # 流式报告：run_id → 正在写入的报告文件
+        self._streams: Dict[str, ReportStream] = {}
     
     @message_handler
+    @traced_handler
     async def handle_plan(self, message: ProcessingPlan, ctx: MessageContext) -> None:
-        """接收处理计划，记录主题与总量"""
+        """接收处理计划，记录主题与总量，并启动阶段超时计时"""
         self._topic = message.topic
         self._total_papers = message.total_papers
+        self._sections = message.sections
         self._grades = []
+        self._outcomes = {}
+        self._dispatched = False
+        self._aborted = False
+        self._plan_seq += 1
+        self._cancel_deadline()
         logger.info(f"接收处理计划：主题={self._topic}, 总量={self._total_papers}")
+
+        if self._total_papers == 0:
+            self._abort(f"未采集到论文: {self._topic}")
+            return
+
+        timeout = settings.coordinator_stage_timeout_s
+        if timeout and timeout > 0:
+            self._deadline = asyncio.create_task(self._deadline_after(timeout, self._plan_seq))
     
     @message_handler
+    @traced_handler
     async def handle_grade(self, message: GradeData, ctx: MessageContext) -> None:
-        """收集评级结果；当达到总量后触发撰写"""
-        self._grades.append(message)
-        logger.info(f"已收集评级 {len(self._grades)}/{self._total_papers}")
-        
-        if self._total_papers and len(self._grades) >= self._total_papers:
-            topic = self._topic or "未知主题"
-            logger.info("评级收集完成，触发撰写")
-            await self.publish_message(
-                GradeBatchData(topic=topic, grades=self._grades),
-                topic_id=TopicId("WriterAgent", source=self.id.key)
-            )
+        """收集评级结果（通过与拒绝都计入完成数）"""
+        if not self._record(message.paper_id, "approved" if message.approved else "rejected"):
+            return
+        if self._dispatched:
+            logger.info(f"已提前触发撰写，迟到评级不纳入本次报告: {message.paper_id}")
+        else:
+            self._grades.append(message)
+        await self._check_progress()
+
+    @message_handler
+    @traced_handler
+    async def handle_failure(self, message: PaperFailure, ctx: MessageContext) -> None:
+        """记录处理失败的论文，同样计入完成数"""
+        if not self._record(message.paper_id, "failed"):
+            return
+        logger.warning(f"论文处理失败（{message.stage}）: {message.paper_id} - {message.reason}")
+        await self._check_progress()
+
+    @message_handler
+    @traced_handler
+    async def handle_agent_failure(self, message: AgentFailure, ctx: MessageContext) -> None:
+        """某阶段 Agent 无法处理消息：论文级阶段且已有通过论文时以现有评级撰写，否则中止本次运行"""
+        logger.error(f"{message.agent_type} 故障（{message.stage}）: {message.reason}")
+        if self._aborted:
+            return
+        if message.stage in PAPER_STAGES:
+            if self._dispatched:
+                # 撰写已开始，迟到论文的故障不影响本次报告
+                return
+            if any(g.approved for g in self._grades):
+                self._cancel_deadline()
+                logger.warning(
+                    f"{message.agent_type} 无法继续处理，已完成 {len(self._outcomes)}/{self._total_papers}，以现有评级触发撰写"
+                )
+                await self._dispatch(partial=True)
+                return
+        self._abort(f"{message.agent_type} 故障（{message.stage}）: {message.reason}")
+
+    @message_handler
+    @traced_handler
+    async def handle_abort_run(self, message: AbortRun, ctx: MessageContext) -> None:
+        """外部中止本次运行（等待方已放弃，如任务超时）"""
+        if not self._aborted:
+            self._abort(f"运行被中止: {message.reason}")
+
+    def _abort(self, reason: str) -> None:
+        """无法生成报告：停止等待并通知等待方"""
+        logger.error(f"{reason}，不生成报告")
+        self._aborted = True
+        self._dispatched = True
+        self._cancel_deadline()
+        progress_bus.emit(self.id.key, "aborted", reason=reason)
+        self._release_run()
+        self._abort_streams()
+        # 中止的运行不会写运行清单，在此结束其追踪统计
+        tracer.end_run(self.id.key)
+        if self._on_abort:
+            self._on_abort(self.id.key, reason)
+
+    def _release_run(self) -> None:
+        """运行结束后释放评级（含分析正文）与论文结论：运行时按运行键保留 Agent 实例，批量/服务模式下不随主题数累积
+
+        _dispatched 保持为真，迟到的评级只记录日志，不会再次触发撰写。
+        """
+        self._grades = []
+        self._outcomes = {}
+
+    def _abort_streams(self) -> None:
+        """关闭未完成的流式报告文件（.part 文件保留供排查）"""
+        for run_id, stream in list(self._streams.items()):
+            stream.abort()
+            self._streams.pop(run_id, None)
+            logger.warning(f"流式报告未完成，已关闭: {stream.part_path}")
+
+    def _record(self, paper_id: str, outcome: str) -> bool:
+        """登记单篇论文的结论，重复消息返回 False"""
+        if paper_id in self._outcomes:
+            logger.warning(f"重复的论文结论，已忽略: {paper_id} ({outcome})")
+            return False
+        self._outcomes[paper_id] = outcome
+        return True
+
+    def _counts(self) -> Dict[str, int]:
+        counts = {"approved": 0, "rejected": 0, "failed": 0}
+        for outcome in self._outcomes.values():
+            counts[outcome] += 1
+        return counts
+
+    async def _check_progress(self) -> None:
+        counts = self._counts()
+        done = len(self._outcomes)
+        logger.info(
+            f"已完成论文 {done}/{self._total_papers}"
+            f"（通过 {counts['approved']}，拒绝 {counts['rejected']}，失败 {counts['failed']}）"
+        )
+        progress_bus.emit(self.id.key, "graded", graded=done, total=self._total_papers, **counts)
+
+        if self._total_papers and done >= self._total_papers:
+            self._cancel_deadline()
+            if not self._dispatched:
+                logger.info("全部论文已有结论，触发撰写")
+                await self._dispatch(partial=False)
+        elif settings.coordinator_quorum > 0 and counts["approved"] >= settings.coordinator_quorum and not self._dispatched:
+            logger.info(f"通过数达到法定数 {settings.coordinator_quorum}，提前触发撰写")
+            await self._dispatch(partial=True)
+
+    async def _deadline_after(self, timeout: float, plan_seq: int) -> None:
+        """阶段计时：到期后经运行时向自身发送 StageDeadline（不指定 sender，运行时才会投递回本 Agent）"""
+        await asyncio.sleep(timeout)
+        self._deadline = None
+        await self.runtime.publish_message(
+            StageDeadline(plan_seq=plan_seq, timeout_s=timeout),
+            topic_id=TopicId("CoordinatorAgent", source=self.id.key)
+        )
+
+    @message_handler
+    @traced_handler
+    async def handle_deadline(self, message: StageDeadline, ctx: MessageContext) -> None:
+        """阶段超时：以已收集的评级触发撰写（过期计划的超时消息忽略）"""
+        if message.plan_seq != self._plan_seq or self._dispatched:
+            return
+        logger.warning(
+            f"阶段超时（{message.timeout_s:.0f}s），已完成 {len(self._outcomes)}/{self._total_papers}，以现有评级触发撰写"
+        )
+        await self._dispatch(partial=True)
+
+    def _cancel_deadline(self) -> None:
+        if self._deadline is not None and not self._deadline.done():
+            self._deadline.cancel()
+        self._deadline = None
+
+    async def _dispatch(self, partial: bool) -> None:
+        self._dispatched = True
+        topic = self._topic or "未知主题"
+        progress_bus.emit(self.id.key, "writing", papers=len(self._grades), partial=partial)
+        await self.publish_message(
+            GradeBatchData(
+                topic=topic,
+                grades=list(self._grades),
+                sections=self._sections,
+                partial=partial,
+                expected=self._total_papers
+            ),
+            topic_id=TopicId("WriterAgent", source=self.id.key)
+        )
     
     @message_handler
+    @traced_handler
     async def handle_report(self, message: ReportData, ctx: MessageContext) -> None:
         """处理报告数据"""
+        if self._aborted:
+            logger.warning(f"运行已中止，丢弃报告: {message.topic}")
+            return
         logger.info("保存报告...")
-        
-        # 创建报告目录
-        report_dir = Path("./cache/reports")
-        report_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{message.topic}.md"
-        filepath = report_dir / filename
+        filepath = self._report_path(message.topic)
         
         # 写入报告
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -59,10 +240,54 @@ class CoordinatorAgent(RoutedAgent):
             for ref in message.references:
                 f.write(f"{ref}\n")
         
+        self._report_saved(filepath, message.topic, message.references)
+
+    @message_handler
+    @traced_handler
+    async def handle_report_chunk(self, message: ReportChunk, ctx: MessageContext) -> None:
+        """流式报告分片：首个分片到达时创建报告文件，按序追加，收到 final 分片后完成保存"""
+        if self._aborted:
+            # 运行已中止：迟到的分片不再重新打开报告文件
+            return
+        stream = self._streams.get(message.run_id)
+        if stream is None:
+            stream = self._streams[message.run_id] = ReportStream(self._report_path(message.topic))
+            logger.info(f"开始流式写入报告: {stream.part_path}")
+            progress_bus.emit(self.id.key, "report_streaming", path=str(stream.part_path))
+        if stream.add(message):
+            del self._streams[message.run_id]
+            self._report_saved(stream.path, message.topic, stream.references)
+
+    def _report_path(self, topic: str) -> Path:
+        # 创建报告目录
+        report_dir = Path("./cache/reports")
+        report_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 生成文件名
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return report_dir / f"{timestamp}_{topic}.md"
+
+    def _report_saved(self, filepath: Path, topic: str, references: List[str]) -> None:
+        """报告写入完成：输出提示、写运行清单并通知等待方"""
         logger.success(f"报告已保存: {filepath}")
         print(f"\n{'='*60}")
         print(f" 调研报告生成完成！")
         print(f" 报告路径: {filepath.absolute()}")
-        print(f" 参考文献: {len(message.references)} 篇")
+        print(f" 参考文献: {len(references)} 篇")
         print(f"{'='*60}\n")
 
+        # 运行清单：阶段耗时、token 用量与论文计数
+        manifest = write_run_manifest(
+            self.id.key, filepath,
+            topic=topic,
+            papers={"expected": self._total_papers, **self._counts()},
+            references=len(references),
+        )
+        logger.info(f"运行清单已保存: {manifest}")
+
+        progress_bus.emit(self.id.key, "report_saved", path=str(filepath), references=len(references))
+        self._release_run()
+
+        if self._on_report:
+            self._on_report(self.id.key, filepath)
+
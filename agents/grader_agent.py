@@ -1,20 +1,63 @@
 """论文评级Agent"""
+import asyncio
+import threading
 from autogen_core import MessageContext, RoutedAgent, TopicId, message_handler, type_subscription
-from utils.message_types import AnalysisData, GradeData
+from utils.message_types import AnalysisData, GradeData, PaperFailure
+from services.review_queue import review_queue
+from utils.progress import progress_bus
+from utils.content_store import text_or_ref
+from utils.tracing import traced_handler
+from utils.failures import AbortableRun, reports_failures
 from config.settings import settings
 from loguru import logger
 
+# 终端审核时串行化提示，避免多篇论文的提问交错
+_console_lock = threading.Lock()
+# 无人值守地进入审核队列时只提示一次
+_queue_notice_shown = False
+
+
+def _warn_unattended_queue() -> None:
+    global _queue_notice_shown
+    if _queue_notice_shown:
+        return
+    _queue_notice_shown = True
+    wait = f"{settings.review_timeout_s:.0f} 秒" if settings.review_timeout_s > 0 else "无限期"
+    logger.warning(
+        f"{'!' * 60}\n"
+        f"高风险论文进入审核队列（REVIEW_MODE={settings.review_mode}，当前非终端运行）：\n"
+        f"每篇最多等待 {wait}，无人作答时按 REVIEW_TIMEOUT_ACTION={settings.review_timeout_action} 处理。\n"
+        f"作答：python -m services.review_queue list/approve/reject，或 POST /reviews/<id>；\n"
+        f"完全无人值守请设置 REVIEW_MODE=auto_approve 或 auto_reject。\n"
+        f"{'!' * 60}"
+    )
+
+
+def _ask_console(title: str, risk_score: float, excerpt: str) -> bool:
+    with _console_lock:
+        print(f"\n{'='*60}")
+        print(f"论文: {title}")
+        print(f"风险评分: {risk_score}")
+        print(f"分析摘要: {excerpt}...")
+        print(f"{'='*60}")
+        response = input("是否批准继续? (yes/no): ").lower().strip()
+    return response in ['yes', 'y', '是']
+
 
 @type_subscription(topic_type="GraderAgent")
-class GraderAgent(RoutedAgent):
+class GraderAgent(AbortableRun, RoutedAgent):
     """评级Agent - 评分和人工审核"""
     
     def __init__(self):
         super().__init__("评级Agent")
     
     @message_handler
+    @traced_handler
+    @reports_failures("grade")
     async def handle_analysis(self, message: AnalysisData, ctx: MessageContext) -> None:
         """处理分析数据"""
+        if self.aborted:
+            return
         logger.info(f"评级论文: {message.title[:30]}...")
         
         # 计算风险评分（基于分析长度和关键概念数量）
@@ -28,33 +71,65 @@ class GraderAgent(RoutedAgent):
         
         approved = True
         
-        # 人工审核
+        # 人工审核（不阻塞运行时：等待期间其它论文照常处理）
         if risk_score >= settings.risk_threshold:
             logger.warning(f"检测到高风险内容 (评分: {risk_score})")
-            print(f"\n{'='*60}")
-            print(f"论文: {message.title}")
-            print(f"风险评分: {risk_score}")
-            print(f"分析摘要: {message.analysis[:200]}...")
-            print(f"{'='*60}")
-            
-            response = input("是否批准继续? (yes/no): ").lower().strip()
-            approved = response in ['yes', 'y', '是']
+            try:
+                approved = await self._review(message, risk_score)
+            except Exception as e:
+                logger.exception(f"审核失败: {message.paper_id} - {e}")
+                await self.publish_message(
+                    PaperFailure(paper_id=message.paper_id, title=message.title, stage="grade", reason=str(e)[:200]),
+                    topic_id=TopicId("CoordinatorAgent", source=self.id.key)
+                )
+                return
             
             if not approved:
-                logger.info("用户拒绝，跳过该论文")
-                return
+                logger.info("审核未通过，该论文不纳入报告")
         
-        # 发布到协调Agent（汇总后再触发撰写）
+        # 分析正文按配置内联或仅传内容引用（Writer 需要时再解析）
+        analysis, analysis_ref = text_or_ref(message.analysis)
+
+        # 发布到协调Agent（通过与拒绝都发送，供协调器完成计数；汇总后再触发撰写）
         await self.publish_message(
             GradeData(
                 paper_id=message.paper_id,
                 title=message.title,
                 risk_score=risk_score,
                 approved=approved,
-                analysis=message.analysis
+                analysis=analysis,
+                analysis_ref=analysis_ref
             ),
             topic_id=TopicId("CoordinatorAgent", source=self.id.key)
         )
         
         logger.success(f"评级完成: {message.paper_id} (评分: {risk_score})")
 
+    async def _review(self, message: AnalysisData, risk_score: float) -> bool:
+        """按 settings.review_mode 处理高风险论文，返回是否通过"""
+        mode = settings.effective_review_mode()
+        if mode == "auto_approve":
+            return True
+        if mode == "auto_reject":
+            return False
+        excerpt = message.analysis[:200]
+        if mode == "interactive":
+            # input() 放到线程中执行，事件循环不被冻结
+            return await asyncio.to_thread(_ask_console, message.title, risk_score, excerpt)
+
+        if settings.review_mode == "auto":
+            _warn_unattended_queue()
+        review_id = review_queue.submit(self.id.key, message.paper_id, message.title, risk_score, excerpt)
+        logger.warning(
+            f"已加入审核队列 #{review_id}: {message.title[:30]}... "
+            f"（python -m services.review_queue approve/reject {review_id}）"
+        )
+        progress_bus.emit(self.id.key, "review_pending", review_id=review_id, paper_id=message.paper_id, title=message.title)
+        approved = await review_queue.wait(
+            review_id,
+            timeout=settings.review_timeout_s,
+            timeout_action=settings.review_timeout_action,
+            poll_interval=settings.review_poll_interval_s
+        )
+        logger.info(f"审核结果 #{review_id}: {'通过' if approved else '拒绝'}")
+        return approved
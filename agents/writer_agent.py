@@ -8,20 +8,34 @@ from autogen_core.models import (
     FunctionExecutionResult,
     FunctionExecutionResultMessage,
 )
-from utils.message_types import GradeData, ReportData, GradeBatchData, SectionDraft, AssembleRequest
+from utils.progress import progress_bus
+from utils.content_store import text_or_ref
+from utils.message_types import GradeData, ReportData, GradeBatchData, SectionDraft, AssembleRequest, ReportChunk
+from utils.report_stream import ReportChunkPublisher
+from utils.section_cache import fingerprint, section_cache, snippet_digest
+from utils.tracing import traced_handler
+from utils.failures import AbortableRun, reports_failures
+from utils.cassette import cassette
 from config.settings import settings
-from knowledge_base.chroma_manager import ChromaManager
+from knowledge_base.chroma_manager import ChromaManager, RetrievalRequest
 from knowledge_base.embedding_service import EmbeddingService
+from knowledge_base.context_packer import ContextPacker, ContextSnippet, assign_papers, group_papers, snippets_from_results
 from datetime import datetime
 import uuid
 from loguru import logger
-from typing import List
+from typing import List, Optional
 import json
+import hashlib
 import importlib
+import asyncio
+import time
+
+# 章节/审校/规划提示词版本：修改提示词模板或审校流程时递增，使章节复用缓存失效
+SECTION_PROMPT_VERSION = 2
 
 
 @type_subscription(topic_type="WriterAgent")
-class WriterAgent(RoutedAgent):
+class WriterAgent(AbortableRun, RoutedAgent):
     """撰写Agent - 生成调研报告"""
     
     def __init__(self, model_client: ChatCompletionClient, topic: str, chroma_manager: ChromaManager, embedding_service: EmbeddingService):
@@ -31,6 +45,18 @@ class WriterAgent(RoutedAgent):
         self._chroma = chroma_manager
         self._embedding = embedding_service
         self._approved_papers: List[GradeData] = []
+        self._sections: List[str] = list(settings.section_outline)
+        self._paper_snippets: List[ContextSnippet] = []
+        self._reused_sections = 0
+        self._packer = ContextPacker(
+            model_name=settings.model_name,
+            budget_tokens=settings.context_budget_for(settings.model_name),
+            snippet_tokens=settings.section_context_snippet_tokens,
+            mmr_lambda=settings.section_context_mmr_lambda,
+            dedup_threshold=settings.section_context_dedup_threshold,
+            # 核心论文片段携带全局引用编号，与知识库中的分析副本近重复时保留前者
+            preferred_sources=("paper",),
+        )
         self._system_message = SystemMessage(
             content="""你是科研报告撰写专家。请严格按照以下目录结构撰写面向研究者的调研报告：
 
@@ -165,33 +191,63 @@ class WriterAgent(RoutedAgent):
 请直接开始撰写章节正文，体现专业性、可读性与学术价值的统一。
 """
         )
+
+        # 分层 map-reduce 报告的中间综述提示
+        self._digest_message = SystemMessage(
+            content="你是文献综述助手。请将给定的论文分析或下级综述归纳为一份结构化的中间综述："
+                    "按研究问题、方法与结论归类，合并相近工作并指出差异，保留方括号文献编号（如 [3]），"
+                    "不要编造未给出的文献，不要输出与材料无关的内容。"
+        )
     
     @message_handler
+    @traced_handler
+    @reports_failures("write")
     async def handle_batch(self, message: GradeBatchData, ctx: MessageContext) -> None:
         """接收汇总评级后一次性生成报告"""
+        if self.aborted:
+            return
         self._topic = message.topic
+        self._sections = list(message.sections or settings.section_outline)
         self._approved_papers = [g for g in message.grades if g.approved]
         logger.info(f"收到汇总评级，共 {len(message.grades)} 篇，其中通过 {len(self._approved_papers)} 篇")
+        if message.partial:
+            logger.warning(f"提前触发撰写：计划 {message.expected} 篇，仅 {len(message.grades)} 篇已完成评级")
         
         if len(self._approved_papers) < settings.min_papers_for_report:
             logger.warning(
                 f"通过数量低于阈值({settings.min_papers_for_report})，仍将生成报告"
             )
         
-        if settings.writer_use_section_flow:
-            await self._generate_by_sections(ctx)
-        else:
-            await self._generate_report(ctx)
+        try:
+            if settings.writer_use_section_flow:
+                await self._generate_by_sections(ctx)
+            else:
+                await self._generate_report(ctx)
+        finally:
+            self._release_run()
+
+    def _release_run(self) -> None:
+        """释放本次运行的论文与片段（含向量）：运行时按运行键保留 Agent 实例，批量/服务模式下不随主题数累积"""
+        self._approved_papers = []
+        self._paper_snippets = []
 
     async def _generate_by_sections(self, ctx: MessageContext) -> None:
-        """按章节循环撰写并将每章入库，最后合并生成报告"""
-        run_id = datetime.now().strftime("%Y%m%d_%H%M%S") + "-" + uuid.uuid4().hex[:6]
-        sections = list(settings.section_outline)
-        section_texts: List[str] = []
+        """按章节循环撰写并将每章入库，最后合并生成报告（流式模式下逐章直接写入报告文件）"""
+        run_id = self._new_run_id()
+        sections = list(self._sections)
+        self._paper_snippets = self._build_paper_snippets()
+        prepared = await self._prepare_section_queries(sections, ctx)
+        self._reused_sections = 0
+        chunks = self._chunk_publisher(run_id) if settings.report_streaming else None
+        if chunks is not None:
+            await chunks.begin(f"# {self._topic}领域调研报告\n\n")
 
         for idx, section in enumerate(sections):
-            section_content = await self._generate_single_section(section, run_id, idx, ctx)
-            section_texts.append(f"## {section}\n\n{section_content}\n")
+            if self.aborted:
+                logger.warning(f"运行已中止，停止撰写（已完成 {idx}/{len(sections)} 章）")
+                return
+            section_content = await self._generate_single_section(section, run_id, idx, prepared[idx], ctx, chunks)
+            progress_bus.emit(self.id.key, "section_done", index=idx + 1, total=len(sections), section=section)
             
             # 入库当前章节
             try:
@@ -200,11 +256,32 @@ class WriterAgent(RoutedAgent):
                     ids=[f"section-{run_id}-{idx}"],
                     embeddings=[emb],
                     documents=[section_content],
-                    metadatas=[{"type": "section", "run_id": run_id, "section": section}]
+                    metadatas=[{"type": "section", "run_id": run_id, "section": section, "topic": self._topic, "created_at": time.time()}]
                 )
             except Exception as e:
                 logger.warning(f"章节入库失败: {section} - {e}")
 
+        # 全部章节写完后按保留策略清理章节向量（仅同一次运行内的前文检索需要它们）
+        policy = settings.section_retention_policy if settings.section_db_persist else "drop_on_finish"
+        try:
+            self._chroma.apply_section_retention(
+                policy,
+                current_run_id=run_id,
+                keep_runs=settings.section_retention_runs,
+                ttl_hours=settings.section_retention_ttl_hours,
+            )
+        except Exception as e:
+            logger.warning(f"章节向量清理失败: {e}")
+
+        if settings.writer_incremental:
+            logger.info(f"增量生成：复用 {self._reused_sections}/{len(sections)} 章，其余章节重新生成")
+
+        if chunks is not None:
+            # 流式模式：各章已在生成时写入报告文件，结束报告（不做整篇终稿润色）
+            await chunks.close()
+            logger.success("流式报告已全部提交")
+            return
+
         # 发布装配请求，由 AssemblerAgent 统一合并与引用去重
         await self.publish_message(
             AssembleRequest(topic=self._topic, run_id=run_id, sections=sections),
@@ -212,36 +289,105 @@ class WriterAgent(RoutedAgent):
         )
         logger.success("分章草稿已提交装配")
 
-    async def _generate_single_section(self, section: str, run_id: str, idx: int, ctx: MessageContext) -> str:
-        """生成单个章节内容，检索前文章节与知识库"""
-        # 构造检索查询
+    async def _prepare_section_queries(self, sections: List[str], ctx: MessageContext) -> List[dict]:
+        """运行开始时预计算所有章节的检索：并发规划 → 批量编码 → 批量检索摘要与分析 → 按章分配论文"""
         # 先做“章节前置规划”：从前文节选与论文分析中，提取关键词与所需文献类型
-        plan = await self._plan_section_sources(section, ctx)
-        keywords = ", ".join(plan.get("keywords", [])) if isinstance(plan, dict) else ""
-        query_text = f"{self._topic} {section} {keywords}".strip()
-        query_embedding = self._embedding.encode_single(query_text)
-
-        # 检索前文章节（同一次run）
-        prev_docs = self._chroma.retrieve_similar(query_embedding, n_results=settings.section_rag_top_k, where={"run_id": run_id})
-
-        # 检索知识库摘要与分析
-        kb_sum = self._chroma.retrieve_similar(query_embedding, n_results=settings.section_rag_top_k, where={"type": "summary"})
-        kb_ana = self._chroma.retrieve_similar(query_embedding, n_results=settings.section_rag_top_k, where={"type": "analysis"})
+        plans = await asyncio.gather(*(self._plan_section_sources(sec, ctx) for sec in sections))
+        query_texts = []
+        for section, plan in zip(sections, plans):
+            keywords = ", ".join(plan.get("keywords", [])) if isinstance(plan, dict) else ""
+            query_texts.append(f"{self._topic} {section} {keywords}".strip())
+        query_embeddings = self._embedding.encode(query_texts)
+
+        # 摘要/分析两类过滤各一次 Chroma 查询
+        k = settings.section_rag_top_k
+        requests = [RetrievalRequest(q, k, {"type": "summary"}, self._topic) for q in query_embeddings]
+        requests += [RetrievalRequest(q, k, {"type": "analysis"}, self._topic) for q in query_embeddings]
+        results = self._chroma.retrieve_batch(requests, include_embeddings=True)
+        n = len(sections)
+
+        # 已批准论文按与各章查询的相似度分配，每章只以本章论文作为核心论文候选与引用来源
+        papers = assign_papers(query_embeddings, self._paper_snippets, settings.section_papers_per_section)
+        if settings.section_papers_per_section > 0 and self._paper_snippets:
+            logger.info("论文分章分配：" + "，".join(f"{sec} {len(ps)} 篇" for sec, ps in zip(sections, papers)))
+        return [
+            {"query_embedding": query_embeddings[i], "kb_sum": results[i], "kb_ana": results[n + i], "papers": papers[i]}
+            for i in range(n)
+        ]
+
+    def _new_run_id(self) -> str:
+        return datetime.now().strftime("%Y%m%d_%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+    def _chunk_publisher(self, run_id: str) -> ReportChunkPublisher:
+        """流式报告分片发布器（分片发给 CoordinatorAgent 追加写入报告文件）"""
+        async def _publish(chunk: ReportChunk) -> None:
+            await self.publish_message(chunk, topic_id=TopicId("CoordinatorAgent", source=self.id.key))
+        return ReportChunkPublisher(_publish, self._topic, run_id, settings.report_stream_chunk_chars)
+
+    async def _stream_text(self, messages: list, ctx: MessageContext, chunks: Optional[ReportChunkPublisher] = None) -> str:
+        """以 create_stream 生成文本，提供 chunks 时边生成边转发；返回去除思考块后的全文"""
+        parts: List[str] = []
+        final = None
+        async for item in self._model_client.create_stream(messages=messages, cancellation_token=ctx.cancellation_token):
+            if isinstance(item, str):
+                parts.append(item)
+                if chunks is not None:
+                    await chunks.write(item)
+            else:
+                final = item
+        text = "".join(parts)
+        if not text and final is not None and isinstance(final.content, str):
+            # 部分兼容服务只在最终结果中返回内容
+            text = final.content
+            if chunks is not None:
+                await chunks.write(text)
+        return self._remove_think_tags(text)
+
+    async def _generate_single_section(
+        self,
+        section: str,
+        run_id: str,
+        idx: int,
+        prepared: dict,
+        ctx: MessageContext,
+        chunks: Optional[ReportChunkPublisher] = None
+    ) -> str:
+        """生成单个章节内容，检索前文章节与知识库
+
+        chunks 非空时为流式模式：草稿与审校均用 create_stream，审校输出边生成边写入报告，不再发布 SectionDraft。
+        """
+        query_embedding = prepared["query_embedding"]
+        kb_sum = prepared["kb_sum"]
+        kb_ana = prepared["kb_ana"]
+
+        # 检索前文章节（同一次run，需在前文写完后实时检索；首章无前文）
+        prev_docs: dict = {}
+        if idx > 0:
+            prev_docs = self._chroma.retrieve_similar(query_embedding, n_results=settings.section_rag_top_k, where={"$and": [{"type": "section"}, {"run_id": run_id}]}, include_embeddings=True, namespace=self._topic)
+
+        # 合并候选 → 去重 → MMR 排序 → 按模型 token 预算装填
+        candidates = (
+            snippets_from_results(prev_docs, "prev")
+            + snippets_from_results(kb_sum, "summary")
+            + snippets_from_results(kb_ana, "analysis")
+            + prepared["papers"]
+        )
+        packed = self._packer.pack(query_embedding, candidates)
+        grouped: dict = {"prev": [], "summary": [], "analysis": [], "paper": []}
+        for snip in packed:
+            grouped[snip.source].append(snip)
 
-        def _concat_docs(res: dict) -> str:
-            docs = res.get("documents", [[]])
-            lines = []
-            for i, d in enumerate(docs[0][: settings.section_rag_top_k] if docs and docs[0] else []):
-                lines.append(f"- 片段{i+1}: {d[:300]}...")
-            return "\n".join(lines)
+        def _concat_docs(snips: List[ContextSnippet]) -> str:
+            return "\n".join(f"- 片段{i+1}: {s.text}" for i, s in enumerate(snips))
 
-        context_prev = _concat_docs(prev_docs)
-        context_sum = _concat_docs(kb_sum)
-        context_ana = _concat_docs(kb_ana)
+        context_prev = _concat_docs(grouped["prev"])
+        context_sum = _concat_docs(grouped["summary"])
+        context_ana = _concat_docs(grouped["analysis"])
 
         # 构建提示词
+        # 论文使用全局编号（在 _approved_papers 中的序号），各章的 [n] 指向同一篇论文并与参考文献一致
         papers_summary = "\n\n".join([
-            f"论文{i+1}: {p.title}\n分析：{p.analysis[:300]}..." for i, p in enumerate(self._approved_papers[: settings.section_rag_top_k])
+            f"[{s.meta.get('ref', '')}] {s.meta.get('title', '')}\n分析：{s.text}" for s in grouped["paper"]
         ])
 
         prompt = f"""━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -267,7 +413,7 @@ class WriterAgent(RoutedAgent):
 {context_ana if context_ana.strip() else '（暂无相关分析）'}
 
 **4. 核心论文详细分析**
-{papers_summary}
+{papers_summary if papers_summary.strip() else '（暂无核心论文分析）'}
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 【撰写指南】
@@ -280,7 +426,7 @@ class WriterAgent(RoutedAgent):
 4. 用列表罗列要点（如挑战、特性、方向）
 
 **引用规范**：
-- 所有论点必须引用上述论文，使用 [编号] 标注
+- 所有论点必须引用上述论文，使用论文前方括号中的编号标注（如 [3]），不要自行重新编号
 - 引用要分散，避免单篇论文过度引用
 - 给出具体数据（如"准确率 85%"、"延迟降低 40%"）
 
@@ -301,8 +447,41 @@ class WriterAgent(RoutedAgent):
 请直接开始撰写"{section}"章节的正文内容（不要输出章节标题）：
 """
 
-        # ReAct 工具循环：如启用 MCP，则允许模型发起工具调用
         messages = [self._section_message, UserMessage(content=prompt, source=self.id.key)]
+
+        # 引用列表：本章装入上下文的论文，“[全局编号] 标题”（与提示中的论文编号一致）
+        citations = [f"[{s.meta.get('ref', '')}] {s.meta.get('title', '')}" for s in grouped["paper"]]
+
+        # 增量生成：输入指纹未变化时直接复用上次的审校后正文
+        section_key = ""
+        if settings.writer_incremental:
+            section_key = fingerprint(
+                kind="section",
+                version=SECTION_PROMPT_VERSION,
+                model=settings.model_name,
+                topic=self._topic,
+                section=section,
+                index=idx,
+                mcp=settings.writer_use_mcp_tools,
+                prompt=hashlib.sha256((self._section_message.content + prompt).encode("utf-8")).hexdigest(),
+                snippets=[snippet_digest(s) for s in packed],
+                papers=sorted(s.id for s in grouped["paper"]),
+            )
+            cached = section_cache.get(section_key)
+            if cached is not None:
+                logger.info(f"章节输入未变化，复用上次结果: {section} ({section_key[:12]})")
+                self._reused_sections += 1
+                progress_bus.emit(self.id.key, "section_reused", index=idx + 1, section=section)
+                if chunks is not None:
+                    await chunks.begin(f"## {section}\n\n")
+                    await chunks.write(cached["content"])
+                    await chunks.end()
+                    chunks.citations.extend(cached["citations"])
+                else:
+                    await self._publish_draft(run_id, idx, cached["content"], cached["citations"])
+                return cached["content"]
+
+        # ReAct 工具循环：如启用 MCP，则允许模型发起工具调用
         content: str = ""
         if settings.writer_use_mcp_tools:
             logger.info(f" MCP工具模式已启用，开始加载 MCP 服务器...")
@@ -335,7 +514,7 @@ class WriterAgent(RoutedAgent):
                     
                     # 加载该服务器的工具
                     logger.info(f" 正在加载 MCP 服务器: {sd.get('name', 'unknown')} (command={params.command})")
-                    server_tools = await mcp_server_tools(params)
+                    server_tools = await cassette.load_tools(sd.get('name', 'unknown'), lambda: mcp_server_tools(params))
                     tools.extend(server_tools)
                     logger.success(f" ✓ {sd.get('name', 'unknown')} 加载完成，工具数: {len(server_tools)}")
                 
@@ -378,7 +557,7 @@ class WriterAgent(RoutedAgent):
                             if tool.name == call.name:
                                 try:
                                     # 直接调用工具的 run_json 方法
-                                    tool_result = await tool.run_json(args, ctx.cancellation_token)
+                                    tool_result = await cassette.run_tool(tool, args, ctx.cancellation_token)
                                     logger.success(f" {call.name} 执行成功")
                                     break
                                 except Exception as e:
@@ -422,6 +601,8 @@ class WriterAgent(RoutedAgent):
                     cancellation_token=ctx.cancellation_token,
                 )
                 content = self._remove_think_tags(result.content) if isinstance(result.content, str) else ""
+        elif chunks is not None:
+            content = await self._stream_text(messages, ctx)
         else:
             result = await self._model_client.create(
                 messages=messages,
@@ -436,28 +617,60 @@ class WriterAgent(RoutedAgent):
             "- 不要添加新的引用或虚构事实；- 保持段落结构与中文风格。\n\n"
             f"[章节草稿]\n{content}\n"
         )
-        revise = await self._model_client.create(
-            messages=[SystemMessage(content="你是严谨的技术编辑。"), UserMessage(content=revise_prompt, source=self.id.key)],
-            cancellation_token=ctx.cancellation_token,
-        )
-        content = self._remove_think_tags(revise.content) if isinstance(revise.content, str) else content
+        revise_messages = [SystemMessage(content="你是严谨的技术编辑。"), UserMessage(content=revise_prompt, source=self.id.key)]
+
+        if chunks is not None:
+            await chunks.begin(f"## {section}\n\n")
+            revised = await self._stream_text(revise_messages, ctx, chunks)
+            if not revised:
+                # 审校无输出时写入草稿
+                await chunks.write(content)
+            await chunks.end()
+            chunks.citations.extend(citations)
+            content = revised or content
+        else:
+            revise = await self._model_client.create(
+                messages=revise_messages,
+                cancellation_token=ctx.cancellation_token,
+            )
+            content = self._remove_think_tags(revise.content) if isinstance(revise.content, str) else content
+            await self._publish_draft(run_id, idx, content, citations)
 
-        # 生成简单引用列表：使用已批准论文标题作为引用键（后续可替换为更规范的元数据）
-        citations = [p.title for p in self._approved_papers[: settings.section_rag_top_k]]
+        if section_key and content:
+            section_cache.put(section_key, {"section": section, "topic": self._topic, "content": content, "citations": citations})
+        return content
 
-        # 发布当前章节草稿给 AssemblerAgent
+    async def _publish_draft(self, run_id: str, idx: int, content: str, citations: List[str]) -> None:
+        """发布章节草稿给 AssemblerAgent（按配置内联正文或仅传内容引用）"""
+        inline, ref = text_or_ref(content)
         await self.publish_message(
             SectionDraft(
                 topic=self._topic,
                 run_id=run_id,
                 section_id=str(idx),
-                content=content,
+                content=inline,
                 citations=citations,
+                content_ref=ref,
             ),
             topic_id=TopicId("AssemblerAgent", source=self.id.key),
         )
 
-        return content
+    def _build_paper_snippets(self) -> List[ContextSnippet]:
+        """将已批准论文的分析批量编码为候选片段（每次运行仅编码一次）"""
+        papers = self._approved_papers
+        if not papers:
+            return []
+        analyses = [p.get_analysis() for p in papers]
+        texts = [f"{p.title}\n{a}" for p, a in zip(papers, analyses)]
+        try:
+            embs = self._embedding.encode(texts)
+        except Exception as e:
+            logger.warning(f"论文分析编码失败，将不参与向量去重: {e}")
+            embs = [None] * len(papers)
+        return [
+            ContextSnippet(id=p.paper_id, text=a, source="paper", embedding=emb, meta={"title": p.title, "ref": i + 1})
+            for i, (p, a, emb) in enumerate(zip(papers, analyses, embs))
+        ]
 
     async def _plan_section_sources(self, section: str, ctx: MessageContext) -> dict:
         """前置规划：基于前文节选与论文分析，提取关键词/需要的文献类型（JSON）"""
@@ -465,14 +678,23 @@ class WriterAgent(RoutedAgent):
             "请根据已完成的章节节选与论文分析，给出本章节所需的核心主题关键词与文献类型，"
             "仅输出JSON对象，键：keywords(list[str])、doc_types(list[str])。"
         )
+        plan_key = ""
+        if settings.writer_incremental:
+            plan_key = fingerprint(kind="plan", version=SECTION_PROMPT_VERSION, model=settings.model_name, section=section, prompt=plan_prompt)
+            cached = section_cache.get(plan_key)
+            if cached is not None:
+                return cached["plan"]
         try:
             res = await self._model_client.create(
                 messages=[SystemMessage(content="仅输出JSON，不要额外文字。"), UserMessage(content=plan_prompt, source=self.id.key)],
                 cancellation_token=ctx.cancellation_token,
             )
-            return json.loads(res.content) if isinstance(res.content, str) else {}
+            plan = json.loads(res.content) if isinstance(res.content, str) else {}
         except Exception:
             return {}
+        if plan_key and isinstance(plan, dict) and plan:
+            section_cache.put(plan_key, {"section": section, "plan": plan})
+        return plan
 
     def _remove_think_tags(self, text: str) -> str:
         """移除 <think>...</think> 标签及其内部内容（用于推理模型）"""
@@ -492,30 +714,86 @@ class WriterAgent(RoutedAgent):
         except Exception:
             return []
     
+    async def _map_reduce_digest(self, ctx: MessageContext) -> str:
+        """map：相似论文分组并发生成中间综述；reduce：按 fan-in 逐层归并，直到不超过 fan-in 份"""
+        snippets = self._build_paper_snippets()
+        groups = group_papers(snippets, settings.report_mapreduce_batch)
+        fan_in = max(2, settings.report_mapreduce_fan_in)
+        limit = settings.report_mapreduce_digest_chars
+        semaphore = asyncio.Semaphore(max(1, settings.report_mapreduce_concurrency))
+
+        async def _digest(instruction: str, material: str) -> str:
+            async with semaphore:
+                try:
+                    result = await self._model_client.create(
+                        messages=[
+                            self._digest_message,
+                            UserMessage(content=f"研究主题：{self._topic}\n\n{instruction}\n\n{material}", source=self.id.key),
+                        ],
+                        cancellation_token=ctx.cancellation_token,
+                    )
+                    text = self._remove_think_tags(result.content) if isinstance(result.content, str) else ""
+                except Exception as e:
+                    logger.warning(f"中间综述生成失败，以原始材料截断代替: {e}")
+                    text = ""
+            return (text.strip() or material)[:limit]
+
+        # 论文编号与参考文献列表一致（按 _approved_papers 顺序）
+        materials = [
+            "\n\n".join(f"[{i + 1}] {snippets[i].meta.get('title', '')}\n分析：{snippets[i].text[:300]}" for i in group)
+            for group in groups
+        ]
+        level = list(await asyncio.gather(*(_digest("请综述以下论文：", m) for m in materials)))
+        logger.info(f"map 阶段完成：{len(snippets)} 篇论文 → {len(level)} 份中间综述")
+        depth = 0
+        while len(level) > fan_in:
+            depth += 1
+            batches = [level[i:i + fan_in] for i in range(0, len(level), fan_in)]
+            level = list(await asyncio.gather(*(
+                _digest("请将以下中间综述归并为一份综述：", "\n\n---\n\n".join(batch)) for batch in batches
+            )))
+            logger.info(f"reduce 第 {depth} 层完成：剩余 {len(level)} 份综述")
+        progress_bus.emit(self.id.key, "report_digested", papers=len(snippets), groups=len(groups), depth=depth)
+        return "\n\n---\n\n".join(level)
+
     async def _generate_report(self, ctx: MessageContext):
         """生成报告"""
         logger.info(f"生成报告，共 {len(self._approved_papers)} 篇论文")
         
-        # 构建提示词
-        papers_summary = "\n\n".join([
-            f"论文{i+1}: {p.title}\n分析：{p.analysis[:300]}..."
-            for i, p in enumerate(self._approved_papers)
-        ])
+        # 构建提示词（论文较多时先分组综述再逐层归并，控制单次提示词长度）
+        threshold = settings.report_mapreduce_threshold
+        if threshold > 0 and len(self._approved_papers) > threshold:
+            digest = await self._map_reduce_digest(ctx)
+            prompt = (
+                f"研究主题：{self._topic}\n\n分组文献综述（方括号编号对应参考文献）：\n{digest}\n\n"
+                "请基于以上综述生成调研报告，引用时保留方括号编号。"
+            )
+        else:
+            papers_summary = "\n\n".join([
+                f"论文{i+1}: {p.title}\n分析：{p.get_analysis()[:300]}..."
+                for i, p in enumerate(self._approved_papers)
+            ])
+            prompt = f"研究主题：{self._topic}\n\n论文分析：\n{papers_summary}\n\n请生成调研报告。"
+        messages = [self._system_message, UserMessage(content=prompt, source=self.id.key)]
         
-        prompt = f"研究主题：{self._topic}\n\n论文分析：\n{papers_summary}\n\n请生成调研报告。"
+        # 提取参考文献
+        references = [f"[{i+1}] {p.title}" for i, p in enumerate(self._approved_papers)]
+
+        if settings.report_streaming:
+            chunks = self._chunk_publisher(self._new_run_id())
+            await chunks.begin("")
+            await self._stream_text(messages, ctx, chunks)
+            chunks.citations.extend(references)
+            await chunks.close()
+            logger.success("报告生成完成（流式）")
+            return
         
         # 生成报告
         result = await self._model_client.create(
-            messages=[
-                self._system_message,
-                UserMessage(content=prompt, source=self.id.key)
-            ],
+            messages=messages,
             cancellation_token=ctx.cancellation_token
         )
         
-        # 提取参考文献
-        references = [f"[{i+1}] {p.title}" for i, p in enumerate(self._approved_papers)]
-        
         # 发布到调度Agent
         await self.publish_message(
             ReportData(
@@ -0,0 +1,95 @@
+"""嵌入后端对比：PyTorch vs ONNX（吞吐量与向量一致性）
+
+用法：
+    python -m benchmarks.bench_embedding_backends [--n 2000] [--batch-size 64] [--threads 0] [--min-cosine 0.99]
+
+以 PyTorch 输出为基准，报告 ONNX（fp32 / int8）的最小与平均余弦相似度及每秒编码条数；
+任一启用后端低于 --min-cosine 时以非零状态退出。
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config.settings import settings
+from knowledge_base.embedding_service import EmbeddingService
+
+_WORDS_EN = ("transformer agent retrieval graph reinforcement learning benchmark "
+             "language model attention diffusion robot planning dataset evaluation").split()
+_WORDS_ZH = ["多智能体", "强化学习", "检索增强", "大型语言模型", "注意力机制", "知识图谱",
+             "路径规划", "评测基准", "扩散模型", "任务分解", "可复现性", "推理效率"]
+
+
+def synthetic_corpus(n: int, seed: int = 0):
+    """生成中英混合、长度不一的摘要式文本"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        words = [rng.choice(_WORDS_EN if rng.random() < 0.5 else _WORDS_ZH) for _ in range(rng.randint(5, 120))]
+        texts.append(" ".join(words))
+    return texts
+
+
+def _throughput(svc: EmbeddingService, texts, batch_size: int):
+    svc.encode(texts[:batch_size], batch_size=batch_size)  # 预热
+    start = time.perf_counter()
+    vecs = np.asarray(svc.encode(texts, batch_size=batch_size), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    return vecs, len(texts) / elapsed
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="嵌入后端吞吐与一致性对比")
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=settings.embedding_onnx_threads)
+    parser.add_argument("--min-cosine", type=float, default=settings.embedding_onnx_min_cosine)
+    parser.add_argument("--out", default="./benchmarks/results/embedding_backends.json")
+    args = parser.parse_args(argv)
+
+    texts = synthetic_corpus(args.n)
+    model, cache = settings.embedding_model, settings.embedding_cache_dir
+
+    results = {"n": args.n, "batch_size": args.batch_size, "backends": {}}
+    ref_vecs, ref_tps = _throughput(EmbeddingService(model, cache, backend="torch"), texts, args.batch_size)
+    results["backends"]["torch"] = {"texts_per_s": ref_tps}
+
+    ok = True
+    for name, quantize in (("onnx_fp32", False), ("onnx_int8", True)):
+        svc = EmbeddingService(model, cache, backend="onnx", onnx_quantize=quantize,
+                               onnx_threads=args.threads, onnx_min_cosine=args.min_cosine)
+        if svc._onnx is None:
+            results["backends"][name] = {"error": "ONNX 后端不可用"}
+            ok = False
+            continue
+        vecs, tps = _throughput(svc, texts, args.batch_size)
+        cos = _cosine(vecs, ref_vecs)
+        entry = {
+            "texts_per_s": tps,
+            "speedup": tps / ref_tps,
+            "min_cosine": float(cos.min()),
+            "mean_cosine": float(cos.mean()),
+        }
+        entry["within_tolerance"] = entry["min_cosine"] >= args.min_cosine
+        ok = ok and entry["within_tolerance"]
+        results["backends"][name] = entry
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
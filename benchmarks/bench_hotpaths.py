@@ -0,0 +1,305 @@
+"""热点路径微基准：文本后处理、嵌入编码、Chroma 写入/检索与 arXiv 缓存读取
+
+用法：
+    python -m benchmarks.bench_hotpaths [--scales 10,100,1000,10000] [--only post_process,think_tags,embedding,chroma,arxiv_cache]
+                                        [--repeat 5] [--out ./benchmarks/results/hotpaths.json]
+    python -m benchmarks.bench_hotpaths --compare ./benchmarks/results/hotpaths_baseline.json [--tolerance 0.2]
+
+语料按论文数（scale）合成且固定 seed，不同版本之间可直接对比：
+- post_process：AssemblerAgent._post_process_report，报告长度约 200 字/篇（10k 篇约 2MB），含审校标记、机械衔接词与过度加粗；
+- think_tags：_remove_think_tags，分别测量含/不含 <think> 块的文本；
+- embedding：EmbeddingService.encode 在多个 batch_size 下的吞吐（条数上限 --embedding-max，模型加载失败时记为 skipped）；
+- chroma：集合逐级增长到各 scale 后，测量新增写入、未变化写入（只比对文档）与 retrieve_similar 延迟；
+- arxiv_cache：ArxivService.search_papers 命中本地缓存时的读取耗时。
+
+结果按 "用例/参数" 扁平键写入 JSON；--compare 与基线比较中位数，超出容差时以非零状态退出。
+测量期间关闭追踪并将日志级别提到 WARNING，避免 span 与日志输出计入耗时。
+"""
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = ["post_process", "think_tags", "embedding", "chroma", "arxiv_cache"]
+EMBED_DIM = 384
+
+_NOISE_LINES = ["[章节修订稿]", "主要修改说明：", "- 统一了术语", "- 删除了重复句子"]
+_TRANSITIONS = ["首先，", "其次，", "值得注意的是，", "此外，", "综上所述，", "具体而言，"]
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """重复执行取中位数与最小值（秒）"""
+    for _ in range(warmup):
+        fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(runs), "min_s": min(runs)}
+
+
+def synthetic_report(n_papers: int, seed: int = 0, think: bool = False) -> str:
+    """合成分章报告：约 200 字/篇，夹带审校痕迹、段首衔接词与过度加粗"""
+    from benchmarks.mock_llm_server import render_section
+
+    rng = random.Random(f"report:{seed}:{n_papers}")
+    sections = ["引言与背景", "理论基础与范式转变", "任务视角", "环境与框架", "挑战与未来方向", "结论"]
+    per_section = max(200, n_papers * 200 // len(sections))
+    parts = []
+    for sec in sections:
+        body = render_section(rng, sec, per_section)
+        paras = body.split("\n\n")
+        for i in range(0, len(paras), 3):
+            paras[i] = rng.choice(_TRANSITIONS) + paras[i]
+        for i in range(1, len(paras), 5):
+            paras[i] += " " + " ".join(f"**要点{j}**" for j in range(6))
+        if think:
+            paras.insert(len(paras) // 2, f"<think>\n{'推理过程。' * 80}\n</think>")
+        parts.append(f"## {sec}\n\n" + "\n\n".join(paras))
+        if rng.random() < 0.5:
+            parts.append("\n".join(_NOISE_LINES))
+    return "\n\n".join(parts)
+
+
+def _unbound(cls, name: str):
+    """取 Agent 的纯函数方法（不经运行时实例化）"""
+    return getattr(object.__new__(cls), name)
+
+
+def bench_post_process(scales: List[int], repeat: int) -> Dict[str, Dict]:
+    from agents.assembler_agent import AssemblerAgent
+
+    post = _unbound(AssemblerAgent, "_post_process_report")
+    results = {}
+    for n in scales:
+        text = synthetic_report(n)
+        r = measure(lambda: post(text), repeat)
+        r["chars"] = len(text)
+        r["mb_per_s"] = round(len(text.encode("utf-8")) / 2**20 / r["median_s"], 3)
+        results[f"post_process/papers={n}"] = r
+    return results
+
+
+def bench_think_tags(scales: List[int], repeat: int) -> Dict[str, Dict]:
+    from agents.writer_agent import WriterAgent
+
+    strip = _unbound(WriterAgent, "_remove_think_tags")
+    results = {}
+    for n in scales:
+        for think in (False, True):
+            text = synthetic_report(n, think=think)
+            r = measure(lambda: strip(text), repeat)
+            r["chars"] = len(text)
+            results[f"think_tags/papers={n},think={str(think).lower()}"] = r
+    return results
+
+
+def bench_embedding(scales: List[int], repeat: int, max_texts: int, batch_sizes: List[int]) -> Dict[str, Dict]:
+    from benchmarks.bench_embedding_backends import synthetic_corpus
+    from config.settings import settings
+    from knowledge_base.embedding_service import EmbeddingService
+
+    try:
+        svc = EmbeddingService(
+            settings.embedding_model,
+            settings.embedding_cache_dir,
+            backend=settings.embedding_backend,
+            onnx_quantize=settings.embedding_onnx_quantize,
+            onnx_threads=settings.embedding_onnx_threads,
+        )
+    except Exception as e:
+        return {"embedding": {"skipped": f"嵌入模型加载失败: {e}"}}
+    results = {}
+    for n in sorted({min(s, max_texts) for s in scales}):
+        texts = synthetic_corpus(n, seed=n)
+        for bs in batch_sizes:
+            r = measure(lambda: svc.encode(texts, batch_size=bs), max(1, repeat // 2))
+            r["texts_per_s"] = round(n / r["median_s"], 1)
+            results[f"embedding/texts={n},batch={bs}"] = r
+    return results
+
+
+def _vectors(rng: random.Random, n: int) -> List[List[float]]:
+    vecs = []
+    for _ in range(n):
+        v = [rng.gauss(0, 1) for _ in range(EMBED_DIM)]
+        norm = sum(x * x for x in v) ** 0.5
+        vecs.append([x / norm for x in v])
+    return vecs
+
+
+def bench_chroma(scales: List[int], repeat: int, queries: int = 50, batch: int = 100) -> Dict[str, Dict]:
+    from benchmarks.bench_pipeline import fixture_papers
+    from knowledge_base.chroma_manager import ChromaManager
+
+    rng = random.Random(0)
+    manager = ChromaManager(tempfile.mkdtemp(prefix="bench-chroma-"))
+    size = 0
+    results = {}
+
+    def _docs(start: int, count: int):
+        papers = fixture_papers(f"hotpaths {start}", count)
+        ids = [f"p{start + i}" for i in range(count)]
+        docs = [f"{p['title']}\n{p['abstract'][:400]}" for p in papers]
+        metas = [{"title": p["title"], "type": "summary", "topic": "hotpaths"} for p in papers]
+        return ids, _vectors(rng, count), docs, metas
+
+    for n in sorted(scales):
+        # 集合逐级增长到 n 条
+        while size < n:
+            count = min(500, n - size)
+            manager.upsert_if_changed(*_docs(size, count))
+            size += count
+
+        # 新增写入：每次写入一批新 ID 后删除，保持集合规模不变
+        new = _docs(10**7, batch)
+
+        def _insert():
+            manager.upsert_if_changed(*new)
+            manager.delete(new[0])
+        r = measure(_insert, repeat)
+        r["docs_per_s"] = round(batch / r["median_s"], 1)
+        results[f"chroma_upsert_new/size={n},batch={batch}"] = r
+
+        # 未变化写入：只读取比对，不触发写入
+        existing = _docs(0, min(batch, n))
+        r = measure(lambda: manager.upsert_if_changed(*existing), repeat)
+        results[f"chroma_upsert_unchanged/size={n},batch={len(existing[0])}"] = r
+
+        # 检索：多条查询逐条调用，报告单次延迟中位数
+        qvecs = _vectors(rng, queries)
+        latencies = []
+        for q in qvecs:
+            start = time.perf_counter()
+            manager.retrieve_similar(q, n_results=5)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        results[f"chroma_retrieve/size={n},k=5"] = {
+            "median_s": statistics.median(latencies),
+            "min_s": latencies[0],
+            "p95_s": latencies[int(len(latencies) * 0.95) - 1],
+        }
+    return results
+
+
+def bench_arxiv_cache(scales: List[int], repeat: int) -> Dict[str, Dict]:
+    from benchmarks.bench_pipeline import fixture_papers
+    from services.arxiv_service import ArxivService
+
+    service = ArxivService(cache_dir=tempfile.mkdtemp(prefix="bench-arxiv-"))
+    results = {}
+    for n in scales:
+        query = f"hotpaths {n}"
+        # 与 ArxivService.search_papers 的缓存键一致
+        key = hashlib.md5(f"{query}|{n}".encode("utf-8")).hexdigest()
+        cache_file = service.cache_dir / f"search_{key}.json"
+        cache_file.write_text(json.dumps(fixture_papers(query, n), ensure_ascii=False, indent=2), encoding="utf-8")
+        r = measure(lambda: service.search_papers(query, n), repeat)
+        r["bytes"] = cache_file.stat().st_size
+        results[f"arxiv_cache/papers={n}"] = r
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent.parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """按中位数与基线比较，返回超出容差的用例"""
+    regressions = []
+    for key, cur in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base or "median_s" not in cur or "median_s" not in base:
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        flag = "回归" if ratio > 1 + tolerance else ("提升" if ratio < 1 - tolerance else "")
+        print(f"{key:<60} {base['median_s'] * 1000:>10.3f}ms → {cur['median_s'] * 1000:>10.3f}ms  x{ratio:.2f} {flag}")
+        if ratio > 1 + tolerance:
+            regressions.append({"case": key, "baseline_s": base["median_s"], "current_s": cur["median_s"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="热点路径微基准")
+    parser.add_argument("--scales", default="10,100,1000,10000", help="语料规模（论文数，逗号分隔）")
+    parser.add_argument("--only", default=",".join(CASES), help=f"运行的用例（{','.join(CASES)}）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--embedding-max", type=int, default=2000, help="嵌入编码的最大文本条数")
+    parser.add_argument("--batch-sizes", default="8,32,64,128", help="嵌入编码 batch_size（逗号分隔）")
+    parser.add_argument("--out", default="./benchmarks/results/hotpaths.json")
+    parser.add_argument("--compare", default=None, help="基线结果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="中位数允许的相对变慢比例")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("API_KEY", "benchmark")
+    from loguru import logger
+    from config.settings import settings
+
+    settings.tracing_enabled = False
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    only = [c.strip() for c in args.only.split(",") if c.strip()]
+    unknown = set(only) - set(CASES)
+    if unknown:
+        parser.error(f"未知的用例: {', '.join(sorted(unknown))}")
+
+    runners = {
+        "post_process": lambda: bench_post_process(scales, args.repeat),
+        "think_tags": lambda: bench_think_tags(scales, args.repeat),
+        "embedding": lambda: bench_embedding(
+            scales, args.repeat, args.embedding_max, [int(b) for b in args.batch_sizes.split(",")]
+        ),
+        "chroma": lambda: bench_chroma(scales, args.repeat),
+        "arxiv_cache": lambda: bench_arxiv_cache(scales, args.repeat),
+    }
+    results: Dict[str, Dict] = {}
+    for case in CASES:
+        if case in only:
+            print(f"运行 {case} ...", file=sys.stderr)
+            results.update(runners[case]())
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": scales,
+            "repeat": args.repeat,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已保存: {out.absolute()}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能回归（容差 {args.tolerance:.0%}）")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""端到端流水线基准：ResearchWorkflow + 本地模拟 LLM 服务 + 固定论文集
+
+用法：
+    python -m benchmarks.bench_pipeline [--papers 20] [--topics 1] [--concurrency 1]
+                                        [--latency lognormal:0.5,0.4] [--error-rate 0] [--rate-limit-rate 0]
+                                        [--fixture papers.json] [--server-url http://127.0.0.1:8900/v1] [--stream]
+                                        [--report-mode sections|flat|mapreduce]
+
+- LLM 调用发往进程内启动的 mock_llm_server（或 --server-url 指定的外部实例），不产生 API 费用；
+- ArxivService 替换为固定论文集：默认按主题与 seed 生成合成论文，也可用 --fixture 指定
+  ArxivService 缓存文件（cache/papers/search_*.json）；
+- 嵌入模型按当前配置真实加载，Chroma 写入临时目录，审核使用 auto_approve；
+- 输出各阶段墙钟时间（采集 / 摘要+分析+评级 / 撰写+装配）、吞吐量与每篇论文的 LLM 调用数，
+  结果写入 --out；--stream 时另记录报告文件首次写入正文的时间（first_content_s）；
+- --report-mode flat/mapreduce 关闭分章流程，整篇一次生成或强制走分层 map-reduce（用于数百篇论文的规模测试）。
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+
+from benchmarks.mock_llm_server import MockLLMServer, add_mock_arguments, config_from_args
+
+# 进度事件 → 阶段结束点
+STAGES = [("collect", "collected"), ("ingest", "writing"), ("write", "report_saved")]
+
+_TITLE_WORDS = ["Multi-Agent", "Retrieval", "Planning", "Tool Use", "Memory", "Reasoning",
+                "Benchmark", "Alignment", "Reflection", "Graph", "Efficient", "Language Model"]
+
+
+def fixture_papers(topic: str, n: int, seed: int = 0) -> List[Dict]:
+    """按主题与 seed 生成确定性的合成论文（字段与 ArxivService.search_papers 一致）"""
+    rng = random.Random(f"{seed}:{topic}")
+    prefix = f"bench-{zlib.crc32(f'{seed}:{topic}'.encode('utf-8')):08x}"
+    papers = []
+    for i in range(n):
+        words = rng.sample(_TITLE_WORDS, 4)
+        abstract = " ".join(rng.choice(_TITLE_WORDS).lower() for _ in range(rng.randint(120, 220)))
+        papers.append({
+            "id": f"{prefix}-{i:04d}",
+            "title": f"{' '.join(words)} for {topic}",
+            "authors": [f"Author {rng.randint(1, 500)}" for _ in range(rng.randint(1, 6))],
+            "abstract": f"We study {topic}. {abstract}.",
+            "published": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "url": f"https://arxiv.org/pdf/bench.{i:05d}",
+            "categories": ["cs.AI"],
+        })
+    return papers
+
+
+def _fixture_service(fixture: Optional[str], seed: int):
+    from services.arxiv_service import ArxivService
+
+    loaded = json.loads(Path(fixture).read_text(encoding="utf-8")) if fixture else None
+
+    class FixtureArxivService(ArxivService):
+        """以固定论文集代替 arXiv 检索"""
+
+        def search_papers(self, query: str, max_results: int = 50) -> List[Dict]:
+            if loaded is not None:
+                return [dict(p) for p in loaded[:max_results]]
+            return fixture_papers(query, max_results, seed)
+
+    return FixtureArxivService(cache_dir=tempfile.mkdtemp(prefix="bench-papers-"))
+
+
+class StageRecorder:
+    """通过进度总线记录每个运行键的阶段时间点"""
+
+    def __init__(self):
+        self.marks: Dict[str, Dict[str, float]] = {}
+
+    def start(self, key: str) -> None:
+        self.marks[key] = {"start": time.perf_counter()}
+
+    def __call__(self, key: str, event: dict) -> None:
+        marks = self.marks.get(key)
+        if marks is not None:
+            marks.setdefault(event["stage"], time.perf_counter())
+
+    def durations(self, key: str) -> Dict[str, Optional[float]]:
+        marks = self.marks.get(key, {})
+        result, prev = {}, marks.get("start")
+        for name, event in STAGES:
+            t = marks.get(event)
+            result[f"{name}_s"] = round(t - prev, 3) if t is not None and prev is not None else None
+            prev = t if t is not None else prev
+        first = marks.get("report_streaming")
+        result["first_content_s"] = round(first - marks["start"], 3) if first is not None and "start" in marks else None
+        end = marks.get("report_saved")
+        result["total_s"] = round(end - marks["start"], 3) if end is not None and "start" in marks else None
+        return result
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    from config.settings import settings
+    from utils.progress import progress_bus
+
+    server = None
+    base_url = args.server_url
+    if not base_url:
+        server = MockLLMServer(config_from_args(args))
+        base_url = await server.start()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-pipeline-"))
+    settings.base_url = base_url
+    settings.review_mode = "auto_approve"
+    settings.chroma_persist_dir = str(workdir / "chroma")
+    settings.tracing_dir = str(workdir / "traces")
+    settings.report_streaming = args.stream
+    settings.writer_use_section_flow = args.report_mode == "sections"
+    if args.report_mode == "flat":
+        settings.report_mapreduce_threshold = 0
+    elif args.report_mode == "mapreduce":
+        settings.report_mapreduce_threshold = 1
+
+    from workflows.sequential_workflow import ResearchWorkflow
+
+    recorder = StageRecorder()
+    progress_bus.add_listener(recorder)
+    workflow = ResearchWorkflow()
+    workflow.arxiv_service = _fixture_service(args.fixture, args.seed)
+
+    t0 = time.perf_counter()
+    workflow.start_warmup()
+    await workflow.wait_warmup()
+    warmup_s = time.perf_counter() - t0
+
+    topics = [f"{args.topic} {i}" if args.topics > 1 else args.topic for i in range(args.topics)]
+    sem = asyncio.Semaphore(args.concurrency)
+    runs: List[Dict] = []
+
+    async def _one(i: int, topic: str) -> None:
+        async with sem:
+            key = f"bench-{i}"
+            recorder.start(key)
+            status = "ok"
+            try:
+                await workflow.run_topic(topic, max_papers=args.papers, source=key, timeout=args.timeout)
+            except Exception as e:
+                status = f"error: {e}"
+            runs.append({"topic": topic, "status": status, **recorder.durations(key)})
+
+    t1 = time.perf_counter()
+    try:
+        await asyncio.gather(*(_one(i, t) for i, t in enumerate(topics)))
+    finally:
+        wall_s = time.perf_counter() - t1
+        progress_bus.remove_listener(recorder)
+        await workflow.stop()
+
+    if server is not None:
+        llm = server.stats_dict()
+        await server.stop()
+    else:
+        import aiohttp
+        async with aiohttp.ClientSession() as session:
+            async with session.get(base_url.rsplit("/v1", 1)[0] + "/stats") as resp:
+                llm = await resp.json()
+
+    ok = [r for r in runs if r["status"] == "ok"]
+    total_papers = args.papers * len(ok)
+    calls = llm["total"].get("requests", 0)
+
+    def _median(field: str) -> Optional[float]:
+        values = [r[field] for r in ok if r.get(field) is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    return {
+        "config": {
+            "papers": args.papers, "topics": args.topics, "concurrency": args.concurrency,
+            "latency": args.latency, "error_rate": args.error_rate, "rate_limit_rate": args.rate_limit_rate,
+            "embedding_backend": settings.embedding_backend, "sections": len(settings.section_outline),
+            "report_streaming": args.stream, "report_mode": args.report_mode,
+        },
+        "warmup_s": round(warmup_s, 3),
+        "wall_s": round(wall_s, 3),
+        "runs": sorted(runs, key=lambda r: r["topic"]),
+        "stage_median_s": {f"{name}_s": _median(f"{name}_s") for name, _ in STAGES} | {
+            "first_content_s": _median("first_content_s"), "total_s": _median("total_s"),
+        },
+        "throughput": {
+            "papers_per_s": round(total_papers / wall_s, 3) if wall_s else None,
+            "reports_per_min": round(len(ok) * 60 / wall_s, 3) if wall_s else None,
+        },
+        "llm": {
+            **llm,
+            "calls_per_paper": round(calls / total_papers, 3) if total_papers else None,
+            "calls_per_paper_by_kind": {
+                k: round(v.get("requests", 0) / total_papers, 3) for k, v in llm["by_kind"].items()
+            } if total_papers else {},
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="端到端流水线基准（模拟 LLM）")
+    parser.add_argument("--topic", default="multi-agent systems")
+    parser.add_argument("--papers", type=int, default=20, help="每个主题的论文数")
+    parser.add_argument("--topics", type=int, default=1, help="主题数（>1 时主题名追加序号）")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发主题数")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="单主题超时（秒）")
+    parser.add_argument("--fixture", default=None, help="论文集 JSON（ArxivService 缓存格式）")
+    parser.add_argument("--stream", action="store_true", help="流式生成报告（report_streaming）")
+    parser.add_argument("--report-mode", default="sections", choices=["sections", "flat", "mapreduce"],
+                        help="报告生成方式：分章流程 / 整篇一次生成 / 分层 map-reduce")
+    parser.add_argument("--server-url", default=None, help="使用已启动的模拟服务（默认进程内启动）")
+    parser.add_argument("--out", default="./benchmarks/results/pipeline.json")
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # 模拟服务不校验密钥，未配置 .env 时也能运行
+    os.environ.setdefault("API_KEY", "benchmark")
+    from utils.logger import setup_logger
+    setup_logger()
+
+    result = asyncio.run(run_benchmark(args))
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps({k: result[k] for k in ("wall_s", "stage_median_s", "throughput")}, ensure_ascii=False, indent=2))
+    print(f"每篇论文 LLM 调用数: {result['llm']['calls_per_paper']}，结果: {out.absolute()}")
+    return 0 if all(r["status"] == "ok" for r in result["runs"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
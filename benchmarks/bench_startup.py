@@ -0,0 +1,92 @@
+"""启动开销基准：导入耗时与首个 arXiv 请求时间
+
+用法：
+    python -m benchmarks.bench_startup [--repeat 3] [--import-budget 1.5] [--first-request-budget 3.0]
+
+每次测量在全新子进程中执行：
+- import_s：导入 main 模块（含工作流与全部 Agent）的耗时，并记录是否误加载了重量级模块；
+- first_request_s：从进程启动到 CollectorAgent 发起 arXiv 检索的耗时（检索被替换为空结果，不访问网络）。
+取各次中位数与预算比较，超出预算时以非零状态退出。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "openai", "autogen_ext", "arxiv"]
+
+_CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import main  # noqa: F401
+t_import = time.perf_counter() - t0
+heavy = [m for m in %(heavy)r if m in sys.modules]
+
+from services.arxiv_service import ArxivService
+from workflows.sequential_workflow import ResearchWorkflow
+
+first = {}
+def fake_search(self, query, max_results=50):
+    first.setdefault("t", time.perf_counter() - t0)
+    return []
+ArxivService.search_papers = fake_search
+
+async def run():
+    wf = ResearchWorkflow()
+    wf.start_warmup()
+    await wf.run("startup benchmark")
+    wf.shutdown()
+
+asyncio.run(run())
+print(json.dumps({"import_s": t_import, "first_request_s": first.get("t"), "heavy_loaded_at_import": heavy}))
+"""
+
+
+def measure_once(repo_root: Path) -> dict:
+    env = dict(os.environ)
+    env.setdefault("API_KEY", "benchmark")
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD % {"heavy": HEAVY_MODULES}],
+        cwd=repo_root,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--import-budget", type=float, default=1.5, help="导入耗时预算（秒）")
+    parser.add_argument("--first-request-budget", type=float, default=3.0, help="首个 arXiv 请求耗时预算（秒）")
+    parser.add_argument("--out", default="./benchmarks/results/startup.json")
+    args = parser.parse_args(argv)
+
+    repo_root = Path(__file__).resolve().parent.parent
+    runs = [measure_once(repo_root) for _ in range(args.repeat)]
+    import_s = statistics.median(r["import_s"] for r in runs)
+    first_s = statistics.median(r["first_request_s"] for r in runs if r["first_request_s"] is not None)
+    heavy = sorted({m for r in runs for m in r["heavy_loaded_at_import"]})
+
+    result = {
+        "runs": runs,
+        "import_s": import_s,
+        "first_request_s": first_s,
+        "heavy_loaded_at_import": heavy,
+        "budget": {"import_s": args.import_budget, "first_request_s": args.first_request_budget},
+        "within_budget": import_s <= args.import_budget and first_s <= args.first_request_budget and not heavy,
+    }
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
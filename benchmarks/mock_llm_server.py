@@ -0,0 +1,341 @@
+"""本地 OpenAI 兼容模拟服务（基准测试用，不访问真实模型）
+
+用法：
+    python -m benchmarks.mock_llm_server [--port 8900] [--latency lognormal:0.8,0.5] [--per-token-ms 0]
+                                         [--error-rate 0.01] [--rate-limit-rate 0.02] [--seed 0]
+
+然后设置 BASE_URL=http://127.0.0.1:8900/v1 运行工作流。
+
+- 按系统提示词识别调用方，返回与各 Agent 解析逻辑匹配的固定格式内容：
+  摘要三要素 JSON、带“关键概念：”的分析、章节规划 JSON、章节正文、中间综述、审校/润色（原样返回草稿）；
+- 延迟分布：fixed:秒 / uniform:下限,上限 / normal:均值,标准差 / lognormal:中位数,sigma，另可按输出 token 追加延迟；
+- 错误注入：按比例返回 500 与 429（带 Retry-After）；
+- 确定性：随机数由 (seed, 请求体哈希, 同一请求的第几次重试) 决定，相同输入在相同重试序号下结果一致，
+  重试不会永远命中同一个错误；
+- GET /stats 返回按调用类型统计的请求数、token 与注入错误数，POST /stats/reset 清零。
+"""
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import sys
+import time
+
+from aiohttp import web
+
+_CONCEPTS = [
+    "多智能体协作", "任务分解", "检索增强生成", "工具调用", "长期记忆", "强化学习",
+    "思维链", "规划与反思", "知识图谱", "评测基准", "对齐", "推理效率",
+]
+_DOC_TYPES = ["summary", "analysis", "section"]
+
+
+@dataclass
+class MockConfig:
+    """模拟服务配置"""
+    latency: str = "fixed:0"
+    per_token_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_s: float = 0.1
+    section_chars: int = 3000
+    seed: int = 0
+
+
+def parse_latency(spec: str):
+    """解析延迟分布描述，返回 rng -> 秒 的采样函数"""
+    kind, _, params = spec.partition(":")
+    if not params:
+        kind, params = "fixed", kind
+    values = [float(v) for v in params.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（中英文混排约 3 字符/token）"""
+    return max(1, len(text) // 3)
+
+
+def classify(messages: List[Dict]) -> str:
+    """按系统提示词识别调用方"""
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    if "三要素" in system:
+        return "summary"
+    if "关键概念" in system:
+        return "analysis"
+    if "仅输出JSON" in system:
+        return "plan"
+    if "技术编辑" in system:
+        return "revise"
+    if "学术编审" in system:
+        return "polish"
+    if "学术写作专家" in system:
+        return "section"
+    if "文献综述助手" in system:
+        return "digest"
+    if "科研报告撰写专家" in system:
+        return "report"
+    return "chat"
+
+
+def _between(text: str, start: str, end: Optional[str] = None) -> str:
+    i = text.find(start)
+    if i < 0:
+        return ""
+    text = text[i + len(start):]
+    if end:
+        j = text.find(end)
+        if j >= 0:
+            text = text[:j]
+    return text.strip()
+
+
+def _paragraph(rng: random.Random, subject: str, n_refs: int) -> str:
+    a, b = rng.sample(_CONCEPTS, 2)
+    ref = rng.randint(1, max(1, n_refs))
+    return (
+        f"围绕{subject}，现有工作主要从{a}与{b}两个方向展开 [{ref}]。"
+        f"实验表明，结合{a}的方法在公开基准上准确率提升约 {rng.randint(3, 30)}%，"
+        f"推理延迟降低 {rng.randint(5, 50)}%，但在长程任务中仍面临误差累积与成本控制问题。"
+    )
+
+
+def render_section(rng: random.Random, section: str, target_chars: int) -> str:
+    """生成带小标题、引用、表格与列表的章节正文"""
+    parts: List[str] = []
+    size = 0
+    heading = 0
+    while size < target_chars:
+        heading += 1
+        parts.append(f"### {heading}. {section}的{rng.choice(_CONCEPTS)}")
+        for _ in range(rng.randint(2, 4)):
+            para = _paragraph(rng, section, 10)
+            parts.append(para)
+            size += len(para)
+        if heading == 2:
+            parts.append("| 方法 | 核心思想 | 提升 |\n| --- | --- | --- |")
+            for c in rng.sample(_CONCEPTS, 3):
+                parts.append(f"| {c} | 基于{c}的改进 | {rng.randint(1, 30)}% |")
+        if heading == 3:
+            parts.append("\n".join(f"- **{c}**：仍待解决的关键挑战" for c in rng.sample(_CONCEPTS, 3)))
+    return "\n\n".join(parts)
+
+
+def render_response(kind: str, messages: List[Dict], rng: random.Random, config: MockConfig) -> str:
+    """生成与调用方解析逻辑匹配的回复内容"""
+    user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+    if kind == "summary":
+        title = _between(user, "论文标题：", "\n") or "该论文"
+        return json.dumps({
+            "research_problem": f"如何在{title}所述场景中提升{rng.choice(_CONCEPTS)}的效果",
+            "method": f"提出结合{rng.choice(_CONCEPTS)}与{rng.choice(_CONCEPTS)}的框架",
+            "value": f"在基准上提升 {rng.randint(3, 40)}%，并降低 {rng.randint(5, 60)}% 计算成本",
+        }, ensure_ascii=False)
+    if kind == "analysis":
+        title = _between(user, "论文：", "\n") or "该论文"
+        body = "\n".join(_paragraph(rng, title, 5) for _ in range(3))
+        return f"分析内容：{body}\n关键概念：{', '.join(rng.sample(_CONCEPTS, 4))}"
+    if kind == "plan":
+        return json.dumps({"keywords": rng.sample(_CONCEPTS, 3), "doc_types": rng.sample(_DOC_TYPES, 2)}, ensure_ascii=False)
+    if kind == "section":
+        section = _between(user, "**当前章节**：", "\n") or "章节"
+        return render_section(rng, section, config.section_chars)
+    if kind == "revise":
+        return _between(user, "[章节草稿]\n") or render_section(rng, "章节", config.section_chars)
+    if kind == "polish":
+        return _between(user, "**原始报告**：\n", "\n\n━━━") or _between(user, "**原始章节**：\n", "\n\n━━━") or user
+    if kind == "digest":
+        return render_section(rng, "综述", config.section_chars // 4)
+    if kind == "report":
+        return "\n\n".join(f"## {s}\n\n{render_section(rng, s, config.section_chars // 2)}" for s in ("引言", "方法综述", "结论"))
+    return "好的。"
+
+
+class MockLLMServer:
+    """OpenAI 兼容的 /v1/chat/completions 模拟服务"""
+
+    def __init__(self, config: Optional[MockConfig] = None):
+        self.config = config or MockConfig()
+        self._latency = parse_latency(self.config.latency)
+        self._attempts: Counter = Counter()
+        self._runner: Optional[web.AppRunner] = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.errors: Counter = Counter()
+        self._attempts.clear()
+
+    def stats_dict(self) -> Dict:
+        total = Counter()
+        for s in self.stats.values():
+            total.update(s)
+        return {
+            "by_kind": {k: dict(v) for k, v in self.stats.items()},
+            "total": dict(total),
+            "errors": dict(self.errors),
+        }
+
+    def _rng(self, body: bytes) -> random.Random:
+        digest = hashlib.sha256(body).hexdigest()
+        self._attempts[digest] += 1
+        return random.Random(f"{self.config.seed}:{digest}:{self._attempts[digest]}")
+
+    def _completion(self, request: Dict, content: str, prompt_tokens: int, completion_tokens: int) -> Dict:
+        return {
+            "id": f"chatcmpl-mock-{hashlib.md5(content.encode('utf-8')).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        raw = await request.read()
+        try:
+            body = json.loads(raw)
+        except json.JSONDecodeError:
+            return web.json_response({"error": {"message": "invalid json"}}, status=400)
+        messages = body.get("messages") or []
+        kind = classify(messages)
+        rng = self._rng(raw)
+        stats = self.stats[kind]
+        stats["requests"] += 1
+
+        # 错误注入（先于延迟判定，429 通常很快返回）
+        roll = rng.random()
+        if roll < self.config.rate_limit_rate:
+            self.errors["429"] += 1
+            return web.json_response(
+                {"error": {"message": "rate limited (mock)", "type": "rate_limit_error"}},
+                status=429, headers={"Retry-After": str(self.config.retry_after_s)},
+            )
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.errors["500"] += 1
+            return web.json_response({"error": {"message": "internal error (mock)"}}, status=500)
+
+        content = render_response(kind, messages, rng, self.config)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        delay = self._latency(rng) + completion_tokens * self.config.per_token_ms / 1000
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["latency_s"] += delay
+
+        if body.get("stream"):
+            return await self._stream(request, body, content, prompt_tokens, completion_tokens, delay)
+        await asyncio.sleep(delay)
+        return web.json_response(self._completion(body, content, prompt_tokens, completion_tokens))
+
+    async def _stream(self, request: web.Request, body: Dict, content: str,
+                      prompt_tokens: int, completion_tokens: int, delay: float) -> web.StreamResponse:
+        """SSE 流式返回：首包前等待一半延迟，其余延迟均摊到各分块"""
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await resp.prepare(request)
+        chunks = [content[i:i + 64] for i in range(0, len(content), 64)] or [""]
+        base = {"id": "chatcmpl-mock-stream", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "mock")}
+        await asyncio.sleep(delay / 2)
+        for i, chunk in enumerate(chunks):
+            delta = {"content": chunk} if i else {"role": "assistant", "content": chunk}
+            event = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            await resp.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await asyncio.sleep(delay / 2 / len(chunks))
+        final = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        await resp.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = {**base, "choices": [], "usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}}
+            await resp.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+        await resp.write(b"data: [DONE]\n\n")
+        await resp.write_eof()
+        return resp
+
+    async def handle_models(self, request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats_dict())
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset_stats()
+        return web.json_response({"ok": True})
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/chat/completions", self.handle_chat)
+        app.router.add_post("/chat/completions", self.handle_chat)
+        app.router.add_get("/v1/models", self.handle_models)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_post("/stats/reset", self.handle_reset)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """在当前事件循环中启动，返回 base_url（port=0 时自动分配端口）"""
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}/v1"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """模拟服务参数（供基准脚本复用）"""
+    parser.add_argument("--latency", default="lognormal:0.5,0.4", help="延迟分布，如 fixed:0.2 / uniform:0.1,0.5 / lognormal:0.5,0.4")
+    parser.add_argument("--per-token-ms", type=float, default=0.0, help="每个输出 token 追加的延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--section-chars", type=int, default=3000, help="章节正文长度（字符）")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency=args.latency,
+        per_token_ms=args.per_token_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        section_chars=args.section_chars,
+        seed=args.seed,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+    server = MockLLMServer(config_from_args(args))
+    print(f"模拟服务: http://{args.host}:{args.port}/v1")
+    web.run_app(server.create_app(), host=args.host, port=args.port, access_log=None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
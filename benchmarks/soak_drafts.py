@@ -0,0 +1,151 @@
+"""装配草稿内存浸泡测试：在同一进程中连续运行数百次装配，检查内存是否随运行次数增长
+
+用法：
+    python -m benchmarks.soak_drafts [--runs 500] [--sections 6] [--section-chars 6000]
+                                     [--abandon-every 7] [--sources 8] [--spill-bytes 65536]
+
+- 在 SingleThreadedAgentRuntime 中注册真实的 AssemblerAgent（不注入模型，不做润色），
+  每次运行发布若干 SectionDraft 后发送 AssembleRequest；每隔 --abandon-every 次运行只发草稿不装配，
+  模拟中途失败的运行，由 LRU 上限回收；--spill-bytes 较小时大多数运行会溢写到磁盘；
+- 每隔 --sample-every 次运行记录 tracemalloc 当前分配、RSS 与草稿存储统计，写入 --out；
+- 后半程 tracemalloc 增长超过 --max-growth-mb 时返回非零退出码。
+"""
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.mock_llm_server import render_section
+
+
+async def run_soak(args: argparse.Namespace) -> Dict:
+    from autogen_core import MessageContext, RoutedAgent, SingleThreadedAgentRuntime, TopicId, message_handler, type_subscription
+    from config.settings import settings
+    from utils.draft_store import DraftStore
+    from utils.message_types import AssembleRequest, ReportData, SectionDraft
+    from utils.profiling import _rss_bytes
+    from agents.assembler_agent import AssemblerAgent
+
+    settings.tracing_enabled = False
+    store = DraftStore(
+        args.spill_dir or tempfile.mkdtemp(prefix="soak-drafts-"),
+        max_runs=args.max_runs,
+        spill_bytes=args.spill_bytes,
+    )
+    reports: List[int] = []
+
+    @type_subscription(topic_type="CoordinatorAgent")
+    class ReportSink(RoutedAgent):
+        """只记录报告长度的 Coordinator 替身"""
+
+        def __init__(self):
+            super().__init__("报告接收")
+
+        @message_handler
+        async def handle_report(self, message: ReportData, ctx: MessageContext) -> None:
+            reports.append(len(message.content))
+
+    runtime = SingleThreadedAgentRuntime()
+    await AssemblerAgent.register(runtime, type="AssemblerAgent", factory=lambda: AssemblerAgent(drafts=store))
+    await ReportSink.register(runtime, type="CoordinatorAgent", factory=ReportSink)
+    runtime.start()
+
+    rng = random.Random(args.seed)
+    sections = [f"章节{i}" for i in range(args.sections)]
+    bodies = [render_section(rng, s, args.section_chars) for s in sections]
+    samples: List[Dict] = []
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    abandoned = 0
+
+    for i in range(args.runs):
+        source = f"soak-{i % args.sources}"
+        run_id = f"soak-run-{i:05d}"
+        for idx, body in enumerate(bodies):
+            # 每次运行的正文不同，避免字符串复用掩盖泄漏
+            await runtime.publish_message(
+                SectionDraft(topic="soak", run_id=run_id, section_id=str(idx), content=f"{run_id}\n{body}", citations=[f"论文 {i}-{idx}"]),
+                topic_id=TopicId("AssemblerAgent", source=source),
+            )
+        if args.abandon_every and (i + 1) % args.abandon_every == 0:
+            abandoned += 1
+        else:
+            await runtime.publish_message(
+                AssembleRequest(topic="soak", run_id=run_id, sections=sections),
+                topic_id=TopicId("AssemblerAgent", source=source),
+            )
+        await runtime.stop_when_idle()
+        runtime.start()
+
+        if (i + 1) % args.sample_every == 0 or i + 1 == args.runs:
+            gc.collect()
+            current, peak = tracemalloc.get_traced_memory()
+            samples.append({
+                "runs": i + 1,
+                "elapsed_s": round(time.perf_counter() - t0, 3),
+                "traced_bytes": current,
+                "traced_peak_bytes": peak,
+                **_rss_bytes(),
+                "store": store.stats(),
+            })
+            print(f"运行 {i + 1}/{args.runs}: tracemalloc {current / 2**20:.2f}MB, 暂存运行 {store.stats()['runs']}")
+
+    await runtime.stop_when_idle()
+    tracemalloc.stop()
+
+    half = samples[len(samples) // 2]["traced_bytes"]
+    growth_mb = (samples[-1]["traced_bytes"] - half) / 2**20
+    return {
+        "config": {
+            "runs": args.runs, "sections": args.sections, "section_chars": args.section_chars,
+            "abandon_every": args.abandon_every, "sources": args.sources,
+            "max_runs": args.max_runs, "spill_bytes": args.spill_bytes,
+        },
+        "reports": len(reports),
+        "abandoned": abandoned,
+        "second_half_growth_mb": round(growth_mb, 3),
+        "passed": growth_mb <= args.max_growth_mb,
+        "samples": samples,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="装配草稿内存浸泡测试")
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--sections", type=int, default=6, help="每次运行的章节数")
+    parser.add_argument("--section-chars", type=int, default=6000, help="每章正文字数")
+    parser.add_argument("--abandon-every", type=int, default=7, help="每隔多少次运行放弃装配一次（0 不放弃）")
+    parser.add_argument("--sources", type=int, default=8, help="轮换使用的运行键数（对应 AssemblerAgent 实例数）")
+    parser.add_argument("--max-runs", type=int, default=16, help="草稿存储的运行数上限")
+    parser.add_argument("--spill-bytes", type=int, default=64 * 1024, help="单个运行溢写阈值（字节）")
+    parser.add_argument("--spill-dir", default=None, help="溢写目录（默认临时目录）")
+    parser.add_argument("--sample-every", type=int, default=25)
+    parser.add_argument("--max-growth-mb", type=float, default=0.5, help="后半程允许的 tracemalloc 增长（MB）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="./benchmarks/results/soak_drafts.json")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("API_KEY", "benchmark")
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    result = asyncio.run(run_soak(args))
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    verdict = "通过" if result["passed"] else "未通过"
+    print(f"报告 {result['reports']} 份，放弃 {result['abandoned']} 次；后半程内存增长 {result['second_half_growth_mb']}MB（{verdict}），结果: {out.absolute()}")
+    return 0 if result["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
 """配置管理"""
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
-from typing import List
+from typing import Dict, List
+import sys
 
 
 class Settings(BaseSettings):
@@ -24,17 +25,79 @@ class Settings(BaseSettings):
         default="./cache/models",
         description="嵌入模型缓存目录"
     )
+    embedding_backend: str = Field(default="torch", description="嵌入推理后端：torch/onnx")
+    embedding_onnx_quantize: bool = Field(default=True, description="ONNX 后端是否使用 int8 动态量化模型")
+    embedding_onnx_threads: int = Field(default=0, description="ONNX intra-op 线程数（0 为自动）")
+    embedding_onnx_min_cosine: float = Field(default=0.99, description="ONNX 导出校验：与原模型的最小余弦相似度")
     
     # ChromaDB配置
     chroma_persist_dir: str = Field(
         default="./cache/chroma",
         description="ChromaDB持久化目录"
     )
+    chroma_partition_mode: str = Field(
+        default="single",
+        description="集合分区模式：single/type/type_topic（切换后用 maintenance migrate 迁移旧数据）"
+    )
+    chroma_server_host: str = Field(default="", description="Chroma 服务端地址（为空时使用本地持久化目录；分布式模式下各进程共享）")
+    chroma_server_port: int = Field(default=8000, description="Chroma 服务端端口")
+    chroma_hot_cache: bool = Field(default=False, description="是否启用进程内向量热缓存（启动时从Chroma预热）")
     
     # 工作流配置
     risk_threshold: float = Field(default=4.0, description="风控阈值")
+    review_mode: str = Field(
+        default="auto",
+        description="高风险论文审核方式：auto（终端运行时询问，否则进入审核队列）/queue（异步审核队列）/interactive（终端询问）/auto_approve/auto_reject（无人值守）"
+    )
+    review_db_path: str = Field(default="./cache/reviews.sqlite3", description="审核队列 SQLite 文件路径")
+    review_timeout_s: float = Field(default=600.0, description="审核等待超时（秒，<=0 表示一直等待）")
+    review_timeout_action: str = Field(default="reject", description="审核超时后的默认处理：approve/reject")
+    review_poll_interval_s: float = Field(default=1.0, description="轮询审核结果的间隔（秒）")
     max_papers: int = Field(default=50, description="最大论文数量")
     min_papers_for_report: int = Field(default=5, description="生成报告所需最少通过论文数")
+    coordinator_stage_timeout_s: float = Field(
+        default=1800.0,
+        description="收到处理计划后等待全部论文完成的最长时间（秒，<=0 不限），超时后以已有评级触发撰写"
+    )
+    coordinator_quorum: int = Field(
+        default=0,
+        description="通过论文数达到该值即提前触发撰写（0 表示等待全部论文，可设为 min_papers_for_report）"
+    )
+    batch_concurrency: int = Field(default=2, description="批量模式同时运行的主题数")
+    batch_topic_timeout_s: float = Field(default=3600.0, description="批量模式单主题超时（秒）")
+
+    # 服务模式
+    server_host: str = Field(default="127.0.0.1", description="服务模式监听地址")
+    server_port: int = Field(default=8080, description="服务模式监听端口（与 Chroma 服务端默认端口 8000 错开）")
+    server_workers: int = Field(default=2, description="服务模式并发执行的任务数")
+    server_queue_size: int = Field(default=16, description="服务模式排队任务上限（满时拒绝新任务）")
+    server_job_history: int = Field(default=200, description="服务模式保留的已结束任务数")
+
+    # 分布式模式（gRPC host/worker 运行时）
+    distributed_host_address: str = Field(default="localhost:50051", description="gRPC 运行时 host 地址")
+    distributed_summarizer_workers: int = Field(default=1, description="摘要Agent worker 进程数")
+    distributed_analyzer_workers: int = Field(default=1, description="分析Agent worker 进程数")
+
+    # 追踪与指标
+    tracing_enabled: bool = Field(default=True, description="是否记录 span、延迟直方图与 token 用量")
+    tracing_dir: str = Field(default="./logs/traces", description="span 输出目录（OTLP JSON Lines）")
+
+    # 剖析（main.py --profile）
+    profile_dir: str = Field(default="./logs/profiles", description="剖析结果输出目录")
+    profile_interval_ms: float = Field(default=5.0, description="采样间隔（毫秒）")
+    profile_traceback_frames: int = Field(default=1, description="tracemalloc 保留的调用栈深度")
+    profile_memory_top: int = Field(default=15, description="每个内存快照记录的分配位置数")
+
+    # 外部交互录制/回放（main.py --record/--replay）
+    cassette_dir: str = Field(default="./logs/cassettes", description="录制文件默认输出目录")
+
+    # 消息传递
+    message_by_reference: bool = Field(
+        default=False,
+        description="大块消息内容（论文列表、分析、章节正文）是否只传递内容存储引用（分布式模式建议开启）"
+    )
+    content_store_dir: str = Field(default="./cache/content", description="内容存储目录（多机部署时需共享挂载）")
+    message_serialization: str = Field(default="msgpack", description="跨进程消息编码：msgpack/json（未安装 msgpack 时回退 json）")
 
     # 分章写作与RAG配置
     writer_use_section_flow: bool = Field(default=True, description="是否启用分章写作流程")
@@ -50,7 +113,31 @@ class Settings(BaseSettings):
         description="报告章节目录"
     )
     section_rag_top_k: int = Field(default=5, description="章节生成时RAG召回条目数")
-    section_db_persist: bool = Field(default=True, description="是否保留本次临时章节向量入库")
+    section_db_persist: bool = Field(default=True, description="是否保留本次临时章节向量入库（False 等同 drop_on_finish）")
+    section_retention_policy: str = Field(
+        default="keep_last_n",
+        description="章节向量保留策略：keep_all/drop_on_finish/keep_last_n/ttl"
+    )
+    section_retention_runs: int = Field(default=10, description="keep_last_n 策略保留的最近运行数")
+    section_retention_ttl_hours: float = Field(default=72.0, description="ttl 策略的保留时长（小时）")
+    writer_incremental: bool = Field(default=True, description="是否按输入指纹复用上次生成的章节与章节规划（增量重新生成）")
+    section_cache_dir: str = Field(default="./cache/sections", description="章节复用缓存目录")
+    section_cache_ttl_hours: float = Field(default=720.0, description="章节复用缓存记录超过该时长未写入或复用即清理（小时，0 不按时长清理）")
+    section_cache_max_entries: int = Field(default=5000, description="章节复用缓存记录数上限（超出时删除最久未使用的记录，0 不限）")
+
+    # 章节上下文打包（token 预算 + 去重 + MMR）
+    section_context_token_budget: int = Field(default=3000, description="章节参考资料默认 token 预算")
+    model_context_budgets: Dict[str, int] = Field(
+        default_factory=dict,
+        description="按模型名覆盖参考资料 token 预算，如 {\"glm-4-flash\": 6000}"
+    )
+    section_context_snippet_tokens: int = Field(default=200, description="单个参考片段 token 上限")
+    section_context_mmr_lambda: float = Field(default=0.7, description="MMR 相关性权重（0-1，越大越偏相关性）")
+    section_context_dedup_threshold: float = Field(default=0.92, description="近重复片段判定阈值（余弦/Jaccard）")
+    section_papers_per_section: int = Field(
+        default=6,
+        description="每章分配的核心论文数（按章节查询向量相似度分配，每篇论文至少进入一章；0 表示每章都以全部论文为候选）"
+    )
 
     # MCP工具与ReAct写作（可选）
     writer_use_mcp_tools: bool = Field(default=False, description="是否启用MCP工具辅助写作")
@@ -59,7 +146,48 @@ class Settings(BaseSettings):
     # 章节写作详细度
     section_min_words: int = Field(default=3000, description="每章节目标最少字数（中文）")
     section_detail_level: str = Field(default="详细", description="章节详细程度：简要/详细/深入")
-    
+
+    # 整篇报告（非分章流程）的分层 map-reduce
+    report_mapreduce_threshold: int = Field(
+        default=40,
+        description="非分章流程中通过论文数超过该值时，先分组生成中间综述再逐层归并为报告（0 表示不启用）"
+    )
+    report_mapreduce_batch: int = Field(default=20, description="map 阶段每组论文数（按分析向量相似度分组）")
+    report_mapreduce_fan_in: int = Field(default=5, description="reduce 阶段每次归并的中间综述数")
+    report_mapreduce_concurrency: int = Field(default=4, description="map/reduce 阶段同时进行的模型调用数")
+    report_mapreduce_digest_chars: int = Field(default=1500, description="单份中间综述的最大字数（超出截断，限制上层提示词长度）")
+
+    # 终稿润色
+    polish_mode: str = Field(default="chunked", description="终稿润色方式：chunked（按章并行）/full（整篇一次）/off")
+    polish_concurrency: int = Field(default=3, description="按章润色时同时进行的模型调用数")
+    polish_max_retries: int = Field(default=3, description="单章润色最大尝试次数（失败后保留该章原文）")
+    polish_context_chars: int = Field(default=300, description="提供给单章润色的相邻章节衔接上下文字数")
+    polish_glossary_size: int = Field(default=20, description="按章润色共享术语表的最大条目数")
+    polish_min_ratio: float = Field(default=0.5, description="润色结果短于原章节该比例时视为截断并重试")
+
+    # 流式报告
+    report_streaming: bool = Field(
+        default=False,
+        description="是否流式生成报告：章节以 create_stream 生成并边生成边追加写入报告文件（不做整篇终稿润色）"
+    )
+    report_stream_chunk_chars: int = Field(default=512, description="流式报告每个分片消息攒够的字符数")
+
+    # 装配草稿存储
+    assembler_max_runs: int = Field(default=32, description="同时暂存章节草稿的运行数上限（超出时丢弃最久未更新的运行，0 不限）")
+    assembler_spill_bytes: int = Field(default=4 * 1024 * 1024, description="单个运行的草稿正文超过该字节数后溢写到磁盘（0 不溢写）")
+    assembler_spill_dir: str = Field(default="./cache/drafts", description="草稿溢写目录")
+
+    def effective_review_mode(self) -> str:
+        """实际生效的审核方式：auto 在标准输入为终端时为 interactive，否则为 queue"""
+        if self.review_mode != "auto":
+            return self.review_mode
+        stdin = sys.stdin
+        return "interactive" if stdin is not None and stdin.isatty() else "queue"
+
+    def context_budget_for(self, model_name: str) -> int:
+        """获取指定模型的参考资料 token 预算"""
+        return self.model_context_budgets.get(model_name, self.section_context_token_budget)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding='utf-8',
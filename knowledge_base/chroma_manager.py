@@ -1,33 +1,261 @@
 """ChromaDB知识库管理"""
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Dict, Optional, Tuple
 from loguru import logger
+import hashlib
+import json
 import logging
+import os
+import re
+import shutil
+import sqlite3
+import time
+import uuid
+
+from utils.tracing import traced
+from knowledge_base.vector_cache import VectorHotCache, flatten_where
+
+
+BASE_COLLECTION = "paper_knowledge"
+# 压缩时临时集合名的后缀：不计入分区，启动时清理中断压缩的遗留
+COMPACT_SUFFIX = "-compact"
+PARTITION_MODES = ("single", "type", "type_topic")
+
+
+@dataclass
+class RetrievalRequest:
+    """批量检索中的单条请求"""
+    query_embedding: List[float]
+    n_results: int = 5
+    where: Optional[Dict] = None
+    namespace: Optional[str] = None  # 主题命名空间（仅 type_topic 分区模式下参与路由）
+
+
+def topic_namespace(topic: Optional[str]) -> str:
+    """主题 → 集合名可用的短命名空间"""
+    topic = (topic or "").strip().lower()
+    if not topic:
+        return "default"
+    return "t" + hashlib.md5(topic.encode("utf-8")).hexdigest()[:10]
+
+
+def build_where(flat: Dict[str, Any]) -> Optional[Dict]:
+    """等值条件字典 → Chroma where（多条件使用 $and）"""
+    if not flat:
+        return None
+    if len(flat) == 1:
+        return dict(flat)
+    return {"$and": [{k: v} for k, v in flat.items()]}
 
 
 class ChromaManager:
-    """ChromaDB管理器"""
-    
-    def __init__(self, persist_dir: str):
-        logger.info(f"初始化ChromaDB: {persist_dir}")
+    """ChromaDB管理器
+
+    分区模式（partition_mode）：
+    - single：全部写入 paper_knowledge（默认，兼容旧数据）
+    - type：按 metadata.type 拆分为 paper_knowledge__{type}
+    - type_topic：再按主题命名空间拆分为 paper_knowledge__{type}__{namespace}
+
+    写入按元数据路由到目标集合；检索时 where 中用于路由的键（type/topic）被剥离，
+    仅查询命中的集合并按距离合并结果，调用方无需感知分区。
+
+    指定 server_host 时连接 Chroma 服务端（分布式模式下多个进程共享同一知识库），否则使用本地持久化目录。
+    """
+
+    def __init__(
+        self,
+        persist_dir: str,
+        hot_cache: bool = False,
+        partition_mode: str = "single",
+        server_host: str = "",
+        server_port: int = 8000
+    ):
+        logger.info(f"初始化ChromaDB: {f'{server_host}:{server_port}' if server_host else persist_dir}")
+        if partition_mode not in PARTITION_MODES:
+            raise ValueError(f"未知的分区模式: {partition_mode}")
+        self._persist_dir = persist_dir
+        self._remote = bool(server_host)
+        self._partition_mode = partition_mode
         # 屏蔽 ChromaDB 内部的 "Add of existing embedding ID" 噪声日志
         logging.getLogger("chromadb").setLevel(logging.ERROR)
-        
-        self.client = chromadb.PersistentClient(
-            path=persist_dir,
-            settings=ChromaSettings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
-        
-        self.collection = self.client.get_or_create_collection(
-            name="paper_knowledge",
-            metadata={"description": "论文知识库"}
+        # 延迟导入：chromadb 导入开销较大，仅在真正初始化时加载
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        chroma_settings = ChromaSettings(
+            anonymized_telemetry=False,
+            allow_reset=True
         )
-        logger.success("ChromaDB初始化完成")
-    
+        if server_host:
+            self.client = chromadb.HttpClient(host=server_host, port=server_port, settings=chroma_settings)
+        else:
+            self.client = chromadb.PersistentClient(path=persist_dir, settings=chroma_settings)
+
+        self._collections: Dict[str, Any] = {}
+        self._recover_compaction()
+        self.collection = self._get_collection(BASE_COLLECTION)
+        # 可选的进程内向量热缓存（Chroma 仍为持久化事实来源）
+        self._hot: Optional[VectorHotCache] = None
+        if hot_cache and server_host:
+            # 其它进程的写入不会同步到本进程缓存，共享服务端时禁用
+            logger.warning("已连接 Chroma 服务端，忽略向量热缓存配置")
+        elif hot_cache:
+            # 集合按 Chroma 默认度量（l2）创建，缓存使用相同度量；type_topic 模式下 topic 与集合路由一样按命名空间比较
+            normalizers = {"topic": topic_namespace} if partition_mode == "type_topic" else None
+            self._hot = VectorHotCache(partition_key="type", space="l2", normalizers=normalizers)
+            self.warm_load()
+        logger.success(f"ChromaDB初始化完成（分区模式: {partition_mode}）")
+
+    # ---------- 分区路由 ----------
+
+    def _get_collection(self, name: str):
+        col = self._collections.get(name)
+        if col is None:
+            col = self.client.get_or_create_collection(
+                name=name,
+                metadata={"description": "论文知识库"}
+            )
+            self._collections[name] = col
+        return col
+
+    def _route_name(self, meta: Optional[Dict]) -> str:
+        """根据元数据确定写入集合"""
+        if self._partition_mode == "single":
+            return BASE_COLLECTION
+        meta = meta or {}
+        name = self._type_prefix(meta.get("type"))
+        if self._partition_mode == "type_topic":
+            name += f"__{topic_namespace(meta.get('topic'))}"
+        return name
+
+    @staticmethod
+    def _type_prefix(type_val: Any) -> str:
+        type_part = re.sub(r"[^a-zA-Z0-9_-]", "_", str(type_val or "misc"))
+        return f"{BASE_COLLECTION}__{type_part}"
+
+    def _partition_names(self) -> List[str]:
+        """当前模式下存储数据的全部集合名"""
+        if self._partition_mode == "single":
+            return [BASE_COLLECTION]
+        prefix = f"{BASE_COLLECTION}__"
+        depth = 1 if self._partition_mode == "type" else 2
+        names = []
+        for c in self.client.list_collections():
+            name = c if isinstance(c, str) else c.name
+            # 仅返回与当前模式层级一致的分区，忽略其它模式遗留的集合与压缩临时集合
+            if name.endswith(COMPACT_SUFFIX):
+                continue
+            if name.startswith(prefix) and len(name[len(prefix):].split("__")) == depth:
+                names.append(name)
+        return sorted(names)
+
+    def _resolve(self, where: Optional[Dict], namespace: Optional[str] = None) -> Tuple[List[str], Optional[Dict]]:
+        """解析查询应命中的集合与剥离路由键后的剩余 where"""
+        if self._partition_mode == "single":
+            return [BASE_COLLECTION], where
+        flat = flatten_where(where)
+        if flat is None:
+            # 复杂条件无法路由，交由全部分区各自过滤
+            return self._partition_names(), where
+        flat = dict(flat)
+        type_val = flat.pop("type", None)
+        topic_val = flat.pop("topic", None) if self._partition_mode == "type_topic" else None
+        if topic_val is None and self._partition_mode == "type_topic":
+            topic_val = namespace
+
+        names = self._partition_names()
+        if type_val is not None:
+            prefix = self._type_prefix(type_val)
+            if self._partition_mode == "type":
+                names = [n for n in names if n == prefix]
+            elif topic_val is not None:
+                names = [n for n in names if n == f"{prefix}__{topic_namespace(topic_val)}"]
+            else:
+                names = [n for n in names if n.startswith(prefix + "__")]
+        elif topic_val is not None:
+            suffix = f"__{topic_namespace(topic_val)}"
+            names = [n for n in names if n.endswith(suffix)]
+        return names, build_where(flat)
+
+    def _query(
+        self,
+        names: List[str],
+        query_embeddings: List[List[float]],
+        n_results: int,
+        where: Optional[Dict],
+        include: List[str]
+    ) -> Dict:
+        """在若干集合上执行查询，按距离合并为单一结果"""
+        fields = ["ids", *include]
+        if len(names) == 1:
+            return self._get_collection(names[0]).query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=include
+            )
+        merged: Dict[str, List] = {f: [[] for _ in query_embeddings] for f in fields}
+        if not names:
+            return merged
+        rows: List[List[Tuple]] = [[] for _ in query_embeddings]
+        for name in names:
+            res = self._get_collection(name).query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=include
+            )
+            for r in range(len(query_embeddings)):
+                cols = [res[f][r] if res.get(f) is not None else [] for f in fields]
+                rows[r].extend(zip(*cols))
+        dist_idx = fields.index("distances")
+        for r, hits in enumerate(rows):
+            hits.sort(key=lambda h: h[dist_idx])
+            for j, f in enumerate(fields):
+                merged[f][r] = [h[j] for h in hits[:n_results]]
+        return merged
+
+    # ---------- 写入 ----------
+
+    def warm_load(self, page_size: int = 1000) -> int:
+        """从 Chroma 分页加载全部向量到热缓存，返回加载条数"""
+        if self._hot is None:
+            return 0
+        self._hot.clear()
+        total = 0
+        for name in self._partition_names():
+            for page in self._iter_pages(self._get_collection(name), page_size):
+                self._hot.upsert(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+                total += len(page["ids"])
+        self._hot.log_stats()
+        return total
+
+    @staticmethod
+    def _iter_pages(collection, page_size: int = 1000):
+        """分页遍历集合全部记录"""
+        offset = 0
+        while True:
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            yield page
+            offset += len(ids)
+            if len(ids) < page_size:
+                break
+
+    def _group_by_route(self, metadatas: List[Dict]) -> Dict[str, List[int]]:
+        groups: Dict[str, List[int]] = {}
+        for i, meta in enumerate(metadatas):
+            groups.setdefault(self._route_name(meta), []).append(i)
+        return groups
+
+    @traced("chroma.add_papers", size_arg="ids")
     def add_papers(
         self,
         ids: List[str],
@@ -36,26 +264,33 @@ class ChromaManager:
         metadatas: List[Dict]
     ):
         """添加论文"""
-        self.collection.upsert(
-            ids=ids,
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas
-        )
+        for name, idx in self._group_by_route(metadatas).items():
+            self._get_collection(name).upsert(
+                ids=[ids[i] for i in idx],
+                embeddings=[embeddings[i] for i in idx],
+                documents=[documents[i] for i in idx],
+                metadatas=[metadatas[i] for i in idx]
+            )
+        if self._hot is not None:
+            self._hot.upsert(ids, embeddings, documents, metadatas)
         logger.info(f"添加 {len(ids)} 篇论文到知识库")
 
-    def get_documents_by_ids(self, ids: List[str]) -> Dict[str, Optional[str]]:
+    @traced("chroma.get_documents_by_ids", size_arg="ids")
+    def get_documents_by_ids(self, ids: List[str], collection_name: Optional[str] = None) -> Dict[str, Optional[str]]:
         """按ID批量获取已存文档内容，未命中返回None"""
         if not ids:
             return {}
-        res = self.collection.get(ids=ids, include=["documents"])
         out: Dict[str, Optional[str]] = {i: None for i in ids}
-        got_ids = res.get("ids", []) or []
-        docs_list = res.get("documents", []) or []
-        for i, doc in zip(got_ids, docs_list, strict=False):
-            out[i] = doc
+        names = [collection_name] if collection_name else self._partition_names()
+        for name in names:
+            res = self._get_collection(name).get(ids=ids, include=["documents"])
+            got_ids = res.get("ids", []) or []
+            docs_list = res.get("documents", []) or []
+            for i, doc in zip(got_ids, docs_list, strict=False):
+                out[i] = doc
         return out
 
+    @traced("chroma.upsert_if_changed", size_arg="ids")
     def upsert_if_changed(
         self,
         ids: List[str],
@@ -66,47 +301,305 @@ class ChromaManager:
         """仅在不存在或文档内容变化时写入，返回 (跳过数, 写入数)"""
         if not ids:
             return (0, 0)
-        current = self.get_documents_by_ids(ids)
-        to_upsert_idx: List[int] = []
         skipped = 0
-        for idx, _id in enumerate(ids):
-            existing = current.get(_id)
-            if existing is None or existing != documents[idx]:
-                to_upsert_idx.append(idx)
-            else:
-                skipped += 1
-        if to_upsert_idx:
+        written = 0
+        for name, idx_list in self._group_by_route(metadatas).items():
+            current = self.get_documents_by_ids([ids[i] for i in idx_list], collection_name=name)
+            to_upsert_idx: List[int] = []
+            for idx in idx_list:
+                existing = current.get(ids[idx])
+                if existing is None or existing != documents[idx]:
+                    to_upsert_idx.append(idx)
+                else:
+                    skipped += 1
+            if not to_upsert_idx:
+                continue
             sub_ids = [ids[i] for i in to_upsert_idx]
             sub_emb = [embeddings[i] for i in to_upsert_idx]
             sub_docs = [documents[i] for i in to_upsert_idx]
             sub_meta = [metadatas[i] for i in to_upsert_idx]
-            self.collection.upsert(
+            self._get_collection(name).upsert(
                 ids=sub_ids,
                 embeddings=sub_emb,
                 documents=sub_docs,
                 metadatas=sub_meta
             )
-            logger.info(f"知识库写入完成（更新/新增 {len(sub_ids)}，跳过 {skipped}）")
-            return (skipped, len(sub_ids))
-        logger.info(f"知识库写入跳过（全部未变化，共 {skipped}）")
-        return (skipped, 0)
-    
+            if self._hot is not None:
+                self._hot.upsert(sub_ids, sub_emb, sub_docs, sub_meta)
+            written += len(sub_ids)
+        if written:
+            logger.info(f"知识库写入完成（更新/新增 {written}，跳过 {skipped}）")
+        else:
+            logger.info(f"知识库写入跳过（全部未变化，共 {skipped}）")
+        return (skipped, written)
+
+    # ---------- 检索 ----------
+
+    def _hot_where(self, where: Optional[Dict], namespace: Optional[str]) -> Optional[Dict]:
+        """热缓存查询条件：type_topic 模式下将命名空间转为 topic 等值条件（缓存按 topic_namespace 比较）"""
+        if self._partition_mode != "type_topic" or namespace is None:
+            return where
+        flat = flatten_where(where)
+        if flat is None or "topic" in flat:
+            return where
+        return build_where({**flat, "topic": namespace})
+
+    @traced("chroma.retrieve_similar")
     def retrieve_similar(
         self,
         query_embedding: List[float],
         n_results: int = 5,
-        where: Optional[Dict] = None
+        where: Optional[Dict] = None,
+        include_embeddings: bool = False,
+        namespace: Optional[str] = None
     ) -> Dict:
-        """检索相似论文"""
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            where=where,
-            include=["documents", "metadatas", "distances"]
-        )
+        """检索相似论文（include_embeddings=True 时一并返回向量，供去重/MMR使用）"""
+        hot_where = self._hot_where(where, namespace)
+        if self._hot is not None and self._hot.supports(hot_where):
+            return self._hot.query([query_embedding], n_results, hot_where, include_embeddings)
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        names, residual = self._resolve(where, namespace)
+        results = self._query(names, [query_embedding], n_results, residual, include)
         return results
-    
+
+    @traced("chroma.retrieve_batch", size_arg="requests")
+    def retrieve_batch(
+        self,
+        requests: List[RetrievalRequest],
+        include_embeddings: bool = False
+    ) -> List[Dict]:
+        """批量检索：按 where 过滤条件分组，每组一次 query（多条 query_embeddings）。
+
+        返回与 requests 一一对应的结果，每条结果与 retrieve_similar 的单查询格式一致。
+        """
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+
+        groups: Dict[str, List[int]] = {}
+        for i, req in enumerate(requests):
+            key = json.dumps([req.where, req.namespace], sort_keys=True, ensure_ascii=False)
+            groups.setdefault(key, []).append(i)
+
+        out: List[Dict] = [{} for _ in requests]
+        for idx_list in groups.values():
+            where = requests[idx_list[0]].where
+            namespace = requests[idx_list[0]].namespace
+            n_max = max(requests[i].n_results for i in idx_list)
+            embeddings = [requests[i].query_embedding for i in idx_list]
+            hot_where = self._hot_where(where, namespace)
+            if self._hot is not None and self._hot.supports(hot_where):
+                res = self._hot.query(embeddings, n_max, hot_where, include_embeddings)
+            else:
+                names, residual = self._resolve(where, namespace)
+                res = self._query(names, embeddings, n_max, residual, include)
+            for row, i in enumerate(idx_list):
+                k = requests[i].n_results
+                single: Dict = {}
+                for field in ["ids", *include]:
+                    values = res.get(field)
+                    single[field] = [list(values[row][:k])] if values is not None and len(values) > row else [[]]
+                out[i] = single
+        logger.debug(f"批量检索 {len(requests)} 条请求，合并为 {len(groups)} 次查询")
+        return out
+
+    # ---------- 维护 ----------
+
+    @traced("chroma.count")
     def count(self) -> int:
         """统计论文数量"""
-        return self.collection.count()
+        return sum(self._get_collection(n).count() for n in self._partition_names())
+
+    @traced("chroma.delete", size_arg="ids")
+    def delete(self, ids: List[str]) -> int:
+        """按ID删除条目，返回删除数"""
+        if not ids:
+            return 0
+        for name in self._partition_names():
+            self._get_collection(name).delete(ids=ids)
+        if self._hot is not None:
+            self._hot.delete(ids)
+        return len(ids)
+
+    def list_section_runs(self) -> Dict[str, Dict]:
+        """列出知识库中的章节运行：{run_id: {"ids": [...], "created_at": float}}"""
+        names, residual = self._resolve({"type": "section"})
+        runs: Dict[str, Dict] = {}
+        for name in names:
+            res = self._get_collection(name).get(where=residual, include=["metadatas"])
+            for _id, meta in zip(res.get("ids", []) or [], res.get("metadatas", []) or [], strict=False):
+                meta = meta or {}
+                run_id = str(meta.get("run_id", ""))
+                info = runs.setdefault(run_id, {"ids": [], "created_at": 0.0})
+                info["ids"].append(_id)
+                info["created_at"] = max(info["created_at"], float(meta.get("created_at", 0.0) or 0.0))
+        return runs
+
+    def apply_section_retention(
+        self,
+        policy: str,
+        current_run_id: Optional[str] = None,
+        keep_runs: int = 10,
+        ttl_hours: float = 72.0
+    ) -> int:
+        """按保留策略清理章节向量，返回删除条数
+
+        - keep_all：不清理
+        - drop_on_finish：删除 current_run_id 的章节
+        - keep_last_n：仅保留最近 keep_runs 次运行
+        - ttl：删除早于 ttl_hours 的运行（缺少 created_at 的旧数据按 run_id 时间戳推断）
+        """
+        if policy == "keep_all":
+            return 0
+        runs = self.list_section_runs()
+        if not runs:
+            return 0
+
+        doomed: List[str] = []
+        if policy == "drop_on_finish":
+            if current_run_id and current_run_id in runs:
+                doomed = [current_run_id]
+        elif policy == "keep_last_n":
+            ordered = sorted(runs, key=lambda r: (self._run_time(r, runs[r]), r), reverse=True)
+            doomed = ordered[max(keep_runs, 0):]
+        elif policy == "ttl":
+            cutoff = time.time() - ttl_hours * 3600
+            doomed = [r for r, info in runs.items() if self._run_time(r, info) < cutoff]
+        else:
+            raise ValueError(f"未知的章节保留策略: {policy}")
+
+        # 当前运行若尚未结束，不参与 keep_last_n/ttl 清理
+        if policy != "drop_on_finish" and current_run_id in doomed:
+            doomed.remove(current_run_id)
+        ids = [i for r in doomed for i in runs[r]["ids"]]
+        removed = self.delete(ids)
+        if removed:
+            logger.info(f"章节向量清理（{policy}）：删除 {len(doomed)} 次运行，共 {removed} 条")
+        return removed
+
+    @staticmethod
+    def _run_time(run_id: str, info: Dict) -> float:
+        """运行时间：优先 created_at 元数据，否则从 run_id 前缀（%Y%m%d_%H%M%S）解析"""
+        if info.get("created_at"):
+            return float(info["created_at"])
+        try:
+            return datetime.strptime(run_id[:15], "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            return 0.0
+
+    def disk_usage(self) -> int:
+        """持久化目录占用字节数"""
+        total = 0
+        for root, _dirs, files in os.walk(self._persist_dir):
+            for f in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, f))
+                except OSError:
+                    pass
+        return total
+
+    def compact(self, page_size: int = 1000) -> Dict[str, int]:
+        """重建各分区集合与 HNSW 索引，删除旧索引目录并 VACUUM SQLite，返回前后条数与磁盘占用
+
+        删除集合时 Chroma 不会移除其 HNSW 段目录，SQLite 释放的页也只会被复用而不会归还，
+        因此重建后需清理不再被 segments 表引用的段目录并执行 VACUUM，磁盘占用才会下降。
+        连接 Chroma 服务端时只重建集合，空间回收由服务端负责。
+        """
+        before = {"count": self.count(), "bytes": self.disk_usage()}
+        for name in self._partition_names():
+            self._compact_collection(name, page_size)
+        if not self._remote:
+            self._reclaim_local_space()
+        after = {"count": self.count(), "bytes": self.disk_usage()}
+        logger.success(
+            f"集合压缩完成：{before['count']} → {after['count']} 条，"
+            f"{before['bytes'] / 1e6:.1f}MB → {after['bytes'] / 1e6:.1f}MB"
+        )
+        return {
+            "count_before": before["count"],
+            "count_after": after["count"],
+            "bytes_before": before["bytes"],
+            "bytes_after": after["bytes"],
+        }
+
+    def _compact_collection(self, name: str, page_size: int) -> None:
+        source = self._get_collection(name)
+        tmp_name = f"{name}{COMPACT_SUFFIX}"
+        try:
+            self.client.delete_collection(tmp_name)
+        except Exception:
+            pass
+        tmp = self.client.create_collection(name=tmp_name, metadata=source.metadata)
+        for page in self._iter_pages(source, page_size):
+            tmp.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+
+        self.client.delete_collection(name)
+        tmp.modify(name=name)
+        self._collections[name] = self.client.get_collection(name)
+        if name == BASE_COLLECTION:
+            self.collection = self._collections[name]
+
+    def _recover_compaction(self) -> None:
+        """处理中断的压缩遗留的临时集合
+
+        原集合仍在时临时集合可能只复制了一部分，直接删除；原集合已删除而改名未完成时，
+        临时集合已含全部数据，改回原名。
+        """
+        names = {c if isinstance(c, str) else c.name for c in self.client.list_collections()}
+        for tmp_name in sorted(n for n in names if n.endswith(COMPACT_SUFFIX)):
+            name = tmp_name[:-len(COMPACT_SUFFIX)]
+            if name in names:
+                self.client.delete_collection(tmp_name)
+                logger.warning(f"删除中断压缩遗留的临时集合: {tmp_name}")
+            else:
+                self.client.get_collection(tmp_name).modify(name=name)
+                logger.warning(f"恢复中断压缩的集合: {tmp_name} → {name}")
+
+    def _reclaim_local_space(self) -> None:
+        """删除孤立的段目录并 VACUUM 本地 SQLite"""
+        db_path = os.path.join(self._persist_dir, "chroma.sqlite3")
+        if not os.path.exists(db_path):
+            return
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+            removed = 0
+            for entry in os.scandir(self._persist_dir):
+                if not entry.is_dir() or entry.name in live:
+                    continue
+                try:
+                    uuid.UUID(entry.name)
+                except ValueError:
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        logger.info(f"已删除 {removed} 个孤立段目录并完成 SQLite VACUUM")
 
+    def migrate_partitions(self, drop_source: bool = False, page_size: int = 1000) -> Dict[str, int]:
+        """将单集合 paper_knowledge 中的旧数据按当前分区模式迁移，返回各目标集合写入数"""
+        if self._partition_mode == "single":
+            raise ValueError("single 模式无需迁移，请先设置 CHROMA_PARTITION_MODE=type 或 type_topic")
+        moved: Dict[str, int] = {}
+        for page in self._iter_pages(self.collection, page_size):
+            metas = [m or {} for m in page["metadatas"]]
+            for name, idx in self._group_by_route(metas).items():
+                self._get_collection(name).upsert(
+                    ids=[page["ids"][i] for i in idx],
+                    embeddings=[page["embeddings"][i] for i in idx],
+                    documents=[page["documents"][i] for i in idx],
+                    metadatas=[metas[i] for i in idx]
+                )
+                moved[name] = moved.get(name, 0) + len(idx)
+        if drop_source:
+            self.client.delete_collection(BASE_COLLECTION)
+            self._collections.pop(BASE_COLLECTION, None)
+            self.collection = self._get_collection(BASE_COLLECTION)
+        if self._hot is not None:
+            self.warm_load()
+        logger.success(f"分区迁移完成：{sum(moved.values())} 条 → {len(moved)} 个集合")
+        return moved
@@ -0,0 +1,294 @@
+"""章节上下文打包：合并候选片段、近重复去重、MMR 排序并按 token 预算装填"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+from loguru import logger
+import numpy as np
+
+
+@dataclass
+class ContextSnippet:
+    """候选上下文片段"""
+    id: str
+    text: str
+    source: str  # 来源标签：prev/summary/analysis/paper
+    embedding: Optional[List[float]] = None
+    relevance: float = 0.0  # 与查询的余弦相似度（打包时计算）
+    meta: Dict = field(default_factory=dict)
+
+
+class TokenCounter:
+    """基于 tiktoken 的 token 计数器，缺失依赖时退化为字符估算"""
+
+    _encoders: Dict[str, object] = {}
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._enc = self._load_encoder(model_name)
+
+    @classmethod
+    def _load_encoder(cls, model_name: str):
+        if model_name in cls._encoders:
+            return cls._encoders[model_name]
+        enc = None
+        try:
+            import tiktoken
+            try:
+                enc = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                # 非 OpenAI 模型（glm/deepseek/qwen 等）统一用 cl100k_base 近似
+                enc = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken 不可用，token 计数退化为字符估算: {e}")
+        cls._encoders[model_name] = enc
+        return enc
+
+    def count(self, text: str) -> int:
+        """统计文本 token 数"""
+        if not text:
+            return 0
+        if self._enc is not None:
+            return len(self._enc.encode(text, disallowed_special=()))
+        # 估算：CJK 字符约 1 token/字，其余约 4 字符/token
+        cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+        return cjk + max(1, (len(text) - cjk) // 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """按 token 上限截断文本，被截断时追加省略号"""
+        if max_tokens <= 0:
+            return ""
+        if self._enc is not None:
+            tokens = self._enc.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self._enc.decode(tokens[:max_tokens]).rstrip("�") + "..."
+        if self.count(text) <= max_tokens:
+            return text
+        # 二分查找满足预算的最长前缀
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count(text[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + "..."
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    compact = "".join(text.split())
+    if len(compact) <= n:
+        return {compact}
+    return {compact[i:i + n] for i in range(len(compact) - n + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextPacker:
+    """上下文打包器
+
+    流程：合并候选 → 近重复去重（向量余弦或字符 shingle Jaccard）
+    → MMR 兼顾相关性与多样性排序 → 按 token 预算逐条装填。
+    preferred_sources 中的来源在近重复冲突时优先保留（如携带引用编号的核心论文片段，
+    不应被知识库中同一篇论文的分析副本挤掉）。
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        budget_tokens: int,
+        snippet_tokens: int = 200,
+        mmr_lambda: float = 0.7,
+        dedup_threshold: float = 0.92,
+        preferred_sources: Sequence[str] = (),
+    ):
+        self.counter = TokenCounter(model_name)
+        self.budget_tokens = budget_tokens
+        self.snippet_tokens = snippet_tokens
+        self.mmr_lambda = mmr_lambda
+        self.dedup_threshold = dedup_threshold
+        self.preferred_sources = frozenset(preferred_sources)
+
+    def pack(self, query_embedding: Sequence[float], candidates: List[ContextSnippet]) -> List[ContextSnippet]:
+        """返回装填后的片段（按 MMR 选择顺序），片段文本已按 token 截断"""
+        candidates = [c for c in candidates if c.text and c.text.strip()]
+        if not candidates:
+            return []
+
+        sim = self._similarity_matrix(query_embedding, candidates)
+        keep = self._dedup(candidates, sim)
+        order = self._mmr(candidates, sim, keep)
+
+        packed: List[ContextSnippet] = []
+        used = 0
+        for idx in order:
+            snippet = candidates[idx]
+            text = self.counter.truncate(snippet.text, self.snippet_tokens)
+            cost = self.counter.count(text)
+            if used + cost > self.budget_tokens:
+                remaining = self.budget_tokens - used
+                # 剩余预算足够装下有意义的片段时截断装入，否则跳过尝试更短的候选
+                if remaining < min(64, self.snippet_tokens):
+                    continue
+                text = self.counter.truncate(snippet.text, remaining)
+                cost = self.counter.count(text)
+            used += cost
+            packed.append(ContextSnippet(
+                id=snippet.id,
+                text=text,
+                source=snippet.source,
+                embedding=snippet.embedding,
+                relevance=snippet.relevance,
+                meta=snippet.meta,
+            ))
+            if used >= self.budget_tokens:
+                break
+        logger.debug(f"上下文打包：候选 {len(candidates)}，去重后 {len(keep)}，装入 {len(packed)}，约 {used}/{self.budget_tokens} tokens")
+        return packed
+
+    def _similarity_matrix(self, query_embedding: Sequence[float], candidates: List[ContextSnippet]) -> Optional[np.ndarray]:
+        """计算候选间余弦相似度，并写入各候选的查询相关性；缺少向量时返回 None"""
+        if any(c.embedding is None for c in candidates):
+            for rank, c in enumerate(candidates):
+                # 无向量时按检索原始顺序赋递减相关性
+                c.relevance = 1.0 / (1 + rank)
+            return None
+        mat = _normalize(np.asarray([c.embedding for c in candidates], dtype=np.float32))
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        rel = mat @ q
+        for c, r in zip(candidates, rel.tolist()):
+            c.relevance = float(r)
+        return mat @ mat.T
+
+    def _dedup(self, candidates: List[ContextSnippet], sim: Optional[np.ndarray]) -> List[int]:
+        """优先来源在前、其余按相关性从高到低保留，去除与已保留片段近重复的候选"""
+        order = sorted(
+            range(len(candidates)),
+            key=lambda i: (candidates[i].source in self.preferred_sources, candidates[i].relevance),
+            reverse=True,
+        )
+        keep: List[int] = []
+        shingles = None if sim is not None else [_shingles(c.text) for c in candidates]
+        seen_ids = set()
+        for i in order:
+            if candidates[i].id in seen_ids:
+                continue
+            dup = False
+            for j in keep:
+                score = float(sim[i, j]) if sim is not None else _jaccard(shingles[i], shingles[j])
+                if score >= self.dedup_threshold:
+                    dup = True
+                    break
+            if not dup:
+                keep.append(i)
+                seen_ids.add(candidates[i].id)
+        return keep
+
+    def _mmr(self, candidates: List[ContextSnippet], sim: Optional[np.ndarray], pool: List[int]) -> List[int]:
+        """最大边际相关性排序"""
+        if sim is None:
+            return list(pool)
+        remaining = list(pool)
+        selected: List[int] = []
+        lam = self.mmr_lambda
+        while remaining:
+            best, best_score = remaining[0], float("-inf")
+            for i in remaining:
+                redundancy = max((float(sim[i, j]) for j in selected), default=0.0)
+                score = lam * candidates[i].relevance - (1 - lam) * redundancy
+                if score > best_score:
+                    best, best_score = i, score
+            selected.append(best)
+            remaining.remove(best)
+        return selected
+
+
+def assign_papers(
+    section_embeddings: Sequence[Sequence[float]],
+    papers: List[ContextSnippet],
+    per_section: int,
+) -> List[List[ContextSnippet]]:
+    """按章节查询向量为每章分配论文候选（每章按相关性降序）
+
+    先按 (论文, 章节) 相似度从高到低为每篇论文指定一个主章节（每章容量 max(per_section, ⌈论文数/章节数⌉)，
+    保证每篇论文至少进入一章），再用其余相关性最高的论文把每章补足到 per_section 篇。
+    per_section <= 0 或存在缺失向量时，每章都使用全部论文（由 MMR 自行筛选）。
+    """
+    n = len(section_embeddings)
+    if per_section <= 0 or not papers or any(p.embedding is None for p in papers):
+        return [list(papers) for _ in range(n)]
+    mat = _normalize(np.asarray([p.embedding for p in papers], dtype=np.float32))
+    queries = _normalize(np.asarray(section_embeddings, dtype=np.float32))
+    scores = mat @ queries.T  # (论文数, 章节数)
+
+    capacity = max(per_section, -(-len(papers) // n))
+    assigned: List[List[int]] = [[] for _ in range(n)]
+    placed = set()
+    for flat in np.argsort(-scores, axis=None, kind="stable").tolist():
+        paper, sec = divmod(flat, n)
+        if paper not in placed and len(assigned[sec]) < capacity:
+            assigned[sec].append(paper)
+            placed.add(paper)
+
+    out: List[List[ContextSnippet]] = []
+    for sec in range(n):
+        chosen = set(assigned[sec])
+        for paper in np.argsort(-scores[:, sec], kind="stable").tolist():
+            if len(chosen) >= per_section:
+                break
+            chosen.add(paper)
+        ranked = sorted(chosen, key=lambda i: -scores[i, sec])
+        out.append([papers[i] for i in ranked])
+    return out
+
+
+def group_papers(papers: List[ContextSnippet], batch_size: int) -> List[List[int]]:
+    """将论文按向量相似度贪心分组（每组不超过 batch_size 篇），返回各组的论文下标
+
+    依次以剩余论文中的第一篇为种子，取与其最相似的剩余论文补满一组；缺少向量时按原顺序等长分批。
+    """
+    batch_size = max(1, batch_size)
+    if any(p.embedding is None for p in papers):
+        return [list(range(i, min(i + batch_size, len(papers)))) for i in range(0, len(papers), batch_size)]
+    mat = _normalize(np.asarray([p.embedding for p in papers], dtype=np.float32)) if papers else None
+    remaining = np.ones(len(papers), dtype=bool)
+    groups: List[List[int]] = []
+    for seed in range(len(papers)):
+        if not remaining[seed]:
+            continue
+        scores = np.where(remaining, mat @ mat[seed], -np.inf)
+        scores[seed] = np.inf
+        members = np.argsort(-scores, kind="stable")[:batch_size]
+        members = [int(i) for i in members if remaining[i]]
+        remaining[members] = False
+        groups.append(sorted(members))
+    return groups
+
+
+def snippets_from_results(res: Dict, source: str) -> List[ContextSnippet]:
+    """将 Chroma query 结果（单查询）转换为候选片段"""
+    ids = (res.get("ids") or [[]])[0] or []
+    docs = (res.get("documents") or [[]])[0] or []
+    embs_all = res.get("embeddings")
+    embs = embs_all[0] if embs_all is not None and len(embs_all) else None
+    metas = (res.get("metadatas") or [[]])[0] or []
+    out: List[ContextSnippet] = []
+    for i, (_id, doc) in enumerate(zip(ids, docs)):
+        if doc is None:
+            continue
+        emb = None
+        if embs is not None and i < len(embs) and embs[i] is not None:
+            emb = list(embs[i])
+        meta = metas[i] if i < len(metas) and metas[i] else {}
+        out.append(ContextSnippet(id=_id, text=doc, source=source, embedding=emb, meta=meta))
+    return out
@@ -1,37 +1,83 @@
 """嵌入模型服务"""
 import os
 from typing import List, Optional
-from sentence_transformers import SentenceTransformer
 from loguru import logger
 
+from utils.tracing import traced
+
 
 class EmbeddingService:
-    """嵌入模型服务"""
+    """嵌入模型服务
+
+    backend:
+    - torch：SentenceTransformer（默认）
+    - onnx：onnxruntime CPU 推理（首次使用时自动导出并可选 int8 量化，校验与原模型的余弦一致性）
+    """
     
-    def __init__(self, model_name: str, cache_dir: str):
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str,
+        backend: str = "torch",
+        onnx_quantize: bool = True,
+        onnx_threads: int = 0,
+        onnx_min_cosine: float = 0.99
+    ):
         # 设置缓存目录
         os.environ['TRANSFORMERS_CACHE'] = cache_dir
         os.environ['HF_HOME'] = cache_dir
 
-        logger.info(f"加载嵌入模型: {model_name}")
+        logger.info(f"加载嵌入模型: {model_name} (backend={backend})")
+        self.model = None
+        self._onnx = None
+
+        if backend == "onnx":
+            try:
+                self._onnx = self._load_onnx(model_name, cache_dir, onnx_quantize, onnx_threads, onnx_min_cosine)
+                logger.success("嵌入模型加载完成(ONNX)")
+                return
+            except Exception as e:
+                logger.warning(f"ONNX 后端不可用，回退到 PyTorch: {e}")
+
+        self.model = self._load_sentence_transformer(model_name, cache_dir)
+
+    def _load_sentence_transformer(self, model_name: str, cache_dir: str):
+        """加载 SentenceTransformer：优先本地缓存/路径，失败再联机下载"""
+        from sentence_transformers import SentenceTransformer
 
-        # 优先尝试本地缓存/路径加载，失败再联机下载
         local_path = self._resolve_local_model_path(model_name, cache_dir)
         if local_path:
             try:
                 logger.info(f"优先从本地加载模型: {local_path}")
-                self.model = SentenceTransformer(local_path, cache_folder=cache_dir)
+                model = SentenceTransformer(local_path, cache_folder=cache_dir)
                 logger.success("嵌入模型加载完成(本地)")
-                return
+                return model
             except Exception as e:
                 logger.warning(f"本地加载失败，将尝试在线加载: {e}")
 
         # 在线加载（将自动落地到 cache_dir）
-        self.model = SentenceTransformer(model_name, cache_folder=cache_dir)
+        model = SentenceTransformer(model_name, cache_folder=cache_dir)
         logger.success("嵌入模型加载完成(在线)")
+        return model
+
+    def _load_onnx(self, model_name: str, cache_dir: str, quantize: bool, threads: int, min_cosine: float):
+        """加载已导出并通过校验的 ONNX 模型；不存在（或校验阈值低于当前配置）时借助 PyTorch 模型导出一次"""
+        from knowledge_base.onnx_embedding import OnnxEmbeddingBackend, export_onnx, load_export_config
+
+        slug = os.path.basename(os.path.normpath(model_name)).replace('/', '--')
+        onnx_dir = os.path.join(cache_dir, 'onnx', slug)
+        if load_export_config(onnx_dir, min_cosine) is None:
+            st_model = self._load_sentence_transformer(model_name, cache_dir)
+            # 一次导出同时生成 fp32 与 int8 模型，之后可按配置切换
+            export_onnx(st_model, onnx_dir, quantize=True, min_cosine=min_cosine)
+            del st_model
+        return OnnxEmbeddingBackend(onnx_dir, quantized=quantize, threads=threads)
     
+    @traced("embedding.encode", size_arg="texts")
     def encode(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
         """编码文本为向量"""
+        if self._onnx is not None:
+            return self._onnx.encode(texts, batch_size=batch_size).tolist()
         embeddings = self.model.encode(
             texts,
             batch_size=batch_size,
@@ -0,0 +1,82 @@
+"""知识库维护命令
+
+用法：
+    python -m knowledge_base.maintenance stats
+    python -m knowledge_base.maintenance retention [--policy keep_last_n] [--keep-runs 10] [--ttl-hours 72]
+    python -m knowledge_base.maintenance compact
+    python -m knowledge_base.maintenance migrate [--drop-source]
+    python -m knowledge_base.maintenance prune-content [--hours 72]
+    python -m knowledge_base.maintenance prune-sections [--hours 720]
+"""
+import argparse
+import json
+from config.settings import settings
+from knowledge_base.chroma_manager import ChromaManager
+from utils.logger import setup_logger
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ChromaDB 知识库维护")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="查看条目数、章节运行数与磁盘占用")
+
+    p_ret = sub.add_parser("retention", help="按保留策略清理章节向量")
+    p_ret.add_argument("--policy", default=settings.section_retention_policy,
+                       choices=["keep_all", "drop_on_finish", "keep_last_n", "ttl"])
+    p_ret.add_argument("--run-id", default=None, help="drop_on_finish 策略下要删除的运行ID")
+    p_ret.add_argument("--keep-runs", type=int, default=settings.section_retention_runs)
+    p_ret.add_argument("--ttl-hours", type=float, default=settings.section_retention_ttl_hours)
+
+    sub.add_parser("compact", help="重建集合与索引、回收磁盘空间并报告前后大小")
+
+    p_mig = sub.add_parser("migrate", help="将单集合旧数据迁移到当前分区模式（CHROMA_PARTITION_MODE）")
+    p_mig.add_argument("--drop-source", action="store_true", help="迁移后删除原 paper_knowledge 集合")
+
+    p_prune = sub.add_parser("prune-content", help="清理消息内容存储中的过期内容")
+    p_prune.add_argument("--hours", type=float, default=72.0, help="删除超过该时长的内容")
+
+    p_sec = sub.add_parser("prune-sections", help="清理章节复用缓存中的过期记录")
+    p_sec.add_argument("--hours", type=float, default=720.0, help="删除超过该时长的记录")
+
+    args = parser.parse_args(argv)
+    setup_logger()
+    if args.command == "prune-content":
+        from utils.content_store import content_store
+        removed = content_store.prune(args.hours)
+        print(json.dumps({"removed": removed}, ensure_ascii=False, indent=2))
+        return
+    if args.command == "prune-sections":
+        from utils.section_cache import section_cache
+        removed = section_cache.prune(args.hours)
+        print(json.dumps({"removed": removed}, ensure_ascii=False, indent=2))
+        return
+
+    chroma = ChromaManager(settings.chroma_persist_dir, partition_mode=settings.chroma_partition_mode)
+
+    if args.command == "stats":
+        runs = chroma.list_section_runs()
+        result = {
+            "count": chroma.count(),
+            "section_runs": len(runs),
+            "section_vectors": sum(len(r["ids"]) for r in runs.values()),
+            "bytes": chroma.disk_usage(),
+        }
+    elif args.command == "retention":
+        removed = chroma.apply_section_retention(
+            args.policy,
+            current_run_id=args.run_id,
+            keep_runs=args.keep_runs,
+            ttl_hours=args.ttl_hours,
+        )
+        result = {"policy": args.policy, "removed": removed, "count": chroma.count()}
+    elif args.command == "migrate":
+        result = chroma.migrate_partitions(drop_source=args.drop_source)
+    else:
+        result = chroma.compact()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
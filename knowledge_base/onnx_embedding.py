@@ -0,0 +1,179 @@
+"""ONNX Runtime 嵌入后端（CPU，可选 int8 动态量化）"""
+import json
+import os
+from typing import Dict, List, Optional
+from loguru import logger
+import numpy as np
+
+
+CONFIG_FILE = "onnx_config.json"
+
+# 导出后用于校验兼容性的探针句（中英混合，覆盖长短文本）
+_PROBE_TEXTS = [
+    "Transformer models improve machine translation quality.",
+    "多智能体系统中的任务分解与协作机制研究",
+    "A survey of retrieval-augmented generation for large language models.",
+    "基于强化学习的机器人路径规划方法，在仿真环境中将成功率提升了 15%。",
+    "Graph neural networks",
+]
+
+
+class OnnxEmbeddingBackend:
+    """基于 onnxruntime 的句向量编码（mean pooling，与 SentenceTransformer 输出对齐）
+
+    conf 为空时读取 model_dir 下的导出配置；导出校验阶段直接传入内存中的配置，配置文件只在校验通过后写入。
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, threads: int = 0, conf: Optional[Dict] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if conf is None:
+            with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+                conf = json.load(f)
+        use_quantized = quantized and conf.get("quantized_ok", False)
+        model_file = "model_int8.onnx" if use_quantized else "model.onnx"
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.inter_op_num_threads = 1
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=opts,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        self.max_length = int(conf.get("max_length", 128))
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.enable_padding(
+            pad_id=int(conf.get("pad_token_id", 0)),
+            pad_token=conf.get("pad_token", "[PAD]")
+        )
+        logger.info(f"ONNX 嵌入后端就绪: {model_file} (threads={threads or 'auto'})")
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """编码文本；按长度排序分批以减少 padding，输出保持原顺序"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            encs = self.tokenizer.encode_batch([texts[i] for i in idx])
+            input_ids = np.asarray([e.ids for e in encs], dtype=np.int64)
+            attention = np.asarray([e.attention_mask for e in encs], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            hidden = self.session.run(None, feeds)[0]
+            mask = attention[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            for row, i in enumerate(idx):
+                out[i] = pooled[row]
+        return np.stack(out).astype(np.float32)
+
+
+def _min_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float((a * b).sum(axis=1).min())
+
+
+def load_export_config(model_dir: str, min_cosine: float) -> Optional[Dict]:
+    """读取已完成校验的导出配置；缺失、损坏、未经校验或校验阈值低于 min_cosine 时返回 None（需重新导出）"""
+    try:
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            conf = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if conf.get("validated_min_cosine", -1.0) < min_cosine:
+        return None
+    return conf
+
+
+def _write_config(out_dir: str, conf: Dict) -> None:
+    """原子写入导出配置（先写临时文件再重命名），配置文件存在即代表导出与校验均已完成"""
+    path = os.path.join(out_dir, CONFIG_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(conf, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def export_onnx(st_model, out_dir: str, quantize: bool = True, min_cosine: float = 0.99) -> str:
+    """将 SentenceTransformer 导出为 ONNX（可选 int8 动态量化），并用探针句校验兼容性
+
+    校验通过后才写入 onnx_config.json；校验失败或导出中途退出时不留下配置，下次启动会重新导出。
+    """
+    import torch
+
+    os.makedirs(out_dir, exist_ok=True)
+    # 旧配置先移除：导出期间模型文件被覆盖，旧配置不再对应磁盘上的模型
+    try:
+        os.remove(os.path.join(out_dir, CONFIG_FILE))
+    except FileNotFoundError:
+        pass
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(out_dir)
+    max_length = int(getattr(st_model, "max_seq_length", 128) or 128)
+
+    dummy = tokenizer(["hello world"], return_tensors="pt")
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    logger.info(f"导出 ONNX 模型: {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"},
+            },
+            opset_version=14,
+            do_constant_folding=True,
+        )
+
+    conf = {
+        "max_length": max_length,
+        "pad_token_id": int(tokenizer.pad_token_id or 0),
+        "pad_token": tokenizer.pad_token or "[PAD]",
+        "pooling": "mean",
+        "quantized_ok": False,
+    }
+
+    reference = np.asarray(st_model.encode(_PROBE_TEXTS, show_progress_bar=False), dtype=np.float32)
+    fp32_cos = _min_cosine(OnnxEmbeddingBackend(out_dir, quantized=False, conf=conf).encode(_PROBE_TEXTS), reference)
+    conf["fp32_min_cosine"] = fp32_cos
+    if fp32_cos < min_cosine:
+        raise RuntimeError(f"ONNX 导出结果与原模型偏差过大（min cos={fp32_cos:.4f}）")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(out_dir, "model_int8.onnx")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        int8_cos = _min_cosine(
+            OnnxEmbeddingBackend(out_dir, quantized=True, conf={**conf, "quantized_ok": True}).encode(_PROBE_TEXTS),
+            reference
+        )
+        conf["int8_min_cosine"] = int8_cos
+        # 量化精度不达标时退回 fp32，保证与已有 Chroma 向量兼容
+        conf["quantized_ok"] = int8_cos >= min_cosine
+        if not conf["quantized_ok"]:
+            logger.warning(f"int8 量化模型偏差过大（min cos={int8_cos:.4f}），将使用 fp32 ONNX")
+
+    conf["validated_min_cosine"] = min_cosine
+    _write_config(out_dir, conf)
+    logger.success(f"ONNX 导出完成: {conf}")
+    return out_dir
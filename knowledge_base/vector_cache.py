@@ -0,0 +1,251 @@
+"""进程内向量热缓存：按 type 分区的连续 float32 矩阵 + NumPy 批量 top-k（距离度量与 Chroma 集合一致）"""
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from loguru import logger
+import numpy as np
+
+
+def flatten_where(where: Optional[Dict]) -> Optional[Dict[str, Any]]:
+    """将 Chroma where 条件展开为等值条件字典；含非等值算子时返回 None。
+
+    支持 {"k": v}、{"k": {"$eq": v}} 以及由它们组成的 {"$and": [...]}。
+    """
+    if not where:
+        return {}
+    flat: Dict[str, Any] = {}
+    for key, val in where.items():
+        if key == "$and":
+            for sub in val:
+                sub_flat = flatten_where(sub)
+                if sub_flat is None:
+                    return None
+                flat.update(sub_flat)
+        elif key.startswith("$"):
+            return None
+        elif isinstance(val, dict):
+            if set(val.keys()) != {"$eq"}:
+                return None
+            flat[key] = val["$eq"]
+        else:
+            flat[key] = val
+    return flat
+
+
+class _Partition:
+    """单个分区：预分配容量的连续矩阵（原始向量 + 模长平方），支持原地更新与交换删除
+
+    keys 保存各行用于过滤的元数据取值（经 normalizers 转换后），避免查询时逐行重复转换。
+    """
+
+    def __init__(self, dim: int, capacity: int = 256):
+        self.dim = dim
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.sq_norms = np.zeros(capacity, dtype=np.float32)
+        self.ids: List[str] = []
+        self.documents: List[Optional[str]] = []
+        self.metadatas: List[Dict] = []
+        self.keys: List[Dict] = []
+        self.index: Dict[str, int] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, _id: str, vec: np.ndarray, doc: Optional[str], meta: Dict, keys: Dict) -> None:
+        row = self.index.get(_id)
+        if row is None:
+            row = self.size
+            if row >= self.matrix.shape[0]:
+                grown = np.zeros((self.matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:row] = self.matrix[:row]
+                self.matrix = grown
+                self.sq_norms = np.concatenate([self.sq_norms, np.zeros_like(self.sq_norms)])
+            self.ids.append(_id)
+            self.documents.append(doc)
+            self.metadatas.append(meta)
+            self.keys.append(keys)
+            self.index[_id] = row
+        else:
+            self.documents[row] = doc
+            self.metadatas[row] = meta
+            self.keys[row] = keys
+        self.matrix[row] = vec
+        self.sq_norms[row] = float(vec @ vec)
+
+    def delete(self, _id: str) -> bool:
+        row = self.index.pop(_id, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if row != last:
+            # 与末行交换，保持矩阵连续
+            self.matrix[row] = self.matrix[last]
+            self.sq_norms[row] = self.sq_norms[last]
+            self.ids[row] = self.ids[last]
+            self.documents[row] = self.documents[last]
+            self.metadatas[row] = self.metadatas[last]
+            self.keys[row] = self.keys[last]
+            self.index[self.ids[row]] = row
+        self.ids.pop()
+        self.documents.pop()
+        self.metadatas.pop()
+        self.keys.pop()
+        return True
+
+
+class VectorHotCache:
+    """向量热缓存
+
+    Chroma 仍是持久化的唯一事实来源；本缓存在启动时从 Chroma 预热，
+    之后随 ChromaManager 的写入路径同步更新。
+
+    space 与所影子的集合的 hnsw:space 一致（Chroma 默认 l2，即欧氏距离平方；另支持 cosine、ip），
+    返回的 ids 顺序与 distances 数值与直接查询 Chroma 相同，可与未命中缓存的查询结果混用。
+    normalizers 为过滤字段指定取值转换（如 topic → 命名空间），条件值与存储值转换后再比较。
+    """
+
+    SPACES = ("l2", "cosine", "ip")
+
+    def __init__(self, partition_key: str = "type", space: str = "l2", normalizers: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        if space not in self.SPACES:
+            raise ValueError(f"热缓存不支持的距离度量: {space}")
+        self.partition_key = partition_key
+        self.space = space
+        self.normalizers: Dict[str, Callable[[Any], Any]] = dict(normalizers or {})
+        self._parts: Dict[str, _Partition] = {}
+
+    def __len__(self) -> int:
+        return sum(p.size for p in self._parts.values())
+
+    def _partition_of(self, meta: Optional[Dict]) -> str:
+        return str((meta or {}).get(self.partition_key, ""))
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[Optional[str]],
+        metadatas: Sequence[Optional[Dict]],
+    ) -> None:
+        """写入/更新条目（同一 id 换分区时先从旧分区移除）"""
+        if not ids:
+            return
+        mat = np.asarray(embeddings, dtype=np.float32)
+        for i, _id in enumerate(ids):
+            meta = dict(metadatas[i] or {})
+            keys = {k: fn(meta.get(k)) for k, fn in self.normalizers.items()}
+            part_name = self._partition_of(meta)
+            for name, part in self._parts.items():
+                if name != part_name and _id in part.index:
+                    part.delete(_id)
+            part = self._parts.get(part_name)
+            if part is None:
+                part = self._parts[part_name] = _Partition(mat.shape[1])
+            part.upsert(_id, mat[i], documents[i], meta, keys)
+
+    def delete(self, ids: List[str]) -> int:
+        """删除条目，返回实际删除数"""
+        removed = 0
+        for _id in ids:
+            for part in self._parts.values():
+                if part.delete(_id):
+                    removed += 1
+                    break
+        return removed
+
+    def clear(self) -> None:
+        self._parts.clear()
+
+    def supports(self, where: Optional[Dict]) -> bool:
+        """判断 where 条件能否由热缓存直接回答"""
+        return flatten_where(where) is not None
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int,
+        where: Optional[Dict] = None,
+        include_embeddings: bool = False,
+    ) -> Dict:
+        """批量 top-k，返回与 Chroma collection.query 相同结构的结果"""
+        flat = flatten_where(where)
+        if flat is None:
+            raise ValueError(f"热缓存不支持的过滤条件: {where}")
+        q = np.asarray(query_embeddings, dtype=np.float32)
+
+        if self.partition_key in flat:
+            part = self._parts.get(str(flat[self.partition_key]))
+            parts = [part] if part is not None else []
+        else:
+            parts = list(self._parts.values())
+        conds = {k: v for k, v in flat.items() if k != self.partition_key and k not in self.normalizers}
+        key_conds = {k: fn(flat[k]) for k, fn in self.normalizers.items() if k in flat and k != self.partition_key}
+
+        # 收集候选行（分区内按元数据等值条件过滤）
+        blocks = []
+        norm_blocks = []
+        refs = []
+        for part in parts:
+            n = part.size
+            if n == 0:
+                continue
+            if conds or key_conds:
+                rows = [
+                    r for r in range(n)
+                    if all(part.metadatas[r].get(k) == v for k, v in conds.items())
+                    and all(part.keys[r].get(k) == v for k, v in key_conds.items())
+                ]
+                if not rows:
+                    continue
+                blocks.append(part.matrix[rows])
+                norm_blocks.append(part.sq_norms[rows])
+                refs.extend((part, r) for r in rows)
+            else:
+                blocks.append(part.matrix[:n])
+                norm_blocks.append(part.sq_norms[:n])
+                refs.extend((part, r) for r in range(n))
+
+        out: Dict[str, List] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_embeddings:
+            out["embeddings"] = []
+        if not blocks:
+            for key in out:
+                out[key] = [[] for _ in range(len(q))]
+            return out
+
+        cand = blocks[0] if len(blocks) == 1 else np.concatenate(blocks, axis=0)
+        dist = self._distances(q, cand, np.concatenate(norm_blocks))  # (m, n)
+        k = min(n_results, cand.shape[0])
+        if k < cand.shape[0]:
+            top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(cand.shape[0]), (len(q), 1))
+        for row in range(len(q)):
+            sel = top[row]
+            sel = sel[np.argsort(dist[row, sel], kind="stable")]
+            hits = [refs[j] for j in sel]
+            out["ids"].append([p.ids[r] for p, r in hits])
+            out["documents"].append([p.documents[r] for p, r in hits])
+            out["metadatas"].append([p.metadatas[r] for p, r in hits])
+            out["distances"].append(dist[row, sel].tolist())
+            if include_embeddings:
+                out["embeddings"].append([p.matrix[r].tolist() for p, r in hits])
+        return out
+
+    def _distances(self, q: np.ndarray, cand: np.ndarray, cand_sq_norms: np.ndarray) -> np.ndarray:
+        """按 Chroma 的定义计算距离：l2 为欧氏距离平方，cosine 为 1 - cos，ip 为 1 - 内积"""
+        dots = q @ cand.T
+        if self.space == "ip":
+            return 1.0 - dots
+        q_sq = np.einsum("ij,ij->i", q, q)
+        if self.space == "cosine":
+            denom = np.sqrt(np.outer(q_sq, cand_sq_norms))
+            denom[denom == 0] = 1.0
+            return 1.0 - dots / denom
+        return np.maximum(q_sq[:, None] + cand_sq_norms[None, :] - 2.0 * dots, 0.0)
+
+    def stats(self) -> Dict[str, int]:
+        """各分区条目数"""
+        return {name or "<none>": part.size for name, part in self._parts.items()}
+
+    def log_stats(self) -> None:
+        logger.info(f"向量热缓存：共 {len(self)} 条，分区 {self.stats()}")
@@ -1,8 +1,21 @@
-"""主程序入口"""
+"""主程序入口
+
+用法：
+    python main.py                                  # 交互式输入主题
+    python main.py --topic "multi-agent systems"    # 无交互单主题
+    python main.py --batch topics.jsonl --concurrency 2
+    python main.py --topic "transformer" --profile  # 采样剖析 + 阶段内存快照，输出到 ./logs/profiles
+    python main.py --topic "transformer" --record   # 录制模型/arXiv/MCP 交互到 ./logs/cassettes
+    python main.py --replay logs/cassettes/xxx.jsonl.gz [--replay-timing recorded]  # 离线回放
+"""
+import argparse
 import asyncio
+from datetime import datetime
 from pathlib import Path
+from config.settings import settings
 from workflows.sequential_workflow import ResearchWorkflow
 from utils.logger import setup_logger
+from utils.cassette import cassette
 from loguru import logger
 
 
@@ -19,8 +32,41 @@ def init_directories():
         Path(d).mkdir(parents=True, exist_ok=True)
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="多智能体论文调研报告生成系统")
+    parser.add_argument("--topic", default=None, help="研究主题（指定后不再交互输入）")
+    parser.add_argument("--batch", default=None, help="主题文件（.txt/.json/.jsonl），批量无交互运行")
+    parser.add_argument("--concurrency", type=int, default=settings.batch_concurrency, help="批量模式并发主题数")
+    parser.add_argument("--timeout", type=float, default=settings.batch_topic_timeout_s, help="批量模式单主题超时（秒）")
+    parser.add_argument("--profile", action="store_true", help="剖析本次运行（火焰图与阶段内存快照输出到 ./logs/profiles）")
+    parser.add_argument("--record", nargs="?", const="", default=None, metavar="PATH",
+                        help="录制模型调用、arXiv 检索与 MCP 工具调用（默认写入 ./logs/cassettes）")
+    parser.add_argument("--replay", default=None, metavar="PATH", help="离线回放录制文件")
+    parser.add_argument("--replay-timing", choices=["fast", "recorded"], default="fast",
+                        help="回放节奏：fast 立即返回 / recorded 按录制时的耗时等待")
+    return parser.parse_args(argv)
+
+
+async def run_batch_mode(workflow: ResearchWorkflow, args: argparse.Namespace):
+    """批量模式：全部主题共享一个预热进程"""
+    from workflows.batch_runner import load_jobs, run_batch, write_summary
+
+    jobs = load_jobs(args.batch)
+    logger.info(f"批量模式：{len(jobs)} 个主题，并发 {args.concurrency}")
+    try:
+        results = await run_batch(workflow, jobs, concurrency=args.concurrency, timeout=args.timeout)
+    finally:
+        await workflow.stop()
+    summary_path = write_summary(results)
+    ok = sum(1 for r in results if r["status"] == "ok")
+    print(f"\n批量运行完成：成功 {ok}/{len(results)}，汇总: {summary_path.absolute()}\n")
+
+
 async def main():
     """主函数"""
+    args = parse_args()
+
     # 初始化日志
     setup_logger()
     
@@ -32,19 +78,56 @@ async def main():
     print("  基于 AutoGen 多智能体论文调研报告生成系统")
     print("="*60 + "\n")
     
+    if args.replay:
+        cassette.replay(args.replay, args.replay_timing)
+    elif args.record is not None:
+        default = Path(settings.cassette_dir) / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+        cassette.record(args.record or str(default))
+
+    profiler = None
+    if args.profile:
+        from utils.profiling import RunProfiler
+        profiler = RunProfiler()
+        profiler.start()
+
+    try:
+        await run(args, profiler)
+    finally:
+        if profiler is not None:
+            out_dir = profiler.stop()
+            print(f"\n剖析结果: {out_dir.absolute()}\n")
+        recorded = cassette.close()
+        if recorded is not None:
+            print(f"\n录制文件: {recorded.absolute()}\n")
+
+
+async def run(args: argparse.Namespace, profiler=None):
+    """创建工作流并执行单主题或批量模式"""
+    # 创建工作流并在后台预热嵌入模型/Chroma/模型客户端，与用户输入并行
+    workflow = ResearchWorkflow()
+    workflow.start_warmup()
+    if profiler is not None:
+        profiler.watch(workflow)
+
+    if args.batch:
+        await run_batch_mode(workflow, args)
+        return
+    
     # 输入研究主题
-    topic = input("请输入研究主题 (例如: machine learning, transformer): ").strip()
+    topic = args.topic
+    if not topic and cassette.replaying:
+        # 回放时默认使用录制时的主题
+        topic = next(iter(cassette.recorded_queries()), "")
+    topic = topic or input("请输入研究主题 (例如: machine learning, transformer): ").strip()
     
     if not topic:
         logger.error("主题不能为空")
+        workflow.shutdown()
         return
     
     logger.info(f"开始调研: {topic}")
     
     try:
-        # 创建工作流
-        workflow = ResearchWorkflow()
-        
         # 执行工作流
         await workflow.run(topic)
         
@@ -58,4 +141,3 @@ async def main():
 
 if __name__ == "__main__":
     asyncio.run(main())
-
@@ -0,0 +1,337 @@
+"""本地 HTTP 服务模式
+
+进程启动时预热 EmbeddingService、ChromaManager 与模型客户端，之后所有报告任务共享同一运行时，
+避免每次请求都重新加载模型。
+
+用法：
+    python server.py [--host 127.0.0.1] [--port 8080] [--workers 2] [--queue-size 16]
+
+接口：
+    POST /jobs                  提交任务 {"topic": ..., "max_papers": ..., "section_outline": [...]}，队列满时返回 429
+    GET  /jobs                  任务列表
+    GET  /jobs/{id}             任务状态
+    GET  /jobs/{id}/events      进度事件（SSE）
+    GET  /jobs/{id}/ws          进度事件（WebSocket）
+    GET  /reports               已生成报告列表
+    GET  /reports/{name}        下载报告
+    GET  /reviews               待审核的高风险论文（?all=1 包含已处理）
+    POST /reviews/{id}          审核作答 {"approved": true/false, "note": ...}
+    GET  /healthz               健康检查（含预热状态与队列长度）
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from aiohttp import web
+from loguru import logger
+
+from config.settings import settings
+from main import init_directories
+from services.review_queue import review_queue
+from utils.logger import setup_logger
+from utils.progress import progress_bus
+from workflows.sequential_workflow import ResearchWorkflow
+
+REPORTS_DIR = Path("./cache/reports")
+TERMINAL_STATES = ("done", "failed", "timeout")
+
+
+@dataclass
+class Job:
+    """服务模式中的单个报告任务"""
+    id: str
+    topic: str
+    max_papers: Optional[int] = None
+    section_outline: Optional[List[str]] = None
+    status: str = "queued"  # queued/running/done/failed/timeout
+    report: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def source(self) -> str:
+        # 作为 Agent 实例键与进度事件键
+        return f"job-{self.id}"
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["progress"] = progress_bus.history(self.source)[-1:] or None
+        return data
+
+
+class JobManager:
+    """有界任务队列 + 固定数量的工作协程"""
+
+    def __init__(
+        self,
+        workflow: ResearchWorkflow,
+        workers: int = 2,
+        queue_size: int = 16,
+        timeout: Optional[float] = None,
+        history: int = 200
+    ):
+        self.workflow = workflow
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.history = history
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"任务队列已启动：{self.workers} 个工作协程，队列上限 {self.queue.maxsize}")
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, topic: str, max_papers: Optional[int] = None, section_outline: Optional[List[str]] = None) -> Job:
+        """入队新任务，队列已满时抛出 asyncio.QueueFull"""
+        job = Job(id=uuid.uuid4().hex[:12], topic=topic, max_papers=max_papers, section_outline=section_outline)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        progress_bus.emit(job.source, "queued", topic=topic, position=self.queue.qsize())
+        self._evict()
+        return job
+
+    def _evict(self) -> None:
+        """只保留最近 history 个已结束任务"""
+        finished = [j for j in self.jobs.values() if j.status in TERMINAL_STATES]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            self.jobs.pop(job.id, None)
+            progress_bus.clear(job.source)
+
+    async def _worker(self, idx: int) -> None:
+        while True:
+            job: Job = await self.queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            progress_bus.emit(job.source, "started", topic=job.topic)
+            try:
+                path = await self.workflow.run_topic(
+                    job.topic,
+                    max_papers=job.max_papers,
+                    sections=job.section_outline,
+                    source=job.source,
+                    timeout=self.timeout,
+                )
+                job.status = "done"
+                job.report = path.name
+            except asyncio.TimeoutError:
+                # run_topic 超时时已向该运行的各 Agent 发布 AbortRun，不会继续占用共享运行时
+                job.status = "timeout"
+                logger.error(f"任务超时，已中止运行: {job.id} {job.topic}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.exception(f"任务失败: {job.id} {job.topic} - {e}")
+            finally:
+                job.finished_at = time.time()
+                self.queue.task_done()
+            progress_bus.emit(job.source, job.status, report=job.report, error=job.error)
+            logger.info(f"[worker-{idx}] 任务 {job.id} 结束: {job.status}")
+
+
+def _get_job(request: web.Request) -> Job:
+    job = request.app["jobs"].jobs.get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text="job not found")
+    return job
+
+
+async def create_job(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="invalid json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="json object expected")
+    topic = body.get("topic") or ""
+    if not isinstance(topic, str) or not topic.strip():
+        raise web.HTTPBadRequest(text="topic is required")
+    max_papers = body.get("max_papers")
+    # bool 是 int 的子类，需单独排除
+    if max_papers is not None and (isinstance(max_papers, bool) or not isinstance(max_papers, int) or max_papers <= 0):
+        raise web.HTTPBadRequest(text="max_papers must be a positive integer")
+    section_outline = body.get("section_outline")
+    if section_outline is not None and (
+        not isinstance(section_outline, list) or not all(isinstance(s, str) and s.strip() for s in section_outline)
+    ):
+        raise web.HTTPBadRequest(text="section_outline must be a list of non-empty strings")
+    try:
+        job = request.app["jobs"].submit(topic.strip(), max_papers, section_outline)
+    except asyncio.QueueFull:
+        return web.json_response({"error": "queue full"}, status=429)
+    return web.json_response(job.to_dict(), status=202)
+
+
+async def list_jobs(request: web.Request) -> web.Response:
+    return web.json_response([j.to_dict() for j in request.app["jobs"].jobs.values()])
+
+
+async def get_job(request: web.Request) -> web.Response:
+    return web.json_response(_get_job(request).to_dict())
+
+
+async def _iter_events(job: Job):
+    """逐条产出任务的进度事件（含历史回放），任务结束后停止"""
+    q = progress_bus.subscribe(job.source)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(q.get(), timeout=15)
+            except asyncio.TimeoutError:
+                yield None  # 心跳
+                continue
+            yield event
+            if event["stage"] in TERMINAL_STATES:
+                return
+    finally:
+        progress_bus.unsubscribe(job.source, q)
+
+
+async def job_events_sse(request: web.Request) -> web.StreamResponse:
+    job = _get_job(request)
+    resp = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await resp.prepare(request)
+    async for event in _iter_events(job):
+        if event is None:
+            await resp.write(b": keep-alive\n\n")
+            continue
+        payload = json.dumps(event, ensure_ascii=False)
+        await resp.write(f"event: {event['stage']}\ndata: {payload}\n\n".encode("utf-8"))
+    await resp.write_eof()
+    return resp
+
+
+async def job_events_ws(request: web.Request) -> web.WebSocketResponse:
+    job = _get_job(request)
+    ws = web.WebSocketResponse(heartbeat=15)
+    await ws.prepare(request)
+    async for event in _iter_events(job):
+        if ws.closed:
+            break
+        if event is not None:
+            await ws.send_json(event)
+    await ws.close()
+    return ws
+
+
+async def list_reports(request: web.Request) -> web.Response:
+    files = sorted(REPORTS_DIR.glob("*.md"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return web.json_response([
+        {"name": p.name, "size": p.stat().st_size, "modified": p.stat().st_mtime}
+        for p in files
+    ])
+
+
+async def get_report(request: web.Request) -> web.FileResponse:
+    name = request.match_info["name"]
+    path = (REPORTS_DIR / name).resolve()
+    # 仅允许访问报告目录下的文件
+    if path.parent != REPORTS_DIR.resolve() or not path.is_file():
+        raise web.HTTPNotFound(text="report not found")
+    return web.FileResponse(path, headers={"Content-Type": "text/markdown; charset=utf-8"})
+
+
+async def list_reviews(request: web.Request) -> web.Response:
+    status = None if request.query.get("all") else "pending"
+    return web.json_response(review_queue.list(status=status))
+
+
+async def decide_review(request: web.Request) -> web.Response:
+    try:
+        review_id = int(request.match_info["review_id"])
+        body = await request.json()
+    except (ValueError, json.JSONDecodeError):
+        raise web.HTTPBadRequest(text="invalid request")
+    if not isinstance(body, dict) or not isinstance(body.get("approved"), bool):
+        raise web.HTTPBadRequest(text="approved (bool) is required")
+    if not review_queue.decide(review_id, body["approved"], decided_by="api", note=body.get("note")):
+        return web.json_response({"error": "review not found or already decided"}, status=409)
+    return web.json_response(review_queue.get(review_id))
+
+
+async def healthz(request: web.Request) -> web.Response:
+    manager: JobManager = request.app["jobs"]
+    warmups = {name: fut.done() for name, fut in manager.workflow._warmups.items()}
+    return web.json_response({
+        "status": "ok",
+        "warm": warmups,
+        "queued": manager.queue.qsize(),
+        "running": sum(1 for j in manager.jobs.values() if j.status == "running"),
+    })
+
+
+def create_app(
+    workers: int = settings.server_workers,
+    queue_size: int = settings.server_queue_size,
+    timeout: Optional[float] = settings.batch_topic_timeout_s
+) -> web.Application:
+    """创建服务应用（启动时预热服务，关闭时停止运行时）"""
+    app = web.Application()
+    workflow = ResearchWorkflow()
+    app["jobs"] = JobManager(workflow, workers, queue_size, timeout, settings.server_job_history)
+
+    async def on_startup(app: web.Application):
+        workflow.start_warmup()
+        app["jobs"].start()
+
+    async def on_cleanup(app: web.Application):
+        await app["jobs"].stop()
+        await workflow.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.add_routes([
+        web.post("/jobs", create_job),
+        web.get("/jobs", list_jobs),
+        web.get("/jobs/{job_id}", get_job),
+        web.get("/jobs/{job_id}/events", job_events_sse),
+        web.get("/jobs/{job_id}/ws", job_events_ws),
+        web.get("/reports", list_reports),
+        web.get("/reports/{name}", get_report),
+        web.get("/reviews", list_reviews),
+        web.post("/reviews/{review_id}", decide_review),
+        web.get("/healthz", healthz),
+    ])
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="论文调研报告生成服务")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="并发执行的任务数")
+    parser.add_argument("--queue-size", type=int, default=settings.server_queue_size, help="排队任务上限")
+    parser.add_argument("--timeout", type=float, default=settings.batch_topic_timeout_s, help="单任务超时（秒）")
+    args = parser.parse_args(argv)
+
+    setup_logger()
+    init_directories()
+    if settings.review_mode == "auto":
+        # 服务进程不在终端中询问，高风险论文通过 /reviews 接口审核
+        settings.review_mode = "queue"
+    app = create_app(args.workers, args.queue_size, args.timeout)
+    logger.info(f"服务启动: http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
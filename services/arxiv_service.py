@@ -1,5 +1,4 @@
 """Arxiv论文获取服务"""
-import arxiv
 import hashlib
 import json
 from pathlib import Path
@@ -26,7 +25,8 @@ class ArxivService:
             with open(cache_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         
-        # 执行搜索
+        # 执行搜索（延迟导入，命中缓存时无需加载 arxiv 及其依赖）
+        import arxiv
         logger.info(f"搜索论文: {query} (最多{max_results}篇)")
         search = arxiv.Search(
             query=query,
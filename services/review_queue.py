@@ -0,0 +1,172 @@
+"""人工审核队列（SQLite 持久化，可从其它终端或服务接口作答）
+
+用法：
+    python -m services.review_queue list [--all]
+    python -m services.review_queue show <id>
+    python -m services.review_queue approve <id> [--note ...]
+    python -m services.review_queue reject <id> [--note ...]
+"""
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import sqlite3
+import sys
+import time
+from loguru import logger
+
+from config.settings import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_key TEXT NOT NULL,
+    paper_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    risk_score REAL NOT NULL,
+    excerpt TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pending',
+    decided_by TEXT,
+    note TEXT,
+    created_at REAL NOT NULL,
+    decided_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_status ON reviews(status);
+"""
+
+
+class ReviewQueue:
+    """审核队列
+
+    每次操作使用独立的短连接，多个进程（运行中的流水线、审核 CLI、HTTP 服务）可同时读写同一文件。
+    决策只会写入一次：pending → approved/rejected，后到的决策（包括超时默认处理）不会覆盖先到的。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._initialized = True
+        return conn
+
+    def submit(self, run_key: str, paper_id: str, title: str, risk_score: float, excerpt: str = "") -> int:
+        """登记待审核条目，返回审核 ID"""
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "INSERT INTO reviews (run_key, paper_id, title, risk_score, excerpt, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_key, paper_id, title, risk_score, excerpt, time.time())
+            )
+            return cur.lastrowid
+
+    def decide(self, review_id: int, approved: bool, decided_by: str = "cli", note: Optional[str] = None) -> bool:
+        """写入审核结论，条目已有结论时返回 False"""
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "UPDATE reviews SET status = ?, decided_by = ?, note = ?, decided_at = ? WHERE id = ? AND status = 'pending'",
+                ("approved" if approved else "rejected", decided_by, note, time.time(), review_id)
+            )
+            return cur.rowcount == 1
+
+    def get(self, review_id: int) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM reviews WHERE id = ?", (review_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, status: Optional[str] = "pending", limit: int = 100) -> List[Dict]:
+        """按创建时间列出条目（status=None 时列出全部）"""
+        sql = "SELECT * FROM reviews"
+        params: tuple = ()
+        if status:
+            sql += " WHERE status = ?"
+            params = (status,)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params + (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    async def wait(
+        self,
+        review_id: int,
+        timeout: Optional[float] = None,
+        timeout_action: str = "reject",
+        poll_interval: float = 1.0
+    ) -> bool:
+        """异步等待审核结论（只让出事件循环，不阻塞其它论文的处理）
+
+        超时后按 timeout_action 写入默认结论；若恰好已有人作答，以先写入者为准。
+        """
+        deadline = time.monotonic() + timeout if timeout and timeout > 0 else None
+        while True:
+            row = self.get(review_id)
+            if row is None:
+                raise KeyError(f"审核条目不存在: {review_id}")
+            if row["status"] != "pending":
+                return row["status"] == "approved"
+            if deadline is not None and time.monotonic() >= deadline:
+                approved = timeout_action == "approve"
+                if self.decide(review_id, approved, decided_by="timeout"):
+                    logger.warning(f"审核超时，按默认策略处理: #{review_id} → {'通过' if approved else '拒绝'}")
+                    return approved
+                continue
+            await asyncio.sleep(poll_interval)
+
+
+# 全局审核队列（首次使用时才创建数据库文件）
+review_queue = ReviewQueue(settings.review_db_path)
+
+
+def _print_row(row: Dict, verbose: bool = False) -> None:
+    print(f"#{row['id']:<5} [{row['status']:<8}] 风险 {row['risk_score']:<4} {row['title'][:60]}  ({row['run_key']})")
+    if verbose:
+        print(f"  论文ID: {row['paper_id']}")
+        print(f"  分析摘要: {row['excerpt']}")
+        if row["decided_by"]:
+            print(f"  处理人: {row['decided_by']}  备注: {row['note'] or ''}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="高风险论文审核队列")
+    parser.add_argument("--db", default=settings.review_db_path, help="审核队列 SQLite 文件路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_list = sub.add_parser("list", help="列出待审核条目")
+    p_list.add_argument("--all", action="store_true", help="包含已处理条目")
+    p_show = sub.add_parser("show", help="查看条目详情")
+    p_show.add_argument("id", type=int)
+    for name in ("approve", "reject"):
+        p = sub.add_parser(name, help="批准" if name == "approve" else "拒绝")
+        p.add_argument("id", type=int)
+        p.add_argument("--note", default=None)
+    args = parser.parse_args(argv)
+
+    queue = ReviewQueue(args.db)
+    if args.command == "list":
+        rows = queue.list(status=None if args.all else "pending")
+        if not rows:
+            print("没有待审核条目")
+        for row in rows:
+            _print_row(row)
+    elif args.command == "show":
+        row = queue.get(args.id)
+        if row is None:
+            print(f"审核条目不存在: {args.id}")
+            return 1
+        _print_row(row, verbose=True)
+    else:
+        if not queue.decide(args.id, args.command == "approve", decided_by="cli", note=args.note):
+            print(f"条目 #{args.id} 不存在或已处理")
+            return 1
+        print(f"已{'批准' if args.command == 'approve' else '拒绝'} #{args.id}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""测试公共夹具：确定性嵌入、按调用方返回固定内容的模型客户端、隔离到临时目录的配置"""
+import hashlib
+import os
+import re
+
+import numpy as np
+import pytest
+
+# 配置实例在导入时读取 API_KEY，测试环境不需要真实密钥
+os.environ.setdefault("API_KEY", "test")
+
+from autogen_core.models import CreateResult, RequestUsage  # noqa: E402
+
+from config.settings import settings  # noqa: E402
+
+
+class FakeEmbedding:
+    """按文本哈希生成的确定性向量（不归一化，模长随文本变化，与真实模型输出一致）"""
+
+    dim = 32
+
+    def encode(self, texts, batch_size: int = 32):
+        out = []
+        for text in texts:
+            raw = hashlib.sha256(text.encode("utf-8")).digest()
+            vec = np.frombuffer(raw, dtype=np.uint8).astype(np.float32) / 32.0
+            out.append(vec[: self.dim].tolist())
+        return out
+
+    def encode_single(self, text: str):
+        return self.encode([text])[0]
+
+
+_PAPER_LINE_RE = re.compile(r"^\[(\d+)\] (.+)$", re.M)
+
+
+class ScriptedClient:
+    """按系统提示词识别调用方的模型客户端：章节正文逐篇引用提示中给出的论文编号，审校原样返回草稿"""
+
+    def __init__(self):
+        self.calls = []
+
+    def _reply(self, messages) -> str:
+        system = " ".join(m.content for m in messages if type(m).__name__ == "SystemMessage")
+        user = messages[-1].content
+        self.calls.append((system, user))
+        if "三要素" in system:
+            return '{"research_problem": "如何协调多个智能体", "method": "提出分层调度框架", "value": "提升任务成功率"}'
+        if "关键概念" in system:
+            title = user.split("论文：", 1)[-1].split("\n", 1)[0]
+            return f"分析内容：{title} 研究了多智能体协作中的调度问题。\n关键概念：多智能体, 调度, 协作"
+        if "仅输出JSON" in system:
+            return '{"keywords": [], "doc_types": []}'
+        if "技术编辑" in system:
+            return user.split("[章节草稿]\n", 1)[-1]
+        if "学术写作专家" in system:
+            block = user.split("**4. 核心论文详细分析**", 1)[-1].split("━━━", 1)[0]
+            return "\n\n".join(f"{title} 提出了相关方法 [{n}]。" for n, title in _PAPER_LINE_RE.findall(block))
+        return "好的。"
+
+    async def create(self, messages, **kwargs):
+        return CreateResult(
+            finish_reason="stop",
+            content=self._reply(messages),
+            usage=RequestUsage(prompt_tokens=0, completion_tokens=0),
+            cached=False,
+        )
+
+    async def create_stream(self, messages, **kwargs):
+        result = await self.create(messages, **kwargs)
+        yield result.content
+        yield result
+
+
+@pytest.fixture
+def isolated_settings(tmp_path, monkeypatch):
+    """把各类持久化目录指向临时目录，关闭追踪与增量复用"""
+    import utils.section_cache as section_cache_module
+    from pathlib import Path
+
+    monkeypatch.setattr(settings, "chroma_persist_dir", str(tmp_path / "chroma"))
+    monkeypatch.setattr(settings, "section_cache_dir", str(tmp_path / "sections"))
+    monkeypatch.setattr(settings, "assembler_spill_dir", str(tmp_path / "drafts"))
+    monkeypatch.setattr(settings, "tracing_enabled", False)
+    monkeypatch.setattr(settings, "writer_incremental", False)
+    monkeypatch.setattr(settings, "polish_mode", "off")
+    monkeypatch.setattr(section_cache_module.section_cache, "root", Path(tmp_path / "sections"))
+    return tmp_path
@@ -0,0 +1,90 @@
+"""知识库维护：压缩回收空间、中断压缩的恢复、章节保留策略"""
+import numpy as np
+
+from knowledge_base.chroma_manager import ChromaManager
+
+
+def _add_sections(manager: ChromaManager, start: int, n: int, rng) -> None:
+    manager.add_papers(
+        ids=[f"section-r{i}-0" for i in range(start, start + n)],
+        embeddings=rng.normal(size=(n, 64)).tolist(),
+        documents=[f"章节正文 {i} " * 20 for i in range(start, start + n)],
+        metadatas=[{"type": "section", "run_id": f"r{i}", "created_at": float(i)} for i in range(start, start + n)],
+    )
+
+
+def test_compact_reclaims_space(tmp_path):
+    rng = np.random.default_rng(0)
+    manager = ChromaManager(str(tmp_path / "chroma"))
+    for start in range(0, 2000, 500):
+        _add_sections(manager, start, 500, rng)
+    manager.delete([f"section-r{i}-0" for i in range(1800)])
+
+    result = manager.compact()
+    assert result["count_before"] == result["count_after"] == 200
+    assert result["bytes_after"] < result["bytes_before"] * 0.5
+    assert result["bytes_after"] == manager.disk_usage()
+
+    # 压缩后集合仍可读写，重新打开后数据完整
+    query = rng.normal(size=64).tolist()
+    assert len(manager.retrieve_similar(query, n_results=5)["ids"][0]) == 5
+    _add_sections(manager, 5000, 10, rng)
+    reopened = ChromaManager(str(tmp_path / "chroma"))
+    assert reopened.count() == 210
+    assert reopened.retrieve_similar(query, n_results=3)["ids"] == manager.retrieve_similar(query, n_results=3)["ids"]
+
+
+def test_compact_partitioned(tmp_path):
+    rng = np.random.default_rng(1)
+    manager = ChromaManager(str(tmp_path / "chroma"), partition_mode="type")
+    _add_sections(manager, 0, 600, rng)
+    manager.add_papers(["s1"], [rng.normal(size=64).tolist()], ["摘要"], [{"type": "summary"}])
+    manager.delete([f"section-r{i}-0" for i in range(500)])
+
+    result = manager.compact()
+    assert result["count_after"] == 101
+    assert result["bytes_after"] < result["bytes_before"]
+
+
+def test_keep_last_n_retention(tmp_path):
+    rng = np.random.default_rng(2)
+    manager = ChromaManager(str(tmp_path / "chroma"))
+    _add_sections(manager, 0, 12, rng)
+    manager.apply_section_retention("keep_last_n", keep_runs=5)
+    assert len(manager.list_section_runs()) == 5
+
+
+def _interrupted_copy(manager: ChromaManager, name: str, drop_source: bool) -> None:
+    """模拟压缩中断：临时集合已写入（部分）数据，可选地原集合也已删除"""
+    source = manager.client.get_collection(name)
+    page = source.get(include=["embeddings", "documents", "metadatas"])
+    tmp = manager.client.create_collection(name=f"{name}-compact", metadata=source.metadata)
+    tmp.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+    if drop_source:
+        manager.client.delete_collection(name)
+
+
+def test_interrupted_compaction_leftover_is_not_a_partition(tmp_path):
+    rng = np.random.default_rng(3)
+    manager = ChromaManager(str(tmp_path / "chroma"), partition_mode="type")
+    _add_sections(manager, 0, 20, rng)
+    _interrupted_copy(manager, "paper_knowledge__section", drop_source=False)
+    assert manager._partition_names() == ["paper_knowledge__section"]
+
+    reopened = ChromaManager(str(tmp_path / "chroma"), partition_mode="type")
+    names = {c.name for c in reopened.client.list_collections()}
+    assert "paper_knowledge__section-compact" not in names
+    ids = reopened.retrieve_similar(rng.normal(size=64).tolist(), n_results=10)["ids"][0]
+    assert len(ids) == len(set(ids)) == 10
+    assert reopened.count() == 20
+
+
+def test_interrupted_compaction_before_rename_is_recovered(tmp_path):
+    rng = np.random.default_rng(4)
+    manager = ChromaManager(str(tmp_path / "chroma"), partition_mode="type")
+    _add_sections(manager, 0, 20, rng)
+    _interrupted_copy(manager, "paper_knowledge__section", drop_source=True)
+
+    reopened = ChromaManager(str(tmp_path / "chroma"), partition_mode="type")
+    assert reopened._partition_names() == ["paper_knowledge__section"]
+    assert reopened.count() == 20
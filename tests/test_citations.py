@@ -0,0 +1,94 @@
+"""分章写作的引用编号：各章 [n] 指向同一篇论文，参考文献按编号列出"""
+import asyncio
+import re
+
+from autogen_core import MessageContext, RoutedAgent, SingleThreadedAgentRuntime, TopicId, message_handler, type_subscription
+
+from config.settings import settings
+from tests.conftest import FakeEmbedding, ScriptedClient
+from utils.message_types import GradeBatchData, GradeData, ReportData
+from utils.report_postprocess import order_references
+
+
+def test_order_references_dedups_and_sorts_by_number():
+    refs = ["[3] C", "[1] A", "[3] C", "无编号", "[10] J", "[2] B"]
+    assert order_references(refs) == ["[1] A", "[2] B", "[3] C", "[10] J", "无编号"]
+
+
+async def _run_section_flow(tmp_path, papers):
+    from agents.assembler_agent import AssemblerAgent
+    from agents.writer_agent import WriterAgent
+    from knowledge_base.chroma_manager import ChromaManager
+    from utils.draft_store import DraftStore
+
+    reports = []
+
+    @type_subscription(topic_type="CoordinatorAgent")
+    class ReportSink(RoutedAgent):
+        def __init__(self):
+            super().__init__("报告接收")
+
+        @message_handler
+        async def handle_report(self, message: ReportData, ctx: MessageContext) -> None:
+            reports.append(message)
+
+    client = ScriptedClient()
+    chroma = ChromaManager(str(tmp_path / "chroma"))
+    embedding = FakeEmbedding()
+    runtime = SingleThreadedAgentRuntime()
+    await WriterAgent.register(runtime, type="WriterAgent", factory=lambda: WriterAgent(client, "测试主题", chroma, embedding))
+    await AssemblerAgent.register(runtime, type="AssemblerAgent", factory=lambda: AssemblerAgent(drafts=DraftStore(str(tmp_path / "drafts"))))
+    await ReportSink.register(runtime, type="CoordinatorAgent", factory=ReportSink)
+    runtime.start()
+    await runtime.publish_message(
+        GradeBatchData(topic="测试主题", grades=papers, sections=["背景", "方法", "应用", "展望"]),
+        topic_id=TopicId("WriterAgent", source="test"),
+    )
+    await runtime.stop_when_idle()
+    return reports
+
+
+def test_section_citations_use_global_numbers(isolated_settings, monkeypatch):
+    monkeypatch.setattr(settings, "writer_use_section_flow", True)
+    monkeypatch.setattr(settings, "section_papers_per_section", 2)
+    papers = [
+        GradeData(paper_id=f"p{i}", title=f"论文标题{i}", risk_score=1.0, approved=True, analysis=f"第{i}篇论文的分析内容，涉及方法{i}。")
+        for i in range(1, 7)
+    ]
+    reports = asyncio.run(_run_section_flow(isolated_settings, papers))
+
+    assert len(reports) == 1
+    report = reports[0]
+    titles = {i + 1: p.title for i, p in enumerate(papers)}
+
+    # 参考文献带编号、按编号升序，且编号与论文一一对应
+    numbers = []
+    for ref in report.references:
+        match = re.match(r"^\[(\d+)\] (.+)$", ref)
+        assert match, ref
+        numbers.append(int(match.group(1)))
+        assert titles[int(match.group(1))] == match.group(2)
+    assert numbers == sorted(set(numbers))
+
+    # 正文中每处引用都指向同一编号的论文，且该编号出现在参考文献中
+    cited = re.findall(r"(论文标题\d+) 提出了相关方法 \[(\d+)\]", report.content)
+    assert cited
+    for title, n in cited:
+        assert titles[int(n)] == title
+        assert int(n) in numbers
+    # 不同章节分配到不同论文，全部引用合起来覆盖所有论文
+    assert set(numbers) == set(titles)
+
+
+def test_packer_keeps_numbered_paper_over_kb_duplicate():
+    """知识库中同一篇论文的分析副本与核心论文片段近重复时，保留携带引用编号的论文片段"""
+    from knowledge_base.context_packer import ContextPacker, ContextSnippet
+
+    text = "第1篇论文的分析内容，涉及方法1。"
+    emb = FakeEmbedding().encode_single(text)
+    packer = ContextPacker(model_name="test", budget_tokens=1000, preferred_sources=("paper",))
+    packed = packer.pack(emb, [
+        ContextSnippet(id="analysis-p1", text=text, source="analysis", embedding=emb),
+        ContextSnippet(id="p1", text=text, source="paper", embedding=emb, meta={"title": "论文标题1", "ref": 1}),
+    ])
+    assert [(s.source, s.meta.get("ref")) for s in packed] == [("paper", 1)]
@@ -0,0 +1,81 @@
+"""装配草稿存储：LRU 上限、超阈值溢写与长期运行下的有界内存（benchmarks/soak_drafts 的断言版）"""
+from utils.draft_store import DraftStore
+from utils.message_types import SectionDraft
+
+
+def _draft(run_id: str, section_id: str, chars: int = 100) -> SectionDraft:
+    return SectionDraft(
+        topic="t", run_id=run_id, section_id=section_id,
+        content=f"{run_id}/{section_id} " + "x" * chars, citations=[f"[1] {run_id}"],
+    )
+
+
+def test_lru_drops_least_recently_updated_run(tmp_path):
+    store = DraftStore(str(tmp_path), max_runs=2, spill_bytes=0)
+    store.put(_draft("a", "0"))
+    store.put(_draft("b", "0"))
+    store.put(_draft("a", "1"))  # a 最近更新
+    store.put(_draft("c", "0"))
+
+    assert len(store) == 2
+    assert len(store.pop("b")) == 0
+    run_a = store.pop("a")
+    assert len(run_a) == 2
+    run_a.close()
+
+
+def test_resubmitted_section_replaces_previous(tmp_path):
+    store = DraftStore(str(tmp_path), spill_bytes=0)
+    store.put(_draft("a", "0", chars=1000))
+    store.put(_draft("a", "0", chars=10))
+
+    assert store.stats()["drafts"] == 1
+    assert store.memory_bytes() == len(_draft("a", "0", chars=10).content.encode("utf-8"))
+
+
+def test_spills_run_over_threshold_and_reads_back(tmp_path):
+    store = DraftStore(str(tmp_path), spill_bytes=500)
+    drafts = [_draft("run/1", str(i), chars=300) for i in range(3)]
+    for d in drafts:
+        store.put(d)
+
+    assert store.stats()["spilled_runs"] == 1
+    assert store.memory_bytes() == 0
+    run = store.pop("run/1")
+    run_dir = tmp_path / "run_1"
+    assert len(list(run_dir.glob("*.md"))) == 3
+    for d in drafts:
+        got = run.get(d.section_id)
+        assert got.get_content() == d.content
+        assert got.citations == d.citations
+    run.close()
+    assert not run_dir.exists()
+
+
+def test_evicted_run_removes_spill_files(tmp_path):
+    store = DraftStore(str(tmp_path), max_runs=1, spill_bytes=1)
+    store.put(_draft("old", "0"))
+    assert (tmp_path / "old").exists()
+    store.put(_draft("new", "0"))
+    assert not (tmp_path / "old").exists()
+
+
+def test_memory_and_disk_stay_bounded_over_many_runs(tmp_path):
+    """数百次运行（每 7 次有一次只发草稿不装配）后，内存与溢写目录都不随运行次数增长"""
+    store = DraftStore(str(tmp_path), max_runs=4, spill_bytes=2000)
+    peak = 0
+    for i in range(300):
+        run_id = f"run-{i}"
+        for s in range(6):
+            store.put(_draft(run_id, str(s), chars=600))
+        peak = max(peak, store.memory_bytes())
+        if i % 7 == 0:
+            continue  # 中途失败的运行，由 LRU 上限回收
+        run = store.pop(run_id)
+        assert len(run) == 6
+        run.close()
+
+    assert len(store) <= 4
+    assert len(list(tmp_path.iterdir())) <= 4
+    # 单个运行溢写前最多占用约 spill_bytes，加上上限内的其它运行
+    assert peak <= 4 * (2000 + 700)
@@ -0,0 +1,90 @@
+"""ONNX 嵌入后端：导出校验通过后才写配置，输出与 PyTorch 模型的余弦偏差在容差内
+
+导出相关用例需要 torch、transformers 与 sentence_transformers（使用随机初始化的小型 BERT，不下载模型），
+缺少时跳过；配置读取的用例无额外依赖。
+"""
+import json
+
+import numpy as np
+import pytest
+
+from knowledge_base.onnx_embedding import CONFIG_FILE, load_export_config
+
+TEXTS = [
+    "Large language models for scientific discovery.",
+    "多智能体协作中的任务分配",
+    "retrieval augmented generation",
+    "基于图神经网络的分子性质预测方法",
+]
+
+
+def test_load_export_config_requires_validation(tmp_path):
+    assert load_export_config(str(tmp_path), 0.99) is None
+
+    path = tmp_path / CONFIG_FILE
+    path.write_text(json.dumps({"max_length": 128, "quantized_ok": True}), encoding="utf-8")
+    assert load_export_config(str(tmp_path), 0.99) is None  # 没有校验记录
+
+    path.write_text(json.dumps({"max_length": 128, "validated_min_cosine": 0.95}), encoding="utf-8")
+    assert load_export_config(str(tmp_path), 0.99) is None  # 校验阈值比当前配置宽松
+    assert load_export_config(str(tmp_path), 0.95)["max_length"] == 128
+
+    path.write_text("{broken", encoding="utf-8")
+    assert load_export_config(str(tmp_path), 0.99) is None
+
+
+@pytest.fixture
+def tiny_st_model(tmp_path):
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("onnxruntime")
+    transformers = pytest.importorskip("transformers")
+    st = pytest.importorskip("sentence_transformers")
+
+    model_dir = tmp_path / "tiny-bert"
+    model_dir.mkdir()
+    chars = sorted({ch for text in TEXTS for ch in text.lower() if not ch.isspace()})
+    words = sorted({w for text in TEXTS for w in text.lower().replace(".", " ").split()})
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *words, *[c for c in chars if c not in words]]
+    (model_dir / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(model_dir / "vocab.txt"))
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=128,
+    )
+    transformers.BertModel(config).save_pretrained(str(model_dir))
+    tokenizer.save_pretrained(str(model_dir))
+    return st.SentenceTransformer(modules=[
+        st.models.Transformer(str(model_dir), max_seq_length=64),
+        st.models.Pooling(32, pooling_mode="mean"),
+    ], device="cpu")
+
+
+def _min_cos(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float((a * b).sum(axis=1).min())
+
+
+def test_onnx_matches_torch_within_tolerance(tiny_st_model, tmp_path):
+    from knowledge_base.onnx_embedding import OnnxEmbeddingBackend, export_onnx
+
+    out = str(tmp_path / "onnx")
+    export_onnx(tiny_st_model, out, quantize=True, min_cosine=0.99)
+    conf = load_export_config(out, 0.99)
+    assert conf is not None and conf["fp32_min_cosine"] >= 0.99
+
+    reference = np.asarray(tiny_st_model.encode(TEXTS), dtype=np.float32)
+    assert _min_cos(OnnxEmbeddingBackend(out, quantized=False).encode(TEXTS), reference) >= 0.99
+    if conf["quantized_ok"]:
+        assert _min_cos(OnnxEmbeddingBackend(out, quantized=True).encode(TEXTS), reference) >= 0.99
+
+
+def test_failed_validation_leaves_no_config(tiny_st_model, tmp_path):
+    from knowledge_base.onnx_embedding import export_onnx
+
+    out = tmp_path / "onnx"
+    with pytest.raises(RuntimeError):
+        export_onnx(tiny_st_model, str(out), quantize=False, min_cosine=1.01)
+    assert not (out / CONFIG_FILE).exists()
+    assert load_export_config(str(out), 0.99) is None
@@ -0,0 +1,102 @@
+"""报告后处理：清理规则、流式分片与一次性处理结果一致、思考标签过滤、按章切分"""
+import random
+import re
+import time
+
+from utils.report_postprocess import (
+    MAX_BOLD_PER_PARAGRAPH, ThinkTagFilter, build_glossary, iter_post_process, join_sections,
+    post_process_report, split_sections,
+)
+
+RAW = """
+
+## 背景
+
+首先，多智能体系统（Multi-Agent System）近年发展迅速 [1]。
+综上所述，**甲** **乙** **丙** **丁** **戊** 都很重要。
+
+
+
+## 方法
+
+[章节修订稿]
+这一段是审校痕迹，应被整体删除。
+## 主要修改说明
+- 也应删除
+
+## 结论
+
+最后，此外，多智能体系统（Multi-Agent System）仍有挑战 [2]。
+
+"""
+
+
+def test_cleanup_rules():
+    out = post_process_report(RAW)
+
+    assert out.startswith("## 背景") and not out.endswith("\n")
+    assert "审校痕迹" not in out and "也应删除" not in out
+    assert "\n\n\n" not in out
+    assert "多智能体系统（Multi-Agent System）近年发展迅速 [1]。" in out
+    # 按列表顺序，前一个衔接词移除后露出的下一个也被移除
+    assert "\n多智能体系统（Multi-Agent System）仍有挑战 [2]。" in out
+    bold_line = next(line for line in out.split("\n") if "甲" in line)
+    assert len(re.findall(r"\*\*", bold_line)) == 2 * MAX_BOLD_PER_PARAGRAPH
+    assert bold_line.endswith("丁 戊 都很重要。")
+
+
+def test_streaming_matches_one_shot():
+    expected = post_process_report(RAW)
+    rng = random.Random(0)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(RAW)), rng.randint(1, 20)))
+        chunks = [RAW[i:j] for i, j in zip([0] + cuts, cuts + [len(RAW)])]
+        assert "".join(iter_post_process(chunks)) == expected
+
+
+def test_think_tag_filter_matches_regex_across_chunks():
+    text = "前言<think>推理\n过程</THINK>正文<think>第二段</think>结尾<think>未闭合"
+    expected = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL | re.IGNORECASE)
+    rng = random.Random(1)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 15)))
+        f = ThinkTagFilter()
+        out = "".join(f.feed(text[i:j]) for i, j in zip([0] + cuts, cuts + [len(text)])) + f.close()
+        assert out == expected
+
+
+def test_think_tag_filter_handles_case_changing_characters():
+    # "İ".lower() 变为两个字符：按小写副本求出的下标会与原文错位
+    text = "İİ<THINK>İ推理</Think>İ正文<think>İ"
+    expected = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL | re.IGNORECASE)
+    for size in (1, 2, 3, len(text)):
+        f = ThinkTagFilter()
+        out = "".join(f.feed(text[i:i + size]) for i in range(0, len(text), size)) + f.close()
+        assert out == expected
+
+
+def test_think_tag_filter_is_linear_in_long_blocks():
+    """长思考块逐片到达时只扫描新分片：整体耗时与输入长度成线性"""
+    f = ThinkTagFilter()
+    start = time.perf_counter()
+    assert f.feed("前言<think>") == "前言"
+    for _ in range(100_000):
+        assert f.feed("推理过程的一小段文字") == ""
+    assert f.feed("</think>结尾") == "结尾"
+    assert time.perf_counter() - start < 5
+    assert f.close() == ""
+
+
+def test_split_and_join_sections_round_trip():
+    report = "# 标题\n\n导言\n\n## 一\n\n正文一\n\n## 二\n\n正文二"
+    preamble, sections = split_sections(report)
+    assert preamble == "# 标题\n\n导言"
+    assert sections == [("## 一", "正文一"), ("## 二", "正文二")]
+    assert join_sections(preamble, sections) == report
+
+
+def test_glossary_takes_common_suffix_of_variants():
+    text = "新型多智能体系统（Multi-Agent System）与分层多智能体系统（Multi-Agent System）；检索增强（RAG）"
+    glossary = build_glossary(text)
+    assert glossary["Multi-Agent System"] == "多智能体系统"
+    assert list(glossary)[0] == "Multi-Agent System"
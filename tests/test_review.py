@@ -0,0 +1,26 @@
+"""高风险论文审核方式"""
+import io
+
+from config.settings import settings
+
+
+class _Tty(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_auto_review_mode_follows_stdin(monkeypatch):
+    monkeypatch.setattr(settings, "review_mode", "auto")
+    monkeypatch.setattr("sys.stdin", _Tty())
+    assert settings.effective_review_mode() == "interactive"
+    monkeypatch.setattr("sys.stdin", io.StringIO())
+    assert settings.effective_review_mode() == "queue"
+    monkeypatch.setattr("sys.stdin", None)
+    assert settings.effective_review_mode() == "queue"
+
+
+def test_explicit_review_mode_is_kept(monkeypatch):
+    monkeypatch.setattr("sys.stdin", _Tty())
+    for mode in ("queue", "interactive", "auto_approve", "auto_reject"):
+        monkeypatch.setattr(settings, "review_mode", mode)
+        assert settings.effective_review_mode() == mode
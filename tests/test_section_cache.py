@@ -0,0 +1,81 @@
+"""章节复用缓存：指纹稳定性、记录存取、手动清理与写入时按时长/数量上限自动清理"""
+import json
+import os
+import time
+
+from knowledge_base.context_packer import ContextSnippet
+from utils.section_cache import SectionCache, fingerprint, snippet_digest
+
+
+def test_fingerprint_ignores_keyword_order_and_tracks_values():
+    assert fingerprint(a=1, b=["x"]) == fingerprint(b=["x"], a=1)
+    assert fingerprint(a=1, b=["x"]) != fingerprint(a=1, b=["y"])
+
+
+def test_snippet_digest_skips_run_specific_ids_of_previous_sections():
+    prev_1 = ContextSnippet(id="section-run1-0", text="前文", source="prev")
+    prev_2 = ContextSnippet(id="section-run2-0", text="前文", source="prev")
+    paper = ContextSnippet(id="paper-1", text="摘要", source="summary")
+
+    assert snippet_digest(prev_1) == snippet_digest(prev_2)
+    assert snippet_digest(paper)["id"] == "paper-1"
+    assert snippet_digest(prev_1) != snippet_digest(ContextSnippet(id="section-run1-0", text="改写", source="prev"))
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = SectionCache(str(tmp_path))
+    key = fingerprint(kind="section", section="背景")
+    assert cache.get(key) is None
+
+    cache.put(key, {"content": "正文 [1]", "citations": ["[1] A"]})
+    record = cache.get(key)
+    assert record["content"] == "正文 [1]" and record["citations"] == ["[1] A"]
+    assert not list(tmp_path.glob("*/*.tmp"))
+
+
+def test_corrupt_record_is_ignored(tmp_path):
+    cache = SectionCache(str(tmp_path))
+    key = fingerprint(kind="plan")
+    cache.put(key, {"plan": {}})
+    cache._path(key).write_text("{broken", encoding="utf-8")
+    assert cache.get(key) is None
+
+
+def test_prune_removes_only_stale_records(tmp_path):
+    cache = SectionCache(str(tmp_path))
+    old, new = fingerprint(n=1), fingerprint(n=2)
+    cache.put(old, {"content": "旧"})
+    cache.put(new, {"content": "新"})
+    stale = time.time() - 3 * 3600
+    os.utime(cache._path(old), (stale, stale))
+
+    assert cache.prune(older_than_hours=2) == 1
+    assert cache.get(old) is None
+    assert json.loads(cache._path(new).read_text(encoding="utf-8"))["content"] == "新"
+
+
+def test_writes_enforce_entry_limit_and_keep_recently_used(tmp_path):
+    cache = SectionCache(str(tmp_path), max_entries=3, prune_every=1)
+    keys = [fingerprint(n=i) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"content": str(i)})
+        stamp = time.time() - (10 - i) * 60
+        os.utime(cache._path(key), (stamp, stamp))
+    assert cache.get(keys[0])["content"] == "0"  # 复用刷新修改时间
+
+    cache.put(fingerprint(n=3), {"content": "3"})
+    assert len(list(tmp_path.glob("*/*.json"))) == 3
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def test_first_write_prunes_stale_records(tmp_path):
+    SectionCache(str(tmp_path)).put(fingerprint(n=1), {"content": "旧"})
+    stale = time.time() - 3 * 3600
+    old = SectionCache(str(tmp_path))._path(fingerprint(n=1))
+    os.utime(old, (stale, stale))
+
+    cache = SectionCache(str(tmp_path), ttl_hours=2, prune_every=100)
+    cache.put(fingerprint(n=2), {"content": "新"})
+    assert not old.exists()
+    assert cache.get(fingerprint(n=2))["content"] == "新"
@@ -0,0 +1,55 @@
+"""服务模式：提交任务时校验请求参数"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import server
+
+
+class RecordingJobs:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, topic, max_papers=None, section_outline=None):
+        self.submitted.append((topic, max_papers, section_outline))
+        return server.Job(id="job", topic=topic, max_papers=max_papers, section_outline=section_outline)
+
+
+async def _post_all(bodies):
+    app = web.Application()
+    app["jobs"] = RecordingJobs()
+    app.router.add_post("/jobs", server.create_job)
+    async with TestClient(TestServer(app)) as client:
+        statuses = []
+        for body in bodies:
+            resp = await client.post("/jobs", json=body)
+            statuses.append(resp.status)
+    return statuses, app["jobs"].submitted
+
+
+@pytest.mark.parametrize("body", [
+    ["topic"],
+    {"topic": 42},
+    {"topic": "  "},
+    {"topic": "rag", "max_papers": 0},
+    {"topic": "rag", "max_papers": True},
+    {"topic": "rag", "max_papers": "5"},
+    {"topic": "rag", "max_papers": 2.5},
+    {"topic": "rag", "section_outline": "背景"},
+    {"topic": "rag", "section_outline": ["背景", 1]},
+    {"topic": "rag", "section_outline": ["背景", ""]},
+])
+def test_invalid_job_is_rejected(body):
+    statuses, submitted = asyncio.run(_post_all([body]))
+    assert statuses == [400] and submitted == []
+
+
+def test_valid_job_is_submitted():
+    statuses, submitted = asyncio.run(_post_all([
+        {"topic": " rag ", "max_papers": 5, "section_outline": ["背景", "结论"]},
+        {"topic": "rag"},
+    ]))
+    assert statuses == [202, 202]
+    assert submitted == [("rag", 5, ["背景", "结论"]), ("rag", None, None)]
@@ -0,0 +1,26 @@
+"""运行追踪：已结束运行的统计不会被迟到的 span 重建，运行键可重新开始"""
+from config.settings import settings
+from utils.tracing import Tracer, _current_run
+
+
+def test_late_spans_do_not_recreate_ended_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "tracing_enabled", True)
+    tracer = Tracer(str(tmp_path))
+    token = _current_run.set("run-1")
+    try:
+        with tracer.span("handler.a") as first:
+            pass
+        tracer.end_run("run-1")
+        with tracer.span("handler.late") as late:
+            pass
+        tracer.record_usage(10, 5)
+    finally:
+        _current_run.reset(token)
+
+    assert "run-1" not in tracer._runs
+    assert late.trace_id == first.trace_id
+    assert tracer.histograms["handler.late"].to_dict()["count"] == 1
+
+    tracer.begin_run("run-1")
+    tracer.observe("handler.b", 1.0, run_key="run-1")
+    assert tracer.run_summary("run-1")["latency"].keys() == {"handler.b"}
@@ -0,0 +1,65 @@
+"""向量热缓存与直接查询 Chroma 的结果一致性"""
+import numpy as np
+import pytest
+
+from knowledge_base.chroma_manager import ChromaManager, RetrievalRequest
+from knowledge_base.vector_cache import VectorHotCache
+
+TYPES = ["summary", "analysis", "section"]
+TOPICS = ["Agent Systems", "agent systems ", "retrieval"]
+
+
+def _fill(manager: ChromaManager, n: int = 150, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    # 不归一化且模长差异明显，区分 l2 与余弦排序
+    vecs = rng.normal(size=(n, 16)) * rng.uniform(0.2, 3.0, size=(n, 1))
+    manager.add_papers(
+        ids=[f"id-{i}" for i in range(n)],
+        embeddings=vecs.tolist(),
+        documents=[f"doc {i}" for i in range(n)],
+        metadatas=[{"type": TYPES[i % 3], "topic": TOPICS[i % 3], "run_id": f"r{i % 2}"} for i in range(n)],
+    )
+
+
+@pytest.mark.parametrize("mode", ["single", "type", "type_topic"])
+def test_hot_cache_matches_chroma(tmp_path, mode):
+    cold = ChromaManager(str(tmp_path / mode), partition_mode=mode)
+    _fill(cold)
+    hot = ChromaManager(str(tmp_path / mode), partition_mode=mode, hot_cache=True)
+    assert hot._hot is not None and len(hot._hot) == 150
+
+    rng = np.random.default_rng(1)
+    queries = (rng.normal(size=(4, 16)) * 2).tolist()
+    cases = [
+        (None, None),
+        ({"type": "summary"}, None),
+        ({"$and": [{"type": "section"}, {"run_id": "r1"}]}, None),
+        ({"type": "analysis"}, "agent systems"),
+        (None, "Agent Systems"),
+    ]
+    for where, namespace in cases:
+        for q in queries:
+            expected = cold.retrieve_similar(q, n_results=5, where=where, namespace=namespace)
+            got = hot.retrieve_similar(q, n_results=5, where=where, namespace=namespace)
+            assert got["ids"] == expected["ids"], (where, namespace)
+            np.testing.assert_allclose(got["distances"][0], expected["distances"][0], rtol=1e-4, atol=1e-4)
+
+    requests = [RetrievalRequest(q, 3, {"type": "summary"}, "Agent Systems") for q in queries]
+    for got, expected in zip(hot.retrieve_batch(requests), cold.retrieve_batch(requests)):
+        assert got["ids"] == expected["ids"]
+
+
+def test_hot_cache_spaces():
+    cache = VectorHotCache(space="cosine")
+    cache.upsert(["a", "b"], [[1.0, 0.0], [10.0, 10.0]], ["a", "b"], [{}, {}])
+    res = cache.query([[1.0, 1.0]], 2)
+    assert res["ids"] == [["b", "a"]]
+    np.testing.assert_allclose(res["distances"][0], [0.0, 1 - 1 / np.sqrt(2)], atol=1e-6)
+
+    l2 = VectorHotCache()
+    l2.upsert(["a", "b"], [[1.0, 0.0], [10.0, 10.0]], ["a", "b"], [{}, {}])
+    res = l2.query([[1.0, 1.0]], 2)
+    assert res["ids"] == [["a", "b"]]
+    np.testing.assert_allclose(res["distances"][0], [1.0, 162.0], atol=1e-4)
+    with pytest.raises(ValueError):
+        VectorHotCache(space="dot")
@@ -0,0 +1,363 @@
+"""工作流端到端：服务预热不阻塞事件循环、单主题 run() 的阶段超时、处理器与构造失败的上报、增量重跑复用章节、参考文献完整、超时中止运行与中止后的状态释放（含未完成的流式报告）"""
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.bench_pipeline import fixture_papers
+from config.settings import settings
+from tests.conftest import FakeEmbedding, ScriptedClient
+
+
+class FixtureArxiv:
+    def __init__(self, n: int = 6):
+        self.n = n
+
+    def search_papers(self, query, max_results=50):
+        return fixture_papers(query, min(self.n, max_results))
+
+
+def _workflow(monkeypatch, warmup_delay: float = 0.0, client=None):
+    import workflows.sequential_workflow as W
+
+    client = client or ScriptedClient()
+
+    def _slow_client(wf):
+        time.sleep(warmup_delay)
+        return client
+
+    monkeypatch.setattr(W.ResearchWorkflow, "_create_model_client", _slow_client)
+    monkeypatch.setattr(W.ResearchWorkflow, "_create_embedding_service", lambda wf: FakeEmbedding())
+    wf = W.ResearchWorkflow()
+    wf.arxiv_service = FixtureArxiv()
+    return wf
+
+
+@pytest.fixture
+def pipeline_settings(isolated_settings, monkeypatch):
+    monkeypatch.setattr(settings, "review_mode", "auto_approve")
+    monkeypatch.setattr(settings, "min_papers_for_report", 1)
+    monkeypatch.setattr(settings, "section_outline", ["背景", "结论"])
+    monkeypatch.chdir(isolated_settings)
+    return isolated_settings
+
+
+def test_cold_warmup_does_not_block_event_loop(pipeline_settings, monkeypatch):
+    wf = _workflow(monkeypatch, warmup_delay=1.0)
+
+    async def main():
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        tick = asyncio.create_task(ticker())
+        try:
+            path = await wf.run_topic("multi-agent", max_papers=4, source="warm", timeout=60)
+        finally:
+            tick.cancel()
+            await wf.stop()
+        return path, max(gaps)
+
+    path, max_gap = asyncio.run(main())
+    assert path.exists()
+    # 模型客户端预热 1 秒期间事件循环仍在调度
+    assert max_gap < 0.5
+
+
+def test_run_flushes_stage_after_runtime_goes_idle(pipeline_settings, monkeypatch):
+    """部分论文的结论永远不会到达（重复 ID）：运行时已空闲，阶段超时仍须触发撰写"""
+    monkeypatch.setattr(settings, "coordinator_stage_timeout_s", 3.0)
+    wf = _workflow(monkeypatch)
+
+    class DuplicateArxiv(FixtureArxiv):
+        def search_papers(self, query, max_results=50):
+            papers = super().search_papers(query, max_results)
+            return papers + [dict(papers[0])]
+
+    wf.arxiv_service = DuplicateArxiv(4)
+    asyncio.run(asyncio.wait_for(wf.run("multi-agent"), timeout=60))
+
+    reports = list((pipeline_settings / "cache" / "reports").glob("*.md"))
+    assert len(reports) == 1
+
+
+def test_run_survives_topic_timeout(pipeline_settings, monkeypatch):
+    """run() 超过 batch_topic_timeout_s：记录未生成报告并正常停止运行时，而不是抛出 TimeoutError"""
+    monkeypatch.setattr(settings, "batch_topic_timeout_s", 0.5)
+
+    class SlowClient(ScriptedClient):
+        async def create(self, messages, **kwargs):
+            await asyncio.sleep(0.2)
+            return await super().create(messages, **kwargs)
+
+    wf = _workflow(monkeypatch, client=SlowClient())
+    asyncio.run(asyncio.wait_for(wf.run("multi-agent"), timeout=60))
+
+    assert not wf._started
+    assert not list((pipeline_settings / "cache" / "reports").glob("*.md"))
+
+
+def test_handler_error_is_counted_as_paper_failure(pipeline_settings, monkeypatch):
+    """处理器未捕获的异常上报为 PaperFailure，不必等待阶段超时"""
+    import agents.grader_agent as G
+    from utils.progress import progress_bus
+
+    monkeypatch.setattr(settings, "coordinator_stage_timeout_s", 1800.0)
+    wf = _workflow(monkeypatch)
+    real = G.text_or_ref
+    victim = fixture_papers("multi-agent", 4)[0]["title"]
+
+    def flaky(text):
+        if victim in text:
+            raise OSError("内容存储写入失败")
+        return real(text)
+
+    monkeypatch.setattr(G, "text_or_ref", flaky)
+
+    async def main():
+        try:
+            return await wf.run_topic("multi-agent", max_papers=4, source="flaky", timeout=30)
+        finally:
+            await wf.stop()
+
+    assert asyncio.run(main()).exists()
+    graded = [e for e in progress_bus.history("flaky") if e["stage"] == "graded"]
+    assert graded[-1]["failed"] == 1 and graded[-1]["graded"] == 4
+
+
+def test_construction_failure_aborts_run(pipeline_settings, monkeypatch):
+    """服务预热失败导致 Agent 构造失败：运行立即中止，而不是等待阶段超时"""
+    import workflows.sequential_workflow as W
+
+    monkeypatch.setattr(settings, "coordinator_stage_timeout_s", 1800.0)
+    wf = _workflow(monkeypatch)
+
+    def _broken(wf):
+        raise OSError("嵌入模型加载失败")
+
+    monkeypatch.setattr(W.ResearchWorkflow, "_create_embedding_service", _broken)
+
+    async def main():
+        try:
+            return await wf.run_topic("multi-agent", max_papers=4, source="broken", timeout=30)
+        finally:
+            await wf.stop()
+
+    with pytest.raises(RuntimeError, match="构造失败"):
+        asyncio.run(main())
+
+
+def test_incremental_rerun_reuses_unchanged_sections(pipeline_settings, monkeypatch):
+    """同一主题再次运行且输入未变：各章直接复用缓存，不再调用模型撰写，报告正文一致"""
+    from utils.progress import progress_bus
+
+    monkeypatch.setattr(settings, "writer_incremental", True)
+    client = ScriptedClient()
+    wf = _workflow(monkeypatch, client=client)
+
+    async def main():
+        try:
+            # 报告文件名精确到秒，先读出首次报告再重跑
+            first = (await wf.run_topic("multi-agent", max_papers=4, source="inc-1", timeout=60)).read_text(encoding="utf-8")
+            calls = len(client.calls)
+            second = await wf.run_topic("multi-agent", max_papers=4, source="inc-2", timeout=60)
+            return first, second, client.calls[calls:]
+        finally:
+            await wf.stop()
+
+    first, second, rerun_calls = asyncio.run(main())
+    assert not [c for c in rerun_calls if "学术写作专家" in c[0]]
+    reused = [e for e in progress_bus.history("inc-2") if e["stage"] == "section_reused"]
+    assert len(reused) == len(settings.section_outline)
+    assert second.read_text(encoding="utf-8") == first
+
+
+def test_report_lists_every_approved_paper(pipeline_settings, monkeypatch):
+    """知识库中已有同一批论文的分析时，核心论文片段（及其引用编号）仍进入各章提示与参考文献"""
+    wf = _workflow(monkeypatch)
+
+    async def main():
+        try:
+            return await wf.run_topic("multi-agent", max_papers=4, source="refs", timeout=60)
+        finally:
+            await wf.stop()
+
+    report = asyncio.run(main()).read_text(encoding="utf-8")
+    references = report.split("## 参考文献", 1)[1].strip().splitlines()
+    assert {ref.split("] ", 1)[1] for ref in references} == {p["title"] for p in fixture_papers("multi-agent", 4)}
+
+
+def test_per_run_agent_state_is_released(pipeline_settings, monkeypatch):
+    """同一工作流连续运行多个主题：运行时保留的各运行键 Agent 实例不再持有评级、论文与向量"""
+    from autogen_core import AgentId
+    from agents.coordinator_agent import CoordinatorAgent
+    from agents.writer_agent import WriterAgent
+
+    wf = _workflow(monkeypatch)
+    sources = [f"topic-{i}" for i in range(5)]
+
+    async def main():
+        try:
+            for i, source in enumerate(sources):
+                await wf.run_topic(f"topic {i}", max_papers=4, source=source, timeout=60)
+            writers = [await wf.runtime.try_get_underlying_agent_instance(AgentId("WriterAgent", s), WriterAgent) for s in sources]
+            coordinators = [
+                await wf.runtime.try_get_underlying_agent_instance(AgentId("CoordinatorAgent", s), CoordinatorAgent)
+                for s in sources
+            ]
+            return writers, coordinators
+        finally:
+            await wf.stop()
+
+    writers, coordinators = asyncio.run(main())
+    for writer in writers:
+        assert writer._approved_papers == [] and writer._paper_snippets == []
+    for coordinator in coordinators:
+        assert coordinator._grades == [] and coordinator._outcomes == {} and coordinator._streams == {}
+
+
+def test_timeout_aborts_run(pipeline_settings, monkeypatch):
+    """run_topic 超时：该运行的 Agent 收到 AbortRun，不再继续摘要与撰写，也不会保存报告"""
+    from pathlib import Path
+    from utils.progress import progress_bus
+
+    class SlowClient(ScriptedClient):
+        async def create(self, messages, **kwargs):
+            await asyncio.sleep(0.2)
+            return await super().create(messages, **kwargs)
+
+    client = SlowClient()
+    wf = _workflow(monkeypatch, client=client)
+
+    async def main():
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await wf.run_topic("multi-agent", max_papers=6, source="late", timeout=0.5)
+            await asyncio.sleep(1.5)
+        finally:
+            await wf.stop()
+
+    asyncio.run(main())
+    assert len([c for c in client.calls if "三要素" in c[0]]) < 6
+    assert not [c for c in client.calls if "学术写作专家" in c[0]]
+    assert "aborted" in [e["stage"] for e in progress_bus.history("late")]
+    assert not list(Path("cache/reports").glob("*.md"))
+
+
+def test_aborted_run_releases_trace_stats(pipeline_settings, monkeypatch):
+    """中止的运行（不写运行清单）同样结束追踪统计，之后完成的处理器 span 也不会重建"""
+    import workflows.sequential_workflow as W
+    from utils.tracing import tracer
+
+    monkeypatch.setattr(settings, "tracing_enabled", True)
+    monkeypatch.setattr(settings, "tracing_dir", str(pipeline_settings / "traces"))
+    monkeypatch.setattr(tracer, "out_dir", pipeline_settings / "traces")
+    wf = _workflow(monkeypatch)
+
+    def _broken(wf):
+        raise OSError("嵌入模型加载失败")
+
+    monkeypatch.setattr(W.ResearchWorkflow, "_create_embedding_service", _broken)
+
+    async def main():
+        try:
+            with pytest.raises(RuntimeError):
+                await wf.run_topic("multi-agent", max_papers=4, source="traced-abort", timeout=30)
+        finally:
+            await wf.stop()
+
+    asyncio.run(main())
+    tracer.flush()
+    assert "traced-abort" not in tracer._runs
+
+
+def test_streaming_failure_closes_report_stream(pipeline_settings, monkeypatch):
+    """流式撰写中途失败：Coordinator 中止时关闭并移除未完成的报告流，.part 文件保留"""
+    from autogen_core import AgentId
+    from agents.coordinator_agent import CoordinatorAgent
+    from utils.report_stream import ReportStream
+
+    monkeypatch.setattr(settings, "report_streaming", True)
+    monkeypatch.setattr(settings, "report_stream_chunk_chars", 1)
+
+    class FailingSecondSection(ScriptedClient):
+        sections = 0
+
+        async def create(self, messages, **kwargs):
+            system = " ".join(m.content for m in messages if type(m).__name__ == "SystemMessage")
+            if "学术写作专家" in system:
+                self.sections += 1
+                if self.sections == 2:
+                    raise ConnectionError("模型服务断开")
+            return await super().create(messages, **kwargs)
+
+    wf = _workflow(monkeypatch, client=FailingSecondSection())
+    opened = []
+    real_init = ReportStream.__init__
+
+    def _tracking_init(stream, path):
+        real_init(stream, path)
+        opened.append(stream)
+
+    monkeypatch.setattr(ReportStream, "__init__", _tracking_init)
+
+    async def main():
+        try:
+            with pytest.raises(RuntimeError, match="write"):
+                await wf.run_topic("multi-agent", max_papers=4, source="stream-fail", timeout=30)
+            return await wf.runtime.try_get_underlying_agent_instance(AgentId("CoordinatorAgent", "stream-fail"), CoordinatorAgent)
+        finally:
+            await wf.stop()
+
+    coordinator = asyncio.run(main())
+    assert coordinator._streams == {}
+    assert opened and all(s._file.closed and s.part_path.exists() for s in opened)
+
+
+def test_agent_state_stays_flat_over_many_topics(pipeline_settings, monkeypatch):
+    """浸泡：同一工作流连续处理大量主题（含未采集到论文而中止的运行），运行时保留的每个 Agent 实例都不再持有运行数据
+
+    除处理器表与配置的章节目录外，任何实例上的容器属性都应为空，追踪统计也不随运行数增长。
+    """
+    from utils.tracing import tracer
+
+    class SometimesEmpty(FixtureArxiv):
+        def search_papers(self, query, max_results=50):
+            return [] if query.startswith("empty") else super().search_papers(query, max_results)
+
+    wf = _workflow(monkeypatch)
+    wf.arxiv_service = SometimesEmpty(4)
+    topics = [f"empty {i}" if i % 5 == 4 else f"topic {i}" for i in range(20)]
+
+    def _retained():
+        held = []
+        for agent_id, agent in wf.runtime._instantiated_agents.items():
+            for name, value in vars(agent).items():
+                if isinstance(value, (list, dict, set)) and value and name not in ("_handlers", "_sections"):
+                    held.append((agent_id.type, agent_id.key, name, len(value)))
+        return held
+
+    async def main():
+        held = []
+        try:
+            for i, topic in enumerate(topics):
+                try:
+                    await wf.run_topic(topic, max_papers=4, source=f"soak-{i}", timeout=60)
+                except RuntimeError:
+                    pass
+                if i % 5 == 4:
+                    held.append(_retained())
+            return held, len(wf.runtime._instantiated_agents)
+        finally:
+            await wf.stop()
+
+    held, instances = asyncio.run(main())
+    assert instances >= len(topics)
+    assert held == [[]] * len(held)
+    assert not [key for key in tracer._runs if key.startswith("soak-")]
@@ -0,0 +1,298 @@
+"""外部交互录制/回放（cassette）
+
+录制模式下记录一次运行中全部模型调用（create/create_stream）、arXiv 检索结果与 MCP 工具调用，
+保存为 gzip 压缩的 JSON Lines 文件；回放模式下按记录结果驱动同一工作流，完全离线运行，
+可尽快返回或按录制时的耗时等待，用于在不访问网络的情况下二分定位自身代码的性能回归。
+
+回放匹配规则：先按请求内容哈希精确匹配；代码改动导致提示词变化时，退回按系统提示词
+（即调用类型）的录制顺序依次取用，并输出警告。
+"""
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+from loguru import logger
+
+from config.settings import settings
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(KeyError):
+    """回放时找不到匹配的录制条目"""
+
+
+def _digest(obj: Any) -> str:
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _message_content(message) -> Any:
+    content = getattr(message, "content", None)
+    if isinstance(content, (str, type(None))):
+        return content
+    return [getattr(c, "model_dump", lambda: repr(c))() for c in content]
+
+
+def llm_request_key(messages, tools=None, json_output=None) -> Dict[str, str]:
+    """模型请求的匹配键（不含消息 source，运行键不同的相同请求视为同一请求）"""
+    body = [[type(m).__name__, _message_content(m)] for m in messages]
+    system = next((m.content for m in messages if type(m).__name__ == "SystemMessage"), "")
+    tool_names = sorted(getattr(t, "name", str(t)) for t in (tools or []))
+    return {
+        "key": _digest([body, tool_names, json_output]),
+        "channel": _digest(system),
+    }
+
+
+class Cassette:
+    """录制/回放状态（mode: off/record/replay）"""
+
+    def __init__(self):
+        self.mode = "off"
+        self.path: Optional[Path] = None
+        self.timing = "fast"
+        self._entries: List[Dict] = []
+        self._by_key: Dict[tuple, Deque[Dict]] = defaultdict(deque)
+        self._by_channel: Dict[tuple, Deque[Dict]] = defaultdict(deque)
+        self._last: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, path: str) -> None:
+        """开始录制，close() 时写出文件"""
+        self.mode, self.path = "record", Path(path)
+        self._entries = []
+        self._started = time.monotonic()
+        logger.info(f"录制外部交互: {self.path}")
+
+    def replay(self, path: str, timing: str = "fast") -> None:
+        """加载录制文件进入回放模式（timing: fast 立即返回 / recorded 按录制耗时等待）"""
+        if timing not in ("fast", "recorded"):
+            raise ValueError(f"未知的回放节奏: {timing}")
+        self.mode, self.path, self.timing = "replay", Path(path), timing
+        self._by_key.clear()
+        self._by_channel.clear()
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"不支持的 cassette 版本: {header.get('version')}")
+            for line in f:
+                entry = json.loads(line)
+                entry["used"] = False
+                self._by_key[(entry["kind"], entry["key"])].append(entry)
+                self._by_channel[(entry["kind"], entry.get("channel", ""))].append(entry)
+        total = sum(len(q) for q in self._by_key.values())
+        logger.info(f"回放外部交互: {self.path}（{total} 条，节奏 {timing}）")
+
+    def recorded_queries(self) -> List[str]:
+        """回放文件中的 arXiv 检索主题（按录制顺序）"""
+        entries = sorted(self._by_channel.get(("arxiv", "arxiv"), []), key=lambda e: e.get("t", 0))
+        return [e["query"] for e in entries if "query" in e]
+
+    def close(self) -> Optional[Path]:
+        """结束录制并写出文件（回放模式仅重置状态）"""
+        path, mode = self.path, self.mode
+        self.mode = "off"
+        if mode != "record" or path is None:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = {"version": CASSETTE_VERSION, "model_name": settings.model_name, "created_at": time.time()}
+        with self._lock:
+            entries, self._entries = self._entries, []
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        logger.success(f"录制完成: {path}（{len(entries)} 条）")
+        return path
+
+    def _append(self, kind: str, key: str, response: Any, elapsed_s: float, channel: str = "", **extra) -> None:
+        entry = {
+            "kind": kind, "key": key, "channel": channel,
+            "t": round(time.monotonic() - self._started - elapsed_s, 4),
+            "elapsed_s": round(elapsed_s, 4),
+            **extra,
+            "response": response,
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    @staticmethod
+    def _pop(queue: Optional[Deque[Dict]]) -> Optional[Dict]:
+        while queue:
+            entry = queue.popleft()
+            if not entry["used"]:
+                entry["used"] = True
+                return entry
+        return None
+
+    def _take(self, kind: str, key: str, channel: str = "") -> Dict:
+        """取用录制条目：精确命中 → 重复请求复用上次结果 → 同类调用按录制顺序"""
+        with self._lock:
+            entry = self._pop(self._by_key.get((kind, key))) or self._last.get((kind, key))
+            if entry is None:
+                entry = self._pop(self._by_channel.get((kind, channel)))
+                if entry is not None:
+                    logger.warning(f"回放未精确命中，按录制顺序取用: {kind} ({channel[:8]})")
+            if entry is None:
+                raise CassetteMiss(f"cassette 中没有匹配的 {kind} 请求: {key}")
+            self._last[(kind, key)] = entry
+        return entry
+
+    async def _wait(self, entry: Dict) -> None:
+        if self.timing == "recorded" and entry.get("elapsed_s"):
+            await asyncio.sleep(entry["elapsed_s"])
+
+    # --- arXiv ---
+
+    def search_papers(self, inner, query: str, max_results: int) -> List[Dict]:
+        key = _digest(["arxiv", query, max_results])
+        if self.replaying:
+            entry = self._take("arxiv", key, "arxiv")
+            if self.timing == "recorded":
+                time.sleep(entry.get("elapsed_s", 0))
+            return entry["response"]
+        start = time.monotonic()
+        papers = inner.search_papers(query, max_results)
+        if self.recording:
+            self._append("arxiv", key, papers, time.monotonic() - start, channel="arxiv", query=query)
+        return papers
+
+    # --- MCP ---
+
+    async def load_tools(self, server_name: str, loader: Callable[[], Awaitable[List[Any]]]) -> List[Any]:
+        """加载 MCP 服务器工具；回放时返回只含名称/模式的替身工具"""
+        key = _digest(["mcp_tools", server_name])
+        if self.replaying:
+            entry = self._take("mcp_tools", key, "mcp_tools")
+            return [ReplayTool(self, **spec) for spec in entry["response"]]
+        start = time.monotonic()
+        tools = await loader()
+        if self.recording:
+            specs = [{"name": t.name, "description": getattr(t, "description", ""), "schema": getattr(t, "schema", {})} for t in tools]
+            self._append("mcp_tools", key, specs, time.monotonic() - start, channel="mcp_tools", server=server_name)
+        return tools
+
+    async def run_tool(self, tool, args: Dict, cancellation_token) -> Any:
+        """执行 MCP 工具调用；录制时保存结果的字符串形式（失败时保存异常信息）"""
+        key = _digest(["mcp_call", tool.name, args])
+        if self.replaying:
+            entry = self._take("mcp_call", key, tool.name)
+            await self._wait(entry)
+            if "error" in entry["response"]:
+                raise RuntimeError(entry["response"]["error"])
+            return entry["response"]["result"]
+        if not self.recording:
+            return await tool.run_json(args, cancellation_token)
+        start = time.monotonic()
+        try:
+            result = await tool.run_json(args, cancellation_token)
+        except Exception as e:
+            self._append("mcp_call", key, {"error": str(e)}, time.monotonic() - start, channel=tool.name)
+            raise
+        self._append("mcp_call", key, {"result": str(result)}, time.monotonic() - start, channel=tool.name)
+        return result
+
+
+class ReplayTool:
+    """回放模式下的 MCP 工具替身（模型调用同样来自录制，工具对象只需名称与模式）"""
+
+    def __init__(self, cassette: Cassette, name: str, description: str = "", schema: Optional[Dict] = None):
+        self._cassette = cassette
+        self.name = name
+        self.description = description
+        self.schema = schema or {}
+
+    async def run_json(self, args: Dict, cancellation_token) -> Any:
+        return await self._cassette.run_tool(self, args, cancellation_token)
+
+
+class CassetteModelClient:
+    """模型客户端代理：录制模式记录请求/响应，回放模式不访问网络（inner 可为 None）"""
+
+    def __init__(self, inner, cassette: Cassette):
+        self._inner = inner
+        self._cassette = cassette
+
+    def __getattr__(self, name):
+        if self._inner is None:
+            raise AttributeError(name)
+        return getattr(self._inner, name)
+
+    @staticmethod
+    def _key(args, kwargs) -> Dict[str, str]:
+        messages = kwargs.get("messages", args[0] if args else [])
+        return llm_request_key(messages, kwargs.get("tools"), kwargs.get("json_output"))
+
+    async def create(self, *args, **kwargs):
+        from autogen_core.models import CreateResult
+
+        key = self._key(args, kwargs)
+        if self._cassette.replaying:
+            entry = self._cassette._take("llm", key["key"], key["channel"])
+            await self._cassette._wait(entry)
+            return CreateResult.model_validate(entry["response"])
+        start = time.monotonic()
+        result = await self._inner.create(*args, **kwargs)
+        if self._cassette.recording:
+            self._cassette._append("llm", key["key"], result.model_dump(mode="json"), time.monotonic() - start, key["channel"])
+        return result
+
+    async def create_stream(self, *args, **kwargs):
+        from autogen_core.models import CreateResult
+
+        key = self._key(args, kwargs)
+        if self._cassette.replaying:
+            entry = self._cassette._take("llm_stream", key["key"], key["channel"])
+            chunks = entry["response"]["chunks"]
+            delay = entry.get("elapsed_s", 0) / max(1, len(chunks)) if self._cassette.timing == "recorded" else 0
+            for chunk in chunks:
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk
+            yield CreateResult.model_validate(entry["response"]["result"])
+            return
+        start = time.monotonic()
+        chunks: List[str] = []
+        async for item in self._inner.create_stream(*args, **kwargs):
+            if isinstance(item, str):
+                chunks.append(item)
+            elif self._cassette.recording:
+                self._cassette._append(
+                    "llm_stream", key["key"],
+                    {"chunks": chunks, "result": item.model_dump(mode="json")},
+                    time.monotonic() - start, key["channel"],
+                )
+            yield item
+
+
+class CassetteArxivService:
+    """ArxivService 代理：检索结果经由 cassette 录制/回放"""
+
+    def __init__(self, inner, cassette: Cassette):
+        self._inner = inner
+        self._cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def search_papers(self, query: str, max_results: int = 50) -> List[Dict]:
+        return self._cassette.search_papers(self._inner, query, max_results)
+
+
+# 全局录制/回放状态
+cassette = Cassette()
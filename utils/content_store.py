@@ -0,0 +1,107 @@
+"""内容寻址存储：大文本/列表写入一次，消息中只传递内容哈希
+
+分布式模式下多个进程需挂载同一目录（本机多进程直接共享 ./cache/content）。
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import threading
+import time
+from loguru import logger
+
+from config.settings import settings
+
+
+class ContentStore:
+    """按 sha256 存取内容，进程内保留一个小的 LRU 缓存
+
+    同一内容只写一次；文件先写临时文件再原子重命名，多进程并发写入同一哈希也是安全的。
+    """
+
+    def __init__(self, root: str, memory_items: int = 256):
+        self.root = Path(root)
+        self._memory_items = memory_items
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, ref: str) -> Path:
+        return self.root / ref[:2] / ref[2:]
+
+    def _remember(self, ref: str, data: bytes) -> None:
+        with self._lock:
+            self._memory[ref] = data
+            self._memory.move_to_end(ref)
+            while len(self._memory) > self._memory_items:
+                self._memory.popitem(last=False)
+
+    def put(self, data: Union[str, bytes]) -> str:
+        """写入内容，返回内容哈希"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        ref = hashlib.sha256(data).hexdigest()
+        path = self._path(ref)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        self._remember(ref, data)
+        return ref
+
+    def put_json(self, obj: Any) -> str:
+        return self.put(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+
+    def get(self, ref: str) -> bytes:
+        with self._lock:
+            data = self._memory.get(ref)
+            if data is not None:
+                self._memory.move_to_end(ref)
+                return data
+        try:
+            data = self._path(ref).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(f"内容不存在: {ref}")
+        self._remember(ref, data)
+        return data
+
+    def get_text(self, ref: str) -> str:
+        return self.get(ref).decode("utf-8")
+
+    def get_json(self, ref: str) -> Any:
+        return json.loads(self.get(ref))
+
+    def prune(self, older_than_hours: float) -> int:
+        """删除超过指定时长未写入的内容，返回删除数量"""
+        cutoff = time.time() - older_than_hours * 3600
+        removed = 0
+        if not self.root.exists():
+            return 0
+        for path in self.root.glob("*/*"):
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        with self._lock:
+            self._memory.clear()
+        logger.info(f"内容存储清理完成，删除 {removed} 项")
+        return removed
+
+
+# 全局内容存储
+content_store = ContentStore(settings.content_store_dir)
+
+
+def text_or_ref(text: str) -> Tuple[str, str]:
+    """按配置返回 (内联文本, 内容引用)：启用引用传递时内联为空"""
+    if settings.message_by_reference and text:
+        return "", content_store.put(text)
+    return text, ""
+
+
+def json_or_ref(obj: Any) -> Tuple[Optional[Any], str]:
+    """按配置返回 (内联对象, 内容引用)：启用引用传递时内联为 None"""
+    if settings.message_by_reference and obj:
+        return None, content_store.put_json(obj)
+    return obj, ""
@@ -0,0 +1,139 @@
+"""章节草稿存储（AssemblerAgent 使用）
+
+按运行（run_id）暂存 SectionDraft，装配完成后整体移除：
+- 同时保留的运行数超过 max_runs 时，丢弃最久未更新的运行（通常是中途失败、永远不会装配的运行）；
+- 单个运行内联正文超过 spill_bytes 后，将该运行的正文溢写到 spill_dir/<run_id>/，内存只保留元数据；
+- 装配时读取的正文在运行移除时随目录一并删除。
+批量/服务模式下长期运行的进程，草稿内存因此不随运行次数增长。
+"""
+from collections import OrderedDict
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, Optional
+import re
+import shutil
+from loguru import logger
+
+from config.settings import settings
+from utils.message_types import SectionDraft
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+class RunDrafts:
+    """单个运行的草稿（section_id → SectionDraft），正文可能已溢写到磁盘"""
+
+    def __init__(self, run_id: str, spill_dir: Path):
+        self.run_id = run_id
+        self._dir = spill_dir / _safe_name(run_id)
+        self._drafts: Dict[str, SectionDraft] = {}
+        self._spilled: Dict[str, Path] = {}
+        self.memory_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._drafts)
+
+    @property
+    def spilled(self) -> bool:
+        return bool(self._spilled)
+
+    def put(self, draft: SectionDraft) -> None:
+        self.discard(draft.section_id)
+        if self._spilled:
+            # 已溢写的运行，新草稿直接落盘
+            draft = self._spill_one(draft)
+        self._drafts[draft.section_id] = draft
+        self.memory_bytes += len(draft.content.encode("utf-8"))
+
+    def get(self, section_id: str) -> Optional[SectionDraft]:
+        draft = self._drafts.get(section_id)
+        path = self._spilled.get(section_id)
+        if draft is None or path is None:
+            return draft
+        return replace(draft, content=path.read_text(encoding="utf-8"))
+
+    def discard(self, section_id: str) -> None:
+        old = self._drafts.pop(section_id, None)
+        if old is not None:
+            self.memory_bytes -= len(old.content.encode("utf-8"))
+        path = self._spilled.pop(section_id, None)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def spill(self) -> None:
+        """将内存中的全部内联正文写入磁盘"""
+        for section_id, draft in list(self._drafts.items()):
+            if draft.content:
+                self._drafts[section_id] = self._spill_one(draft)
+        self.memory_bytes = 0
+
+    def _spill_one(self, draft: SectionDraft) -> SectionDraft:
+        if not draft.content:
+            return draft
+        self._dir.mkdir(parents=True, exist_ok=True)
+        path = self._dir / f"{_safe_name(draft.section_id)}.md"
+        path.write_text(draft.content, encoding="utf-8")
+        self._spilled[draft.section_id] = path
+        return replace(draft, content="")
+
+    def close(self) -> None:
+        """释放草稿并删除溢写文件"""
+        self._drafts.clear()
+        self._spilled.clear()
+        self.memory_bytes = 0
+        if self._dir.exists():
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class DraftStore:
+    """按运行组织的有界草稿存储（LRU 上限 + 超阈值溢写）"""
+
+    def __init__(self, spill_dir: str, max_runs: int = 32, spill_bytes: int = 4 * 1024 * 1024):
+        self.spill_dir = Path(spill_dir)
+        self.max_runs = max_runs
+        self.spill_bytes = spill_bytes
+        self._runs: "OrderedDict[str, RunDrafts]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def put(self, draft: SectionDraft) -> None:
+        """暂存草稿（同一运行同一章节重复提交时覆盖）"""
+        run = self._runs.get(draft.run_id)
+        if run is None:
+            run = self._runs[draft.run_id] = RunDrafts(draft.run_id, self.spill_dir)
+        self._runs.move_to_end(draft.run_id)
+        run.put(draft)
+        if not run.spilled and self.spill_bytes > 0 and run.memory_bytes > self.spill_bytes:
+            run.spill()
+            logger.info(f"草稿超过 {self.spill_bytes} 字节，已溢写到磁盘: run={draft.run_id}")
+        while self.max_runs > 0 and len(self._runs) > self.max_runs:
+            run_id, stale = self._runs.popitem(last=False)
+            logger.warning(f"装配中的运行数超过上限 {self.max_runs}，丢弃最久未更新的运行: {run_id}（{len(stale)} 章）")
+            stale.close()
+
+    def pop(self, run_id: str) -> RunDrafts:
+        """取出运行的全部草稿（不存在时返回空集合），调用方用完后 close()"""
+        run = self._runs.pop(run_id, None)
+        return run if run is not None else RunDrafts(run_id, self.spill_dir)
+
+    def memory_bytes(self) -> int:
+        return sum(run.memory_bytes for run in self._runs.values())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "runs": len(self._runs),
+            "drafts": sum(len(run) for run in self._runs.values()),
+            "spilled_runs": sum(1 for run in self._runs.values() if run.spilled),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+# 全局草稿存储（同一进程内的全部 AssemblerAgent 实例共享，LRU 上限按进程计）
+draft_store = DraftStore(
+    settings.assembler_spill_dir,
+    max_runs=settings.assembler_max_runs,
+    spill_bytes=settings.assembler_spill_bytes,
+)
@@ -0,0 +1,90 @@
+"""Agent 故障上报：处理器未捕获的异常与 Agent 构造失败都通知 Coordinator
+
+能定位到论文的消息（PaperData/SummaryData/AnalysisData）逐篇发布 PaperFailure，Coordinator 照常完成计数；
+无法定位论文的故障（构造失败、撰写/装配阶段异常）发布 AgentFailure，Coordinator 据此提前收尾本次运行。
+否则运行时只记录日志并丢弃消息，Coordinator 只能干等阶段超时。
+
+AbortableRun 供按运行键实例化的工作 Agent 混入：收到 AbortRun（如任务超时）后不再开始新的工作。
+"""
+from typing import Any, Awaitable, Callable, List, Tuple, TypeVar
+import functools
+from autogen_core import AgentId, AgentInstantiationContext, MessageContext, TopicId, message_handler
+from loguru import logger
+from utils.message_types import AbortRun, AgentFailure, PaperData, PaperFailure
+
+T = TypeVar("T")
+
+# 论文级阶段：故障只影响部分论文，其余论文仍可能完成
+PAPER_STAGES = frozenset({"summarize", "analyze", "grade"})
+
+
+def _papers_of(message: Any) -> List[Tuple[str, str]]:
+    """消息涉及的论文 (ID, 标题)；无法确定时返回空列表"""
+    if isinstance(message, PaperData):
+        try:
+            return [(p.get("id", ""), p.get("title", "")) for p in message.get_papers()]
+        except Exception:
+            return []
+    paper_id = getattr(message, "paper_id", "")
+    return [(paper_id, getattr(message, "title", ""))] if paper_id else []
+
+
+async def report_failure(
+    publish: Callable[..., Awaitable[None]],
+    agent_id: AgentId,
+    stage: str,
+    reason: str,
+    message: Any = None,
+) -> None:
+    """向本次运行的 Coordinator 上报故障（publish 为 Agent 或运行时的 publish_message）"""
+    coordinator = TopicId("CoordinatorAgent", source=agent_id.key)
+    papers = _papers_of(message)
+    for paper_id, title in papers:
+        await publish(PaperFailure(paper_id=paper_id, title=title, stage=stage, reason=reason[:200]), coordinator)
+    if not papers:
+        await publish(AgentFailure(agent_type=agent_id.type, stage=stage, reason=reason[:200]), coordinator)
+
+
+def reports_failures(stage: str) -> Callable:
+    """包装 Agent 消息处理函数（置于 @traced_handler 之下）：未捕获的异常记录日志并上报 Coordinator"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(self, message, ctx):
+            try:
+                return await func(self, message, ctx)
+            except Exception as e:
+                logger.exception(f"{self.id.type} 处理 {type(message).__name__} 失败: {e}")
+                await report_failure(self.publish_message, self.id, stage, f"{type(e).__name__}: {e}", message)
+        return wrapper
+    return decorator
+
+
+def guarded_factory(stage: str, factory: Callable[[], Awaitable[T]]) -> Callable[[], Awaitable[T]]:
+    """包装协程 Agent 工厂：构造失败（如服务预热失败）时先上报 Coordinator 再抛出
+
+    运行时随后丢弃触发实例化的消息；下一条消息会重新调用工厂。
+    """
+    async def _factory() -> T:
+        try:
+            return await factory()
+        except Exception as e:
+            runtime = AgentInstantiationContext.current_runtime()
+            agent_id = AgentInstantiationContext.current_agent_id()
+            await report_failure(runtime.publish_message, agent_id, stage, f"Agent 构造失败: {e}")
+            raise
+    return _factory
+
+
+class AbortableRun:
+    """运行中止标记（与 RoutedAgent 一同继承）：收到 AbortRun 后 aborted 为真，处理器据此跳过尚未开始的工作"""
+
+    _aborted = False
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted
+
+    @message_handler
+    async def handle_abort_run(self, message: AbortRun, ctx: MessageContext) -> None:
+        self._aborted = True
+        logger.warning(f"{self.id.type} 中止运行 {self.id.key}: {message.reason}")
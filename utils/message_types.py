@@ -1,30 +1,56 @@
-"""Agent间消息协议定义"""
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+"""Agent间消息协议定义
 
+大块内容（论文列表、分析文本、章节正文）既可内联传递，也可只传递内容存储中的哈希引用（*_ref 字段），
+由处理方在真正需要时通过 get_*() 解析。是否使用引用由 settings.message_by_reference 控制。
+全部消息均为 slots dataclass，降低内存占用与属性访问开销。
+"""
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Optional
 
-@dataclass
+
+def _resolve_text(inline: str, ref: str) -> str:
+    if inline or not ref:
+        return inline
+    from utils.content_store import content_store
+    return content_store.get_text(ref)
+
+
+def _resolve_json(inline: Any, ref: str) -> Any:
+    if inline or not ref:
+        return inline
+    from utils.content_store import content_store
+    return content_store.get_json(ref)
+
+
+@dataclass(slots=True)
 class PaperRequest:
     """论文请求消息"""
     keyword: str  # 搜索关键词
     max_count: int  # 最大论文数
+    sections: List[str] = field(default_factory=list)  # 章节目录覆盖（为空时使用配置）
 
 
-@dataclass
+@dataclass(slots=True)
 class PaperData:
     """论文数据消息"""
-    papers: List[Dict]  # 论文列表: {id, title, authors, abstract, url, published}
+    papers: List[Dict] = field(default_factory=list)  # 论文列表: {id, title, authors, abstract, url, published}
+    topic: str = ""  # 研究主题（用于知识库命名空间）
+    papers_ref: str = ""  # 论文列表的内容引用（与 papers 二选一）
+
+    def get_papers(self) -> List[Dict]:
+        return _resolve_json(self.papers, self.papers_ref) or []
 
 
-@dataclass
+@dataclass(slots=True)
 class SummaryData:
     """摘要数据消息"""
     paper_id: str
     title: str
     summary: Dict  # {research_problem, method, value}
+    topic: str = ""  # 研究主题（用于知识库命名空间）
 
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisData:
     """分析数据消息"""
     paper_id: str
@@ -33,17 +59,51 @@ class AnalysisData:
     key_concepts: List[str]  # 关键概念
 
 
-@dataclass
+@dataclass(slots=True)
 class GradeData:
     """评级数据消息"""
     paper_id: str
     title: str
     risk_score: float  # 风险评分
     approved: bool  # 是否通过审核
-    analysis: str  # 分析内容
+    analysis: str = ""  # 分析内容
+    analysis_ref: str = ""  # 分析内容的内容引用（与 analysis 二选一）
+
+    def get_analysis(self) -> str:
+        return _resolve_text(self.analysis, self.analysis_ref)
+
+
+@dataclass(slots=True)
+class PaperFailure:
+    """单篇论文在某阶段处理失败（Coordinator 据此完成计数，避免等待永远不会到达的评级）"""
+    paper_id: str
+    title: str
+    stage: str  # summarize/analyze/grade
+    reason: str
 
 
-@dataclass
+@dataclass(slots=True)
+class AgentFailure:
+    """Agent 构造失败或处理器异常且无法定位到具体论文（Coordinator 据此提前收尾，不再等待阶段超时）"""
+    agent_type: str
+    stage: str  # collect/summarize/analyze/grade/write/assemble
+    reason: str
+
+
+@dataclass(slots=True)
+class AbortRun:
+    """中止整个运行（如服务模式任务超时）：Coordinator 不再撰写并释放状态，其余 Agent 不再开始新的工作"""
+    reason: str
+
+
+@dataclass(slots=True)
+class StageDeadline:
+    """阶段超时（Coordinator 计时到期后经运行时投递给自身，与评级消息串行处理）"""
+    plan_seq: int  # 对应的处理计划序号，旧计划的超时消息被忽略
+    timeout_s: float
+
+
+@dataclass(slots=True)
 class ReportData:
     """报告数据消息"""
     topic: str  # 研究主题
@@ -51,40 +111,59 @@ class ReportData:
     references: List[str]  # 参考文献
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessingPlan:
     """处理计划（用于Coordinator掌握总量与主题）"""
     topic: str  # 研究主题
     total_papers: int  # 需要处理的论文总数
+    sections: List[str] = field(default_factory=list)  # 章节目录覆盖
 
 
-@dataclass
+@dataclass(slots=True)
 class GradeBatchData:
     """批量评级结果（Coordinator 收齐后一次性发送给 Writer）"""
     topic: str  # 研究主题
     grades: List[GradeData]  # 完整评级结果列表（可包含未通过）
+    sections: List[str] = field(default_factory=list)  # 章节目录覆盖
+    partial: bool = False  # 是否为超时/达到法定数后提前触发（部分论文尚未完成）
+    expected: int = 0  # 计划处理的论文总数
 
 
-@dataclass
+@dataclass(slots=True)
 class SectionPlan:
     """章节计划（可选，用于分章写作）"""
     topic: str
     sections: List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class SectionDraft:
     """章节草稿（可选，留给装配/质检Agent使用）"""
     topic: str
     run_id: str
     section_id: str
-    content: str
-    citations: List[str]
+    content: str = ""
+    citations: List[str] = field(default_factory=list)
+    content_ref: str = ""  # 章节正文的内容引用（与 content 二选一）
 
+    def get_content(self) -> str:
+        return _resolve_text(self.content, self.content_ref)
 
-@dataclass
+
+@dataclass(slots=True)
 class AssembleRequest:
     """装配请求：通知装配Agent开始合并草稿并输出最终报告"""
     topic: str
     run_id: str
     sections: List[str]
+
+
+@dataclass(slots=True)
+class ReportChunk:
+    """流式报告分片（report_streaming 模式）：Coordinator 按 seq 顺序追加写入报告文件，final 分片结束报告"""
+    topic: str
+    run_id: str
+    seq: int
+    content: str = ""
+    final: bool = False
+    references: List[str] = field(default_factory=list)  # 仅 final 分片携带
@@ -0,0 +1,204 @@
+"""运行剖析（main.py --profile）
+
+- 采样剖析：优先使用 pyinstrument（async_mode="enabled"，await 期间的耗时归到发起等待的协程），
+  输出 speedscope JSON 与 HTML；未安装时退化为内置栈采样器：后台线程按固定间隔采样主线程调用栈，
+  以当前 asyncio 任务的协程名作为栈底，输出 collapsed 格式（flamegraph.pl、speedscope 均可直接读取）；
+- 内存快照：在阶段边界（模型加载完成、论文采集完成、论文入库完成、报告写出）记录 tracemalloc 当前/阶段峰值、
+  分配最多的代码位置，以及进程 RSS/峰值 RSS。
+
+输出目录：./logs/profiles/<时间戳>/
+"""
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from loguru import logger
+
+from config.settings import settings
+from utils.progress import progress_bus
+
+# 进度事件 → 内存快照阶段名
+STAGE_EVENTS = {
+    "collected": "after_collect",
+    "writing": "after_ingestion",
+    "report_saved": "after_writing",
+}
+
+
+def _rss_bytes() -> Dict[str, Optional[int]]:
+    """当前 RSS 与峰值 RSS（字节；平台不支持时为 None）"""
+    rss = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+    except ImportError:
+        pass
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+class _StackSampler:
+    """内置栈采样器：以 asyncio 当前任务为栈底，累计 collapsed 栈计数"""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.samples: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _task_label(self) -> str:
+        # 读取事件循环当前正在执行的任务（无任务时事件循环处于调度/等待 IO）
+        current = getattr(asyncio.tasks, "_current_tasks", {})
+        task = current.get(self._loop) if self._loop is not None else None
+        if task is None:
+            return "<event loop>"
+        coro = task.get_coro()
+        return f"task:{getattr(coro, '__qualname__', task.get_name())}"
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(self._task_label())
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """一次运行的采样剖析与阶段内存快照"""
+
+    def __init__(self, out_dir: Optional[str] = None, interval_ms: Optional[float] = None):
+        root = Path(out_dir or settings.profile_dir)
+        self.out_dir = root / datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.interval_s = (interval_ms or settings.profile_interval_ms) / 1000
+        self.snapshots: List[Dict] = []
+        self._profiler = None
+        self._sampler: Optional[_StackSampler] = None
+        self._started_at = 0.0
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """开始剖析（需在事件循环中调用，异步调用栈才能正确归属）"""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._started_at = time.perf_counter()
+        tracemalloc.start(settings.profile_traceback_frames)
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler(interval=self.interval_s, async_mode="enabled")
+            self._profiler.start()
+            logger.info(f"剖析已启动（pyinstrument，采样间隔 {self.interval_s * 1000:.1f}ms）")
+        except ImportError:
+            self._sampler = _StackSampler(self.interval_s)
+            self._sampler.start()
+            logger.info(f"剖析已启动（内置栈采样器，采样间隔 {self.interval_s * 1000:.1f}ms；安装 pyinstrument 可获得更精确的异步调用栈）")
+        progress_bus.add_listener(self._on_progress)
+        self.mark("start")
+
+    def watch(self, workflow) -> None:
+        """模型客户端、嵌入模型与 Chroma 预热完成后记录 model_loaded 快照"""
+        async def _wait():
+            await workflow.wait_warmup()
+            self.mark("model_loaded")
+        self._watch_task = asyncio.get_running_loop().create_task(_wait())
+
+    def _on_progress(self, key: str, event: dict) -> None:
+        stage = STAGE_EVENTS.get(event.get("stage"))
+        if stage:
+            try:
+                self.mark(stage, run=key)
+            except Exception as e:
+                logger.warning(f"内存快照失败: {e}")
+
+    def mark(self, stage: str, **extra) -> Dict:
+        """记录阶段边界的内存快照；阶段峰值在每次快照后重置"""
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        top = []
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ])
+            for stat in snapshot.statistics("lineno")[:settings.profile_memory_top]:
+                frame = stat.traceback[0]
+                top.append({"location": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count})
+            tracemalloc.reset_peak()
+        entry = {
+            "stage": stage,
+            "elapsed_s": round(time.perf_counter() - self._started_at, 3),
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            **_rss_bytes(),
+            **extra,
+            "top_allocations": top,
+        }
+        self.snapshots.append(entry)
+        rss = entry["rss_bytes"]
+        logger.info(
+            f"内存快照 [{stage}] tracemalloc 当前 {current / 2**20:.1f}MB / 阶段峰值 {peak / 2**20:.1f}MB"
+            + (f"，RSS {rss / 2**20:.1f}MB" if rss else "")
+        )
+        return entry
+
+    def stop(self) -> Path:
+        """停止剖析并写出结果，返回输出目录"""
+        progress_bus.remove_listener(self._on_progress)
+        if self._watch_task is not None and not self._watch_task.done():
+            self._watch_task.cancel()
+        self.mark("end")
+        tracemalloc.stop()
+
+        if self._profiler is not None:
+            from pyinstrument.renderers import SpeedscopeRenderer
+            self._profiler.stop()
+            (self.out_dir / "profile.speedscope.json").write_text(
+                self._profiler.output(SpeedscopeRenderer()), encoding="utf-8"
+            )
+            (self.out_dir / "profile.html").write_text(self._profiler.output_html(), encoding="utf-8")
+        elif self._sampler is not None:
+            self._sampler.stop()
+            self._sampler.write(self.out_dir / "profile.collapsed.txt")
+
+        (self.out_dir / "memory.json").write_text(
+            json.dumps({"snapshots": self.snapshots}, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        logger.success(f"剖析结果已保存: {self.out_dir}")
+        return self.out_dir
@@ -0,0 +1,64 @@
+"""运行进度事件总线（按运行键 source 分发，供服务模式流式推送）"""
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List
+import asyncio
+import time
+
+
+class ProgressBus:
+    """进度事件总线
+
+    Agent 以自身实例键（即发布消息时的 source）调用 emit；订阅方按同一键获取事件队列。
+    每个键保留最近若干条历史，新订阅者先收到历史回放，避免错过早期阶段。
+    """
+
+    def __init__(self, history_size: int = 200):
+        self._history: Dict[str, Deque[dict]] = defaultdict(lambda: deque(maxlen=history_size))
+        self._subscribers: Dict[str, List[asyncio.Queue]] = defaultdict(list)
+        self._listeners: List[Callable[[str, dict], None]] = []
+
+    def emit(self, key: str, stage: str, **data) -> None:
+        """发布事件（需在事件循环线程中调用）"""
+        event = {"ts": time.time(), "stage": stage, **data}
+        self._history[key].append(event)
+        for listener in list(self._listeners):
+            listener(key, event)
+        for q in list(self._subscribers.get(key, [])):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+    def subscribe(self, key: str, maxsize: int = 1000) -> asyncio.Queue:
+        """订阅某运行键的事件（先回放历史）"""
+        q: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        for event in self._history.get(key, []):
+            q.put_nowait(event)
+        self._subscribers[key].append(q)
+        return q
+
+    def unsubscribe(self, key: str, q: asyncio.Queue) -> None:
+        subs = self._subscribers.get(key)
+        if subs and q in subs:
+            subs.remove(q)
+            if not subs:
+                self._subscribers.pop(key, None)
+
+    def add_listener(self, callback: Callable[[str, dict], None]) -> None:
+        """注册全局监听（所有运行键的事件都会同步回调，回调需足够轻量）"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, dict], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def history(self, key: str) -> List[dict]:
+        return list(self._history.get(key, []))
+
+    def clear(self, key: str) -> None:
+        """丢弃某运行键的历史（订阅者不受影响）"""
+        self._history.pop(key, None)
+
+
+# 全局进度总线
+progress_bus = ProgressBus()
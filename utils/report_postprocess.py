@@ -0,0 +1,248 @@
+"""报告后处理：单遍流式清理
+
+在一次逐行扫描中依次完成：跳过技术审校痕迹块、移除段首 AI 机械衔接词、
+每个自然段保留至多 3 个加粗、合并重复空行并去除首尾空白。
+全部正则在模块加载时编译；ReportPostProcessor 支持按流式分片 feed()，
+整体耗时与报告长度线性相关。
+
+另提供按二级标题切分/拼接报告与术语表提取（供终稿分章润色使用），以及参考文献排序。
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+import os
+import re
+
+# 出现即开始跳过的技术审校标记
+REVIEW_MARKERS = ["[章节修订稿]", "[章节核验后版本]", "技术审校结果", "修改后的章节", "主要修改说明", "修改要点", "主要调整"]
+
+# 段首 AI 常用机械衔接词（按顺序依次移除，前一个移除后露出的下一个仍会被移除）
+AI_TRANSITIONS = [
+    "首先", "其次", "再者", "最后", "总而言之", "综上所述", "值得注意的是", "值得一提的是",
+    "需要指出的是", "此外", "另外", "进一步地", "与此同时", "在此背景下", "基于上述分析",
+    "具体而言", "换言之",
+]
+
+# 每个自然段保留的加粗数量
+MAX_BOLD_PER_PARAGRAPH = 3
+
+_REVIEW_MARKER_RE = re.compile("|".join(re.escape(kw) for kw in REVIEW_MARKERS))
+_REVIEW_HEADING_RE = re.compile("修改|审校")
+# 可选分组串联，等价于按列表顺序逐个执行 re.sub(r"^词[，。、：]", "", ...)
+_TRANSITIONS_RE = re.compile("".join(f"(?:{re.escape(w)}[，。、：])?" for w in AI_TRANSITIONS))
+_TRANSITION_HEADS = frozenset(w[0] for w in AI_TRANSITIONS)
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+# 参考文献条目的全局编号：“[n] 标题”
+_REF_NUMBER_RE = re.compile(r"^\[(\d+)\]")
+# 术语写法：中文名（English），用于终稿分章润色时统一术语
+_TERM_RE = re.compile(r"([\u4e00-\u9fff]{2,16})[（(]([A-Za-z][A-Za-z0-9\- ]{0,40}?)[）)]")
+
+
+class ReportPostProcessor:
+    """流式报告后处理器：feed() 输入任意分片，返回可立即输出的已清理文本；close() 冲刷剩余部分
+
+    加粗计数以空行为段落边界，空行合并与首尾去空白均在行级状态机中完成，
+    因此分片方式不影响结果：feed 全部分片后再 close 的拼接结果与一次性处理相同。
+    """
+
+    def __init__(self):
+        self._partial = ""          # 尚未遇到换行的行尾
+        self._skip_block = False    # 处于技术审校块内
+        self._bold_count = 0        # 当前自然段已保留的加粗数
+        self._blank_run = 0         # 连续空行数
+        self._started = False       # 是否已输出过非空白内容
+        self._pending = ""          # 暂缓输出的空白（报告末尾的空白最终会被丢弃）
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        return self._emit(lines, final=False)
+
+    def close(self) -> str:
+        lines, self._partial = [self._partial], ""
+        return self._emit(lines, final=True)
+
+    def _emit(self, lines: List[str], final: bool) -> str:
+        out: List[str] = []
+        for line in lines:
+            line = self._process_line(line)
+            if line is not None:
+                out.append(line)
+        if not out:
+            return ""
+        # 非最终批次的每一行后都跟着换行；最终批次最后一行之后没有换行
+        text = "\n".join(out) + ("" if final else "\n")
+        return self._strip(text, final)
+
+    def _process_line(self, line: str):
+        """处理单行，返回 None 表示该行被丢弃"""
+        # 1. 技术审校标记行开始跳过，直到下一个非审校类二级标题
+        if _REVIEW_MARKER_RE.search(line):
+            self._skip_block = True
+            return None
+        if line.startswith("##") and not _REVIEW_HEADING_RE.search(line):
+            self._skip_block = False
+        if self._skip_block:
+            return None
+
+        # 2. 段首机械衔接词
+        if line[:1] in _TRANSITION_HEADS:
+            end = _TRANSITIONS_RE.match(line).end()
+            if end:
+                line = line[end:]
+
+        # 3. 空行为段落边界；合并连续空行
+        if not line:
+            self._bold_count = 0
+            self._blank_run += 1
+            return None if self._blank_run > 1 else line
+        self._blank_run = 0
+
+        # 4. 过度加粗：段内第 MAX_BOLD_PER_PARAGRAPH 个之后的加粗去掉标记
+        if "**" in line:
+            line = _BOLD_RE.sub(self._limit_bold, line)
+        return line
+
+    def _limit_bold(self, match: "re.Match") -> str:
+        self._bold_count += 1
+        return match.group(0) if self._bold_count <= MAX_BOLD_PER_PARAGRAPH else match.group(1)
+
+    def _strip(self, text: str, final: bool) -> str:
+        """去除报告首尾空白：开头的空白直接丢弃，末尾空白暂缓到后续出现内容时再输出"""
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        body = text.rstrip()
+        tail = text[len(body):]
+        if not body:
+            self._pending += tail
+            return ""
+        out = self._pending + body
+        self._pending = "" if final else tail
+        return out
+
+
+def post_process_report(raw: str) -> str:
+    """一次性后处理整份报告"""
+    processor = ReportPostProcessor()
+    return processor.feed(raw) + processor.close()
+
+
+def iter_post_process(chunks: Iterable[str]) -> Iterable[str]:
+    """逐片后处理流式报告，按片产出已清理文本"""
+    processor = ReportPostProcessor()
+    for chunk in chunks:
+        out = processor.feed(chunk)
+        if out:
+            yield out
+    out = processor.close()
+    if out:
+        yield out
+
+
+def split_sections(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """按二级标题切分报告，返回 (首个二级标题前的内容, [(标题行, 正文), ...])"""
+    preamble: List[str] = []
+    sections: List[Tuple[str, List[str]]] = []
+    for line in text.split("\n"):
+        if line.startswith("## "):
+            sections.append((line, []))
+        elif sections:
+            sections[-1][1].append(line)
+        else:
+            preamble.append(line)
+    return "\n".join(preamble).strip(), [(h, "\n".join(body).strip()) for h, body in sections]
+
+
+def join_sections(preamble: str, sections: List[Tuple[str, str]]) -> str:
+    """split_sections 的逆操作"""
+    parts = [preamble] if preamble else []
+    parts.extend(f"{heading}\n\n{body}" if body else heading for heading, body in sections)
+    return "\n\n".join(parts)
+
+
+def order_references(citations: Iterable[str]) -> List[str]:
+    """参考文献去重并按全局编号（“[n] 标题”）升序排列，无编号的条目按出现顺序排在最后"""
+    unique = [c for c in dict.fromkeys(citations) if c]
+
+    def _key(item: Tuple[int, str]) -> Tuple[int, int]:
+        pos, ref = item
+        match = _REF_NUMBER_RE.match(ref)
+        return (int(match.group(1)), pos) if match else (1 << 30, pos)
+
+    return [ref for _, ref in sorted(enumerate(unique), key=_key)]
+
+
+def build_glossary(text: str, limit: int = 20) -> Dict[str, str]:
+    """从报告中提取“中文名（English）”形式的术语表（按出现次数取前 limit 个）
+
+    正则向前贪婪匹配汉字，会带上术语前的修饰词，因此多次出现时取各写法的最长公共后缀，
+    无公共后缀（确有不同译名）时取出现最多的写法。
+    """
+    variants: Dict[str, Counter] = {}
+    for zh, en in _TERM_RE.findall(text):
+        variants.setdefault(en.strip(), Counter())[zh] += 1
+    ranked = sorted(variants.items(), key=lambda kv: -sum(kv[1].values()))[:limit]
+    glossary: Dict[str, str] = {}
+    for en, names in ranked:
+        suffix = os.path.commonprefix([name[::-1] for name in names])[::-1]
+        glossary[en] = suffix if len(suffix) >= 2 else names.most_common(1)[0][0]
+    return glossary
+
+
+class ThinkTagFilter:
+    """流式移除 <think>...</think>（大小写不敏感，标签可跨分片）
+
+    与 re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL | re.IGNORECASE) 结果一致：
+    思考块缓存到闭合标签出现后整体丢弃，未闭合的思考块在 close() 时原样输出。
+    每次只扫描新到达的分片（外加上一分片末尾可能被截断的标签），在原文上用忽略大小写的正则定位，
+    不对缓冲整体做 lower()，总耗时与输入长度成线性。
+    """
+
+    _OPEN = "<think>"
+    _CLOSE = "</think>"
+    _OPEN_RE = re.compile(re.escape(_OPEN), re.IGNORECASE)
+    _CLOSE_RE = re.compile(re.escape(_CLOSE), re.IGNORECASE)
+
+    def __init__(self):
+        self._tail = ""  # 上一分片末尾可能是被截断标签的部分
+        self._inside = False
+        self._held: List[str] = []  # 当前思考块已确认的内容（未闭合时 close() 原样输出）
+
+    def feed(self, chunk: str) -> str:
+        text, self._tail = self._tail + chunk, ""
+        out: List[str] = []
+        pos = 0
+        while pos < len(text):
+            tag, tag_re = (self._CLOSE, self._CLOSE_RE) if self._inside else (self._OPEN, self._OPEN_RE)
+            m = tag_re.search(text, pos)
+            if m is None:
+                rest = text[pos:]
+                keep = _partial_tag(rest, tag)
+                (self._held if self._inside else out).append(rest[:len(rest) - keep])
+                self._tail = rest[len(rest) - keep:]
+                break
+            if self._inside:
+                self._held = []
+            else:
+                out.append(text[pos:m.start()])
+                self._held = [m.group()]
+            self._inside = not self._inside
+            pos = m.end()
+        return "".join(out)
+
+    def close(self) -> str:
+        rest = "".join(self._held) + self._tail if self._inside else self._tail
+        self._tail, self._inside, self._held = "", False, []
+        return rest
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """text 末尾与 tag 前缀（忽略大小写）重合的最大长度"""
+    for n in range(min(len(text), len(tag) - 1), 0, -1):
+        if text[-n:].lower() == tag[:n]:
+            return n
+    return 0
@@ -0,0 +1,130 @@
+"""流式报告（settings.report_streaming）
+
+WriterAgent 以 create_stream 生成章节，ReportChunkPublisher 去除思考块后把模型输出攒成
+约 report_stream_chunk_chars 字的 ReportChunk 按序发布；CoordinatorAgent 为每个运行持有一个
+ReportStream，按 seq 重排分片、经 ReportPostProcessor 逐片清理后追加写入 `<报告名>.md.part`，
+收到 final 分片后写入参考文献并改名为正式报告。任何时刻内存中只保留当前章节与少量未写出的分片。
+"""
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.message_types import ReportChunk
+from utils.report_postprocess import ReportPostProcessor, ThinkTagFilter, order_references
+
+
+class ReportChunkPublisher:
+    """Writer 端：缓冲模型输出并分批发布 ReportChunk"""
+
+    def __init__(self, publish: Callable[[ReportChunk], Awaitable[None]], topic: str, run_id: str, chunk_chars: int = 512):
+        self._publish = publish
+        self._topic = topic
+        self._run_id = run_id
+        self._chunk_chars = max(1, chunk_chars)
+        self._seq = 0
+        self._buf: List[str] = []
+        self._buffered = 0
+        self._think: Optional[ThinkTagFilter] = None
+        self._lstrip = False
+        self.citations: List[str] = []
+
+    async def begin(self, text: str) -> None:
+        """开始新的一段输出：text 为标题等固定文本，随后 write() 的模型输出去除思考块与开头空白"""
+        await self.end()
+        self._think = ThinkTagFilter()
+        self._lstrip = True
+        self._append(text)
+
+    async def write(self, text: str) -> None:
+        """追加模型输出分片"""
+        if self._think is not None:
+            text = self._think.feed(text)
+        if self._lstrip:
+            text = text.lstrip()
+            self._lstrip = not text
+        self._append(text)
+        if self._buffered >= self._chunk_chars:
+            await self.flush()
+
+    async def end(self) -> None:
+        """结束当前一段输出"""
+        if self._think is not None:
+            tail = self._think.close()
+            self._think = None
+            if not self._lstrip or tail.strip():
+                self._append(tail)
+            self._append("\n\n")
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffered:
+            return
+        content = "".join(self._buf)
+        self._buf, self._buffered = [], 0
+        await self._send(ReportChunk(topic=self._topic, run_id=self._run_id, seq=self._seq, content=content))
+
+    async def close(self) -> None:
+        """发布 final 分片（携带去重并按编号排序的参考文献）"""
+        await self.end()
+        references = order_references(self.citations)
+        await self._send(ReportChunk(topic=self._topic, run_id=self._run_id, seq=self._seq, final=True, references=references))
+
+    def _append(self, text: str) -> None:
+        if text:
+            self._buf.append(text)
+            self._buffered += len(text)
+
+    async def _send(self, chunk: ReportChunk) -> None:
+        self._seq += 1
+        await self._publish(chunk)
+
+
+class ReportStream:
+    """Coordinator 端：按 seq 顺序把分片清理后追加到报告文件"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.part_path = path.with_name(path.name + ".part")
+        self.part_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.part_path, "w", encoding="utf-8")
+        self._processor = ReportPostProcessor()
+        self._next = 0
+        self._pending: Dict[int, ReportChunk] = {}
+        self.references: List[str] = []
+        self.chars = 0
+        self.done = False
+
+    def add(self, chunk: ReportChunk) -> bool:
+        """接收分片（可乱序），返回报告是否已完成"""
+        if self.done or chunk.seq < self._next:
+            return self.done
+        self._pending[chunk.seq] = chunk
+        while self._next in self._pending:
+            current = self._pending.pop(self._next)
+            self._next += 1
+            self._write(self._processor.feed(current.content))
+            if current.final:
+                self._finish(current.references)
+                return True
+        self._file.flush()
+        return False
+
+    def abort(self) -> None:
+        """放弃未完成的报告（保留 .part 文件供排查）"""
+        if not self._file.closed:
+            self._file.close()
+
+    def _write(self, text: str) -> None:
+        if not text:
+            return
+        self._file.write(text)
+        self.chars += len(text)
+
+    def _finish(self, references: List[str]) -> None:
+        self._write(self._processor.close())
+        self.references = list(references)
+        self._file.write("\n\n---\n\n## 参考文献\n\n")
+        for ref in self.references:
+            self._file.write(f"{ref}\n")
+        self._file.close()
+        self.part_path.replace(self.path)
+        self.done = True
@@ -0,0 +1,14 @@
+"""Agent 池路由（分布式模式下同一角色拆分为多个 worker 进程）"""
+import zlib
+
+
+def pool_topic(base: str, index: int, pool_size: int) -> str:
+    """池中第 index 个成员订阅的主题类型（池大小为 1 时即原主题）"""
+    return base if pool_size <= 1 else f"{base}-{index}"
+
+
+def shard_topic(base: str, key: str, pool_size: int) -> str:
+    """按键稳定分片到池成员（同一论文总是发往同一成员）"""
+    if pool_size <= 1:
+        return base
+    return pool_topic(base, zlib.crc32(key.encode("utf-8")) % pool_size, pool_size)
@@ -0,0 +1,122 @@
+"""章节复用缓存（增量重新生成）
+
+WriterAgent 为每个章节计算输入指纹（渲染后的提示词、装入上下文的片段 ID/内容哈希、引用的论文 ID、
+章节目录项、模型与提示词版本），以指纹为键保存审校后的章节正文与引用；再次运行同一主题时，
+指纹未变的章节直接复用，只有受新论文或分析变化影响的章节重新调用模型。章节前置规划同样按
+（模型、章节、规划提示词）缓存。
+
+缓存按配置自动清理：进程内首次写入时及此后每 prune_every 次写入，删除超过 section_cache_ttl_hours
+未写入或复用的记录，并在记录数超过 section_cache_max_entries 时删除最久未使用的记录（复用时刷新修改时间）。
+"""
+from pathlib import Path
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import threading
+import time
+from loguru import logger
+
+from config.settings import settings
+
+
+def fingerprint(**components: Any) -> str:
+    """对输入组成部分计算稳定指纹"""
+    raw = json.dumps(components, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def snippet_digest(snippet) -> Dict[str, str]:
+    """上下文片段的指纹组成：来源与内容哈希；前文章节的 ID 含 run_id，每次运行都不同，不计入"""
+    digest = {"source": snippet.source, "sha": hashlib.sha256(snippet.text.encode("utf-8")).hexdigest()[:16]}
+    if snippet.source != "prev":
+        digest["id"] = snippet.id
+    return digest
+
+
+class SectionCache:
+    """按指纹存取 JSON 记录（文件先写临时文件再原子重命名），写入时按时长与数量上限自动清理"""
+
+    def __init__(self, root: str, ttl_hours: float = 0.0, max_entries: int = 0, prune_every: int = 200):
+        self.root = Path(root)
+        self.ttl_hours = ttl_hours
+        self.max_entries = max_entries
+        self.prune_every = max(1, prune_every)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key[2:]}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"章节缓存读取失败，忽略: {key[:12]} - {e}")
+            return None
+        try:
+            # 刷新修改时间：按时长与数量清理时以最近一次使用为准
+            os.utime(path)
+        except OSError:
+            pass
+        return record
+
+    def put(self, key: str, record: Dict) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({**record, "created_at": time.time()}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        with self._lock:
+            self._writes += 1
+            due = (self._writes - 1) % self.prune_every == 0
+        if due and (self.ttl_hours > 0 or self.max_entries > 0):
+            self.enforce()
+
+    def enforce(self) -> int:
+        """按配置的时长与数量上限清理记录，返回删除数量"""
+        if not self.root.exists():
+            return 0
+        entries = []
+        for path in self.root.glob("*/*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        cutoff = time.time() - self.ttl_hours * 3600 if self.ttl_hours > 0 else None
+        excess = len(entries) - self.max_entries if self.max_entries > 0 else 0
+        removed = 0
+        # 按修改时间从旧到新：遇到既未过期也不超量的记录即可停止
+        for i, (mtime, path) in enumerate(entries):
+            if i >= excess and (cutoff is None or mtime >= cutoff):
+                break
+            path.unlink(missing_ok=True)
+            removed += 1
+        if removed:
+            logger.info(f"章节缓存自动清理，删除 {removed} 项，剩余 {len(entries) - removed} 项")
+        return removed
+
+    def prune(self, older_than_hours: float) -> int:
+        """删除超过指定时长未写入或复用的记录，返回删除数量"""
+        cutoff = time.time() - older_than_hours * 3600
+        removed = 0
+        if not self.root.exists():
+            return 0
+        for path in self.root.glob("*/*.json"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        logger.info(f"章节缓存清理完成，删除 {removed} 项")
+        return removed
+
+
+# 全局章节缓存
+section_cache = SectionCache(
+    settings.section_cache_dir,
+    ttl_hours=settings.section_cache_ttl_hours,
+    max_entries=settings.section_cache_max_entries,
+)
@@ -0,0 +1,117 @@
+"""跨进程消息序列化（分布式运行时使用）
+
+autogen 自带的 DataclassJsonMessageSerializer 不支持嵌套 dataclass（如 GradeBatchData.grades），
+也不支持 Optional 字段。这里按字段类型注解递归还原嵌套结构，并为 message_types 中的全部消息注册序列化器。
+
+编码默认使用 msgpack（首字节为 0x01 标记），接收方同时兼容 JSON 载荷；
+gRPC 运行时只识别 JSON/Protobuf 两种内容类型，而 JSON 类型的载荷按原始字节透传，因此沿用 JSON 内容类型注册。
+"""
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, List, Optional, Type, Union, get_args, get_origin, get_type_hints
+import inspect
+import json
+
+from config.settings import settings
+from utils import message_types
+
+JSON_CONTENT_TYPE = "application/json"
+_MSGPACK_MARKER = b"\x01"
+
+
+def _msgpack():
+    """延迟导入 msgpack，未安装时返回 None"""
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+
+def _to_jsonable(value: Any) -> Any:
+    if is_dataclass(value) and not isinstance(value, type):
+        return {f.name: _to_jsonable(getattr(value, f.name)) for f in fields(value)}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items()}
+    return value
+
+
+def _from_jsonable(tp: Any, value: Any) -> Any:
+    """按类型注解还原值（支持嵌套 dataclass、List、Dict、Optional）"""
+    if value is None:
+        return None
+    origin = get_origin(tp)
+    if origin is Union:
+        args = [a for a in get_args(tp) if a is not type(None)]
+        return _from_jsonable(args[0], value) if len(args) == 1 else value
+    if origin in (list, List):
+        (item_tp,) = get_args(tp) or (Any,)
+        return [_from_jsonable(item_tp, v) for v in value]
+    if origin in (dict, Dict):
+        args = get_args(tp)
+        val_tp = args[1] if len(args) == 2 else Any
+        return {k: _from_jsonable(val_tp, v) for k, v in value.items()}
+    if inspect.isclass(tp) and is_dataclass(tp):
+        return dataclass_from_dict(tp, value)
+    return value
+
+
+def dataclass_from_dict(cls: Type, data: Dict) -> Any:
+    hints = get_type_hints(cls)
+    kwargs = {f.name: _from_jsonable(hints.get(f.name, Any), data[f.name]) for f in fields(cls) if f.name in data}
+    return cls(**kwargs)
+
+
+class DataclassMessageSerializer:
+    """嵌套 dataclass 的 msgpack/JSON 序列化器（实现 autogen_core.MessageSerializer 协议）"""
+
+    def __init__(self, cls: Type, binary: Optional[bool] = None):
+        if not is_dataclass(cls):
+            raise TypeError(f"{cls!r} 不是 dataclass")
+        self.cls = cls
+        if binary is None:
+            binary = settings.message_serialization == "msgpack"
+        self._msgpack = _msgpack() if binary else None
+
+    @property
+    def data_content_type(self) -> str:
+        return JSON_CONTENT_TYPE
+
+    @property
+    def type_name(self) -> str:
+        # 与 autogen 默认序列化器保持一致，注册后会覆盖默认实现
+        return self.cls.__name__
+
+    def serialize(self, message: Any) -> bytes:
+        data = _to_jsonable(message)
+        if self._msgpack is not None:
+            return _MSGPACK_MARKER + self._msgpack.packb(data, use_bin_type=True)
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def deserialize(self, payload: bytes) -> Any:
+        if payload[:1] == _MSGPACK_MARKER:
+            msgpack = self._msgpack or _msgpack()
+            if msgpack is None:
+                raise RuntimeError("收到 msgpack 编码的消息，但本进程未安装 msgpack")
+            data = msgpack.unpackb(payload[1:], raw=False)
+        else:
+            data = json.loads(payload.decode("utf-8"))
+        return dataclass_from_dict(self.cls, data)
+
+
+def message_classes() -> List[Type]:
+    """message_types 模块中定义的全部消息类型"""
+    return [
+        obj for _, obj in inspect.getmembers(message_types, inspect.isclass)
+        if is_dataclass(obj) and obj.__module__ == message_types.__name__
+    ]
+
+
+def register_message_serializers(runtime) -> None:
+    """为运行时注册全部消息类型的序列化器
+
+    需在 Agent 注册之后调用：Agent 注册时会写入 autogen 默认序列化器，这里按同一类型名覆盖。
+    发布方进程即使没有处理某类消息的 Agent，也需要对应序列化器才能把消息发往其它 worker。
+    """
+    runtime.add_message_serializer([DataclassMessageSerializer(cls) for cls in message_classes()])
@@ -0,0 +1,424 @@
+"""运行追踪与延迟指标
+
+- span：Agent 消息处理、模型调用、嵌入编码与 Chroma 操作各记录一个 span，
+  以 OTLP JSON（ExportTraceServiceRequest）逐行写入 ./logs/traces，可直接被 OpenTelemetry Collector
+  的 otlpjsonfile 接收器读取；
+- 指标：按 span 名统计延迟直方图，按 Agent 汇总模型 RequestUsage token 数，并记录消息排队等待时间；
+- 运行清单：每次运行结束在报告旁写出 *.manifest.json（阶段耗时、token、论文计数与关键配置）。
+
+运行键（即 Agent 实例键 source）与当前 Agent 通过 contextvars 传递，线程池中执行的同步调用同样可归属到运行。
+"""
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from loguru import logger
+
+from config.settings import settings
+
+# 直方图桶上界（毫秒）
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+
+_current_run: ContextVar[Optional[str]] = ContextVar("trace_run", default=None)
+_current_agent: ContextVar[Optional[str]] = ContextVar("trace_agent", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = ""
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: str = ""
+
+    def set(self, **attrs) -> None:
+        self.attributes.update(attrs)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attr(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attr(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        v = {"boolValue": value}
+    elif isinstance(value, int):
+        v = {"intValue": str(value)}
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+class Histogram:
+    """固定桶延迟直方图"""
+
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+        self.min = min(self.min, value_ms)
+        self.max = max(self.max, value_ms)
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return float(self.buckets[i]) if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "min_ms": round(self.min, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "mean_ms": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "buckets_ms": self.buckets,
+            "bucket_counts": self.counts,
+        }
+
+
+class _RunStats:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started = time.time()
+        self.histograms: Dict[str, Histogram] = defaultdict(Histogram)
+        self.tokens: Dict[str, Dict[str, int]] = defaultdict(lambda: {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0})
+
+
+class Tracer:
+    """进程内追踪器：记录 span、延迟直方图与 token 用量"""
+
+    def __init__(self, out_dir: str, flush_every: int = 200):
+        self.out_dir = Path(out_dir)
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending: List[Span] = []
+        self._runs: Dict[str, _RunStats] = {}
+        # 已结束的运行键 → trace_id：结束后才完成的 span 不再重建统计，但仍归入原 trace
+        self._ended: "OrderedDict[str, str]" = OrderedDict()
+        self.histograms: Dict[str, Histogram] = defaultdict(Histogram)
+        # message_id → 入队时间（用于统计排队等待）
+        self._enqueued: "OrderedDict[str, float]" = OrderedDict()
+        atexit.register(self.flush)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.tracing_enabled
+
+    def _run_stats(self, run_key: Optional[str]) -> Optional[_RunStats]:
+        if not run_key or run_key in self._ended:
+            return None
+        stats = self._runs.get(run_key)
+        if stats is None:
+            stats = self._runs[run_key] = _RunStats(os.urandom(16).hex())
+        return stats
+
+    def observe(self, name: str, value_ms: float, run_key: Optional[str] = None) -> None:
+        with self._lock:
+            self.histograms[name].observe(value_ms)
+            stats = self._run_stats(run_key or _current_run.get())
+            if stats is not None:
+                stats.histograms[name].observe(value_ms)
+
+    def record_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        agent = _current_agent.get() or "unknown"
+        with self._lock:
+            stats = self._run_stats(_current_run.get())
+            if stats is None:
+                return
+            usage = stats.tokens[agent]
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            usage["calls"] += 1
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """记录一个 span（未启用追踪时直接执行）"""
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        run_key = _current_run.get()
+        with self._lock:
+            stats = self._run_stats(run_key)
+            run_trace = stats.trace_id if stats else (self._ended.get(run_key) if run_key else None)
+        trace_id = parent.trace_id if parent else (run_trace or os.urandom(16).hex())
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else "",
+            start_ns=time.time_ns(),
+            attributes=dict(attributes),
+        )
+        if run_key:
+            span.attributes.setdefault("run.key", run_key)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            _current_span.reset(token)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            span.end_ns = time.time_ns()
+            self.observe(name, elapsed_ms, run_key)
+            self._export(span)
+
+    def _export(self, span: Span) -> None:
+        with self._lock:
+            self._pending.append(span)
+            should_flush = len(self._pending) >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """把缓冲的 span 追加写入当天的 OTLP JSON 文件"""
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if not spans:
+            return
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    _otlp_attr("service.name", "paper-research-agent"),
+                    _otlp_attr("process.pid", os.getpid()),
+                ]},
+                "scopeSpans": [{"scope": {"name": "utils.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+            }]
+        }
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            path = self.out_dir / f"traces_{datetime.now().strftime('%Y%m%d')}.jsonl"
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"写入追踪文件失败: {e}")
+
+    # ---------- 排队等待 ----------
+
+    def mark_enqueued(self, message_id: str) -> None:
+        with self._lock:
+            self._enqueued[message_id] = time.perf_counter()
+            while len(self._enqueued) > 10000:
+                self._enqueued.popitem(last=False)
+
+    def queue_wait_ms(self, message_id: Optional[str]) -> Optional[float]:
+        if not message_id:
+            return None
+        with self._lock:
+            t = self._enqueued.get(message_id)
+        return None if t is None else (time.perf_counter() - t) * 1000
+
+    # ---------- 运行清单 ----------
+
+    def run_summary(self, run_key: str) -> dict:
+        with self._lock:
+            stats = self._runs.get(run_key)
+            if stats is None:
+                return {}
+            tokens = {k: dict(v) for k, v in stats.tokens.items()}
+            total = {
+                "prompt_tokens": sum(v["prompt_tokens"] for v in tokens.values()),
+                "completion_tokens": sum(v["completion_tokens"] for v in tokens.values()),
+                "calls": sum(v["calls"] for v in tokens.values()),
+            }
+            return {
+                "trace_id": stats.trace_id,
+                "started_at": datetime.fromtimestamp(stats.started).isoformat(timespec="seconds"),
+                "elapsed_s": round(time.time() - stats.started, 3),
+                "latency": {name: h.to_dict() for name, h in sorted(stats.histograms.items())},
+                "tokens": {"by_agent": tokens, "total": total},
+            }
+
+    def begin_run(self, run_key: str) -> None:
+        """开始（或重新开始）一次运行：运行键被复用时重新累计统计"""
+        with self._lock:
+            self._ended.pop(run_key, None)
+
+    def end_run(self, run_key: str) -> None:
+        """释放运行的统计数据并落盘剩余 span；此后迟到的 span 只计入全局直方图"""
+        with self._lock:
+            stats = self._runs.pop(run_key, None)
+            self._ended[run_key] = stats.trace_id if stats else ""
+            self._ended.move_to_end(run_key)
+            while len(self._ended) > 10000:
+                self._ended.popitem(last=False)
+        self.flush()
+
+
+# 全局追踪器
+tracer = Tracer(settings.tracing_dir)
+
+
+def traced_handler(func: Callable) -> Callable:
+    """包装 Agent 消息处理函数（置于 @message_handler 之下）
+
+    设置运行键/当前 Agent 上下文，记录处理耗时与排队等待时间。
+    """
+    @functools.wraps(func)
+    async def wrapper(self, message, ctx):
+        if not settings.tracing_enabled:
+            return await func(self, message, ctx)
+        run_token = _current_run.set(self.id.key)
+        agent_token = _current_agent.set(self.id.type)
+        try:
+            wait_ms = tracer.queue_wait_ms(getattr(ctx, "message_id", None))
+            if wait_ms is not None:
+                tracer.observe(f"queue_wait.{self.id.type}", wait_ms)
+            name = f"handler.{self.id.type}.{func.__name__}"
+            start = time.perf_counter()
+            with tracer.span(name, **{"agent.type": self.id.type, "message.type": type(message).__name__}) as span:
+                if wait_ms is not None:
+                    span.set(**{"queue.wait_ms": round(wait_ms, 3)})
+                result = await func(self, message, ctx)
+            logger.debug(
+                f"{name} 耗时 {(time.perf_counter() - start) * 1000:.0f}ms"
+                + (f"，排队 {wait_ms:.0f}ms" if wait_ms is not None else "")
+            )
+            return result
+        finally:
+            _current_agent.reset(agent_token)
+            _current_run.reset(run_token)
+    return wrapper
+
+
+def traced(name: str, size_arg: Optional[str] = None) -> Callable:
+    """包装同步方法（嵌入编码、Chroma 操作等），size_arg 指定记录长度的参数名"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not settings.tracing_enabled:
+                return func(*args, **kwargs)
+            attrs = {}
+            if size_arg:
+                value = kwargs.get(size_arg)
+                if value is None:
+                    names = func.__code__.co_varnames[:func.__code__.co_argcount]
+                    if size_arg in names and names.index(size_arg) < len(args):
+                        value = args[names.index(size_arg)]
+                if value is not None and hasattr(value, "__len__"):
+                    attrs["batch.size"] = len(value)
+            with tracer.span(name, **attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracedModelClient:
+    """模型客户端代理：记录每次 create/create_stream 的耗时与 RequestUsage"""
+
+    def __init__(self, inner):
+        self._inner = inner
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def _record(self, span, result) -> None:
+        usage = getattr(result, "usage", None)
+        if usage is None:
+            return
+        tracer.record_usage(usage.prompt_tokens, usage.completion_tokens)
+        if span is not None:
+            span.set(**{
+                "llm.prompt_tokens": usage.prompt_tokens,
+                "llm.completion_tokens": usage.completion_tokens,
+            })
+
+    async def create(self, *args, **kwargs):
+        with tracer.span("llm.create", **{"llm.model": settings.model_name}) as span:
+            result = await self._inner.create(*args, **kwargs)
+            self._record(span, result)
+            return result
+
+    async def create_stream(self, *args, **kwargs):
+        with tracer.span("llm.create_stream", **{"llm.model": settings.model_name}) as span:
+            async for item in self._inner.create_stream(*args, **kwargs):
+                if not isinstance(item, str):
+                    self._record(span, item)
+                yield item
+
+
+def create_traced_runtime():
+    """创建记录消息发布时间的单线程运行时（处理方据 message_id 计算排队等待）"""
+    import uuid
+    from autogen_core import SingleThreadedAgentRuntime
+
+    class _TracedRuntime(SingleThreadedAgentRuntime):
+        async def publish_message(self, message, topic_id, *, sender=None, cancellation_token=None, message_id=None):
+            message_id = message_id or str(uuid.uuid4())
+            tracer.mark_enqueued(message_id)
+            await super().publish_message(
+                message, topic_id, sender=sender, cancellation_token=cancellation_token, message_id=message_id
+            )
+
+    return _TracedRuntime()
+
+
+def write_run_manifest(run_key: str, report_path: Path, **extra) -> Path:
+    """在报告旁写出运行清单（JSON），并结束该运行的统计"""
+    manifest = {
+        "run_key": run_key,
+        "report": str(report_path),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        **extra,
+        **tracer.run_summary(run_key),
+        "config": {
+            "model_name": settings.model_name,
+            "embedding_model": settings.embedding_model,
+            "embedding_backend": settings.embedding_backend,
+            "chroma_partition_mode": settings.chroma_partition_mode,
+            "max_papers": settings.max_papers,
+            "writer_use_section_flow": settings.writer_use_section_flow,
+            "review_mode": settings.effective_review_mode(),
+        },
+    }
+    path = report_path.with_suffix(".manifest.json")
+    path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tracer.end_run(run_key)
+    return path
@@ -0,0 +1,110 @@
+"""无交互批量运行：多个主题共享同一个预热进程"""
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import asyncio
+import json
+import time
+from loguru import logger
+
+from workflows.sequential_workflow import ResearchWorkflow
+
+
+@dataclass
+class BatchJob:
+    """批量任务中的单个主题"""
+    topic: str
+    max_papers: Optional[int] = None  # 覆盖 settings.max_papers
+    section_outline: Optional[List[str]] = None  # 覆盖 settings.section_outline
+
+
+def load_jobs(path: str) -> List[BatchJob]:
+    """读取主题文件
+
+    支持三种格式：
+    - .json：[{"topic": ..., "max_papers": ..., "section_outline": [...]}, ...]
+    - .jsonl：每行一个上述对象
+    - 其它：每行一个主题，# 开头为注释
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        items = json.loads(text)
+    elif path.endswith(".jsonl"):
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        items = [
+            {"topic": line.strip()}
+            for line in text.splitlines()
+            if line.strip() and not line.strip().startswith("#")
+        ]
+    jobs = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"topic": item}
+        jobs.append(BatchJob(
+            topic=item["topic"],
+            max_papers=item.get("max_papers"),
+            section_outline=item.get("section_outline"),
+        ))
+    return jobs
+
+
+async def run_batch(
+    workflow: ResearchWorkflow,
+    jobs: List[BatchJob],
+    concurrency: int = 2,
+    timeout: Optional[float] = None
+) -> List[Dict]:
+    """以受限并发执行全部主题，返回每个主题的状态与耗时"""
+    sem = asyncio.Semaphore(max(1, concurrency))
+    batch_start = time.perf_counter()
+
+    async def _one(idx: int, job: BatchJob) -> Dict:
+        async with sem:
+            started = time.perf_counter()
+            record = {
+                "index": idx,
+                **asdict(job),
+                "status": "ok",
+                "report": None,
+                "error": None,
+                "queued_s": round(started - batch_start, 3),
+            }
+            try:
+                path = await workflow.run_topic(
+                    job.topic,
+                    max_papers=job.max_papers,
+                    sections=job.section_outline,
+                    source=f"batch-{idx}",
+                    timeout=timeout,
+                )
+                record["report"] = str(path)
+            except asyncio.TimeoutError:
+                record["status"] = "timeout"
+                logger.error(f"主题超时: {job.topic}")
+            except Exception as e:
+                record["status"] = "failed"
+                record["error"] = str(e)
+                logger.exception(f"主题失败: {job.topic} - {e}")
+            record["elapsed_s"] = round(time.perf_counter() - started, 3)
+            logger.info(f"[{idx + 1}/{len(jobs)}] {job.topic}: {record['status']} ({record['elapsed_s']}s)")
+            return record
+
+    return list(await asyncio.gather(*(_one(i, j) for i, j in enumerate(jobs))))
+
+
+def write_summary(results: List[Dict], out_dir: str = "./cache/reports") -> Path:
+    """写出批量运行汇总（JSON）"""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    path = out / f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    summary = {
+        "total": len(results),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "timeout": sum(1 for r in results if r["status"] == "timeout"),
+        "results": results,
+    }
+    path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
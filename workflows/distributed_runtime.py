@@ -0,0 +1,256 @@
+"""分布式运行时：基于 autogen gRPC host/worker 将 Agent 拆分到多个进程（可跨机器）
+
+进程划分：
+- host：gRPC 消息路由中心；
+- worker（summarizer/analyzer）：各自加载嵌入模型与模型客户端，可按池大小启动多个，论文按 ID 分片；
+- 协调进程：Collector/Grader/Writer/Assembler/Coordinator，负责提交主题并等待报告。
+所有进程通过 Chroma 服务端（CHROMA_SERVER_HOST/PORT）共享同一知识库。
+
+用法：
+    python -m workflows.distributed_runtime host [--address localhost:50051]
+    python -m workflows.distributed_runtime worker --role summarizer --index 0
+    python -m workflows.distributed_runtime run --topic "multi-agent systems"
+    python -m workflows.distributed_runtime local --topic "multi-agent systems" --summarizers 2 --analyzers 2
+"""
+from pathlib import Path
+from typing import List, Optional
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from autogen_core import TypeSubscription
+from loguru import logger
+
+from agents.analyzer_agent import AnalyzerAgent
+from agents.summarizer_agent import SummarizerAgent
+from config.settings import settings
+from utils.failures import guarded_factory
+from utils.logger import setup_logger
+from utils.routing import pool_topic
+from utils.serialization import register_message_serializers
+from workflows.sequential_workflow import ResearchWorkflow
+
+# 协调进程负责的 Agent 类型
+COORDINATOR_AGENTS = ("CollectorAgent", "GraderAgent", "WriterAgent", "AssemblerAgent", "CoordinatorAgent")
+WORKER_ROLES = {"summarizer": "SummarizerAgent", "analyzer": "AnalyzerAgent"}
+
+
+def _grpc_worker_runtime(host_address: str):
+    # 延迟导入：仅分布式模式需要 grpc 依赖
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+    return GrpcWorkerAgentRuntime(host_address=host_address)
+
+
+class DistributedResearchWorkflow(ResearchWorkflow):
+    """协调进程：注册除 Summarizer/Analyzer 以外的 Agent，接口与 ResearchWorkflow 一致"""
+
+    def __init__(self, host_address: Optional[str] = None):
+        super().__init__(
+            runtime=_grpc_worker_runtime(host_address or settings.distributed_host_address),
+            agent_types=COORDINATOR_AGENTS,
+            summarizer_pool=settings.distributed_summarizer_workers,
+        )
+
+    async def _start_runtime(self) -> None:
+        await self.runtime.start()
+
+    async def setup(self, topic: str = ""):
+        await super().setup(topic)
+        register_message_serializers(self.runtime)
+
+    async def stop(self) -> None:
+        if self._started:
+            await self.runtime.stop()
+            self._started = False
+        self.shutdown()
+
+    async def run(self, topic: str):
+        """执行单个主题并断开与 host 的连接（gRPC 运行时无法感知全局空闲）"""
+        try:
+            await self.run_topic(topic, timeout=settings.batch_topic_timeout_s)
+        finally:
+            await self.stop()
+
+
+class AgentWorker(ResearchWorkflow):
+    """worker 进程：只注册一个池成员（SummarizerAgent-i / AnalyzerAgent-i），服务由本进程独立加载"""
+
+    def __init__(self, role: str, index: int = 0, host_address: Optional[str] = None):
+        if role not in WORKER_ROLES:
+            raise ValueError(f"未知的 worker 角色: {role}")
+        super().__init__(
+            runtime=_grpc_worker_runtime(host_address or settings.distributed_host_address),
+            agent_types=(),
+            analyzer_pool=settings.distributed_analyzer_workers,
+        )
+        self.role = role
+        self.index = index
+
+    async def _start_runtime(self) -> None:
+        await self.runtime.start()
+
+    async def setup(self, topic: str = ""):
+        if self._registered:
+            return
+        base = WORKER_ROLES[self.role]
+        pool_size = (
+            settings.distributed_summarizer_workers if self.role == "summarizer"
+            else settings.distributed_analyzer_workers
+        )
+        # 类型名与订阅主题相同，host 按类型把消息路由到本进程
+        name = pool_topic(base, self.index, pool_size)
+        if self.role == "summarizer":
+            async def factory() -> SummarizerAgent:
+                model, chroma, embedding = await self.services("model_client", "chroma_manager", "embedding_service")
+                return SummarizerAgent(model, chroma, embedding, analyzer_pool=self._analyzer_pool)
+            await SummarizerAgent.register(self.runtime, type=name, factory=guarded_factory("summarize", factory), skip_class_subscriptions=True)
+        else:
+            async def factory() -> AnalyzerAgent:
+                model, chroma, embedding = await self.services("model_client", "chroma_manager", "embedding_service")
+                return AnalyzerAgent(model, chroma, embedding)
+            await AnalyzerAgent.register(self.runtime, type=name, factory=guarded_factory("analyze", factory), skip_class_subscriptions=True)
+        await self.runtime.add_subscription(TypeSubscription(topic_type=name, agent_type=name))
+        register_message_serializers(self.runtime)
+        self._registered = True
+        logger.success(f"worker 已注册: {name}")
+
+    async def serve(self, ready_file: Optional[str] = None) -> None:
+        """注册后持续服务，直到收到 SIGINT/SIGTERM"""
+        await self._ensure_started()
+        if ready_file:
+            Path(ready_file).touch()
+        await self.runtime.stop_when_signal()
+        self.shutdown()
+
+
+async def run_host(address: str) -> None:
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost
+
+    host = GrpcWorkerAgentRuntimeHost(address=address)
+    host.start()
+    logger.success(f"gRPC host 已启动: {address}")
+    await host.stop_when_signal()
+
+
+def _wait_port(host: str, port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"等待端口超时: {host}:{port}")
+            time.sleep(0.2)
+
+
+def _wait_files(paths: List[Path], procs: List[subprocess.Popen], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not all(p.exists() for p in paths):
+        dead = [p for p in procs if p.poll() is not None]
+        if dead:
+            raise RuntimeError(f"worker 进程异常退出: {[p.args for p in dead]}")
+        if time.monotonic() >= deadline:
+            raise TimeoutError("等待 worker 注册超时")
+        time.sleep(0.2)
+
+
+def launch_local(topic: str, summarizers: int, analyzers: int, address: str, chroma_port: int) -> None:
+    """单机多进程：按需启动 Chroma 服务端、host 与全部 worker，本进程作为协调进程运行主题"""
+    procs: List[subprocess.Popen] = []
+    env = dict(os.environ)
+    if not settings.chroma_server_host:
+        procs.append(subprocess.Popen([
+            sys.executable, "-c", "from chromadb.cli.cli import app; app()",
+            "run", "--path", settings.chroma_persist_dir, "--port", str(chroma_port)
+        ]))
+        settings.chroma_server_host, settings.chroma_server_port = "localhost", chroma_port
+    settings.distributed_host_address = address
+    settings.distributed_summarizer_workers = summarizers
+    settings.distributed_analyzer_workers = analyzers
+    # 大块内容经共享的内容存储目录传递，消息只携带引用
+    settings.message_by_reference = True
+    env.update({
+        "CHROMA_SERVER_HOST": settings.chroma_server_host,
+        "CHROMA_SERVER_PORT": str(settings.chroma_server_port),
+        "DISTRIBUTED_HOST_ADDRESS": address,
+        "DISTRIBUTED_SUMMARIZER_WORKERS": str(summarizers),
+        "DISTRIBUTED_ANALYZER_WORKERS": str(analyzers),
+        "MESSAGE_BY_REFERENCE": "true",
+    })
+    module = [sys.executable, "-m", "workflows.distributed_runtime"]
+    try:
+        procs.append(subprocess.Popen(module + ["host", "--address", address], env=env))
+        host_name, _, port = address.rpartition(":")
+        _wait_port(host_name or "localhost", int(port))
+        _wait_port(settings.chroma_server_host, settings.chroma_server_port)
+
+        ready_dir = Path(tempfile.mkdtemp(prefix="workers-"))
+        ready_files = []
+        workers = []
+        for role, count in (("summarizer", summarizers), ("analyzer", analyzers)):
+            for i in range(count):
+                ready = ready_dir / f"{role}-{i}"
+                ready_files.append(ready)
+                workers.append(subprocess.Popen(
+                    module + ["worker", "--role", role, "--index", str(i), "--ready-file", str(ready)], env=env
+                ))
+        procs.extend(workers)
+        _wait_files(ready_files, workers, timeout=300)
+        logger.success(f"本地分布式环境就绪：摘要 worker {summarizers} 个，分析 worker {analyzers} 个")
+
+        asyncio.run(DistributedResearchWorkflow(address).run(topic))
+    finally:
+        for p in reversed(procs):
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="分布式运行时")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_host = sub.add_parser("host", help="启动 gRPC host")
+    p_host.add_argument("--address", default=settings.distributed_host_address)
+
+    p_worker = sub.add_parser("worker", help="启动 Summarizer/Analyzer worker")
+    p_worker.add_argument("--role", choices=sorted(WORKER_ROLES), required=True)
+    p_worker.add_argument("--index", type=int, default=0, help="池内序号（0 起）")
+    p_worker.add_argument("--host-address", default=settings.distributed_host_address)
+    p_worker.add_argument("--ready-file", default=None, help="注册完成后创建该文件（供启动脚本等待）")
+
+    p_run = sub.add_parser("run", help="作为协调进程运行单个主题")
+    p_run.add_argument("--topic", required=True)
+    p_run.add_argument("--host-address", default=settings.distributed_host_address)
+
+    p_local = sub.add_parser("local", help="单机多进程运行（自动启动 host、worker 与 Chroma 服务端）")
+    p_local.add_argument("--topic", required=True)
+    p_local.add_argument("--summarizers", type=int, default=settings.distributed_summarizer_workers)
+    p_local.add_argument("--analyzers", type=int, default=settings.distributed_analyzer_workers)
+    p_local.add_argument("--address", default=settings.distributed_host_address)
+    p_local.add_argument("--chroma-port", type=int, default=8001, help="自动启动的 Chroma 服务端端口")
+
+    args = parser.parse_args(argv)
+    setup_logger()
+
+    if args.command == "host":
+        asyncio.run(run_host(args.address))
+    elif args.command == "worker":
+        asyncio.run(AgentWorker(args.role, args.index, args.host_address).serve(args.ready_file))
+    elif args.command == "run":
+        asyncio.run(DistributedResearchWorkflow(args.host_address).run(args.topic))
+    else:
+        launch_local(args.topic, args.summarizers, args.analyzers, args.address, args.chroma_port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
 """顺序工作流编排"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import asyncio
+import uuid
 from autogen_core import SingleThreadedAgentRuntime, TopicId
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 from agents.collector_agent import CollectorAgent
 from agents.summarizer_agent import SummarizerAgent
 from agents.analyzer_agent import AnalyzerAgent
@@ -11,20 +15,102 @@ from agents.coordinator_agent import CoordinatorAgent
 from services.arxiv_service import ArxivService
 from knowledge_base.chroma_manager import ChromaManager
 from knowledge_base.embedding_service import EmbeddingService
-from utils.message_types import PaperRequest
+from utils.message_types import AbortRun, PaperRequest
+from utils.routing import pool_topic
+from utils.failures import guarded_factory
+from utils.tracing import TracedModelClient, create_traced_runtime, tracer
+from utils.cassette import CassetteArxivService, CassetteModelClient, cassette
 from config.settings import settings
 from loguru import logger
 
 
 class ResearchWorkflow:
-    """论文调研工作流"""
+    """论文调研工作流
+
+    重量级依赖（sentence_transformers/torch、chromadb、openai）均延迟加载：
+    构造函数只创建运行时，start_warmup() 在后台线程中预热嵌入模型、
+    Chroma 客户端与模型客户端；Agent 工厂为协程，首次实例化时以 await 等待对应服务就绪，
+    等待期间事件循环照常处理其它消息与进度推送。
+
+    runtime 与 agent_types 供分布式模式使用：传入 gRPC worker 运行时，并只注册本进程负责的 Agent 类型。
+    """
     
-    def __init__(self):
-        self.runtime = SingleThreadedAgentRuntime()
-        
+    def __init__(
+        self,
+        runtime=None,
+        agent_types: Optional[Iterable[str]] = None,
+        summarizer_pool: int = 1,
+        analyzer_pool: int = 1
+    ):
+        if runtime is None:
+            runtime = create_traced_runtime() if settings.tracing_enabled else SingleThreadedAgentRuntime()
+        self.runtime = runtime
+        # 本进程注册的 Agent 类型（None 表示全部）
+        self._agent_types = set(agent_types) if agent_types is not None else None
+        self._summarizer_pool = summarizer_pool
+        self._analyzer_pool = analyzer_pool
+        self.arxiv_service = ArxivService()
+        if cassette.mode != "off":
+            self.arxiv_service = CassetteArxivService(self.arxiv_service, cassette)
+        self._warmup_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="warmup")
+        self._warmups: Dict[str, Future] = {}
+        self._registered = False
+        self._started = False
+        # 运行键(source) → 等待报告完成的 Future
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def start_warmup(self) -> None:
+        """后台预热全部服务（可重复调用）"""
+        self._warmup("model_client", self._create_model_client)
+        self._warmup("embedding_service", self._create_embedding_service)
+        self._warmup("chroma_manager", self._create_chroma_manager)
+
+    def _warmup(self, name: str, factory: Callable[[], Any]) -> Future:
+        fut = self._warmups.get(name)
+        if fut is None:
+            fut = self._warmups[name] = self._warmup_pool.submit(factory)
+        return fut
+
+    async def wait_warmup(self) -> None:
+        """等待已提交的预热任务全部完成（预热失败的异常在首次使用服务时再抛出）"""
+        futures = [asyncio.wrap_future(f) for f in list(self._warmups.values())]
+        await asyncio.gather(*futures, return_exceptions=True)
+
+    def _service_future(self, name: str) -> Future:
+        factories = {
+            "model_client": self._create_model_client,
+            "embedding_service": self._create_embedding_service,
+            "chroma_manager": self._create_chroma_manager,
+        }
+        return self._warmup(name, factories[name])
+
+    async def services(self, *names: str) -> List[Any]:
+        """在事件循环中等待指定服务预热完成（不阻塞循环），按参数顺序返回"""
+        return list(await asyncio.gather(*(asyncio.wrap_future(self._service_future(n)) for n in names)))
+
+    # 以下同步属性会阻塞调用线程直到服务就绪，仅供事件循环之外使用；Agent 工厂请用 services()
+    @property
+    def model_client(self):
+        return self._service_future("model_client").result()
+
+    @property
+    def embedding_service(self) -> EmbeddingService:
+        return self._service_future("embedding_service").result()
+
+    @property
+    def chroma_manager(self) -> ChromaManager:
+        return self._service_future("chroma_manager").result()
+
+    def _create_model_client(self):
         # 初始化模型客户端
+        if cassette.replaying:
+            # 回放模式不访问网络，全部响应来自录制文件
+            logger.info("LLM客户端使用 cassette 回放")
+            client = CassetteModelClient(None, cassette)
+            return TracedModelClient(client) if settings.tracing_enabled else client
         logger.info("初始化LLM客户端")
-        self.model_client = OpenAIChatCompletionClient(
+        from autogen_ext.models.openai import OpenAIChatCompletionClient
+        client = OpenAIChatCompletionClient(
             model=settings.model_name,
             api_key=settings.api_key,
             base_url=settings.base_url,
@@ -36,95 +122,210 @@ class ResearchWorkflow:
                 "structured_output": False,
             }
         )
-        
-        # 初始化服务
-        logger.info("初始化服务")
-        self.arxiv_service = ArxivService()
-        self.embedding_service = EmbeddingService(
+        if cassette.recording:
+            client = CassetteModelClient(client, cassette)
+        return TracedModelClient(client) if settings.tracing_enabled else client
+
+    def _create_embedding_service(self) -> EmbeddingService:
+        return EmbeddingService(
             settings.embedding_model,
-            settings.embedding_cache_dir
+            settings.embedding_cache_dir,
+            backend=settings.embedding_backend,
+            onnx_quantize=settings.embedding_onnx_quantize,
+            onnx_threads=settings.embedding_onnx_threads,
+            onnx_min_cosine=settings.embedding_onnx_min_cosine
+        )
+
+    def _create_chroma_manager(self) -> ChromaManager:
+        return ChromaManager(
+            settings.chroma_persist_dir,
+            hot_cache=settings.chroma_hot_cache,
+            partition_mode=settings.chroma_partition_mode,
+            server_host=settings.chroma_server_host,
+            server_port=settings.chroma_server_port
         )
-        self.chroma_manager = ChromaManager(settings.chroma_persist_dir)
+
+    def shutdown(self) -> None:
+        """取消尚未开始的预热任务"""
+        self._warmup_pool.shutdown(wait=False, cancel_futures=True)
     
-    async def setup(self, topic: str):
-        """注册所有Agent"""
+    def _hosts(self, agent_type: str) -> bool:
+        """本进程是否负责该 Agent 类型"""
+        return self._agent_types is None or agent_type in self._agent_types
+
+    async def setup(self, topic: str = ""):
+        """注册本进程负责的 Agent（同一进程内仅注册一次，多主题共享）"""
+        if self._registered:
+            return
         logger.info("注册Agent...")
+
+        # 依赖服务的 Agent 使用协程工厂：运行时 await 工厂结果，服务预热期间不阻塞事件循环；
+        # 服务预热失败导致构造失败时由 guarded_factory 上报 Coordinator，而非静默丢弃消息
+        async def _summarizer() -> SummarizerAgent:
+            model, chroma, embedding = await self.services("model_client", "chroma_manager", "embedding_service")
+            return SummarizerAgent(model, chroma, embedding, analyzer_pool=self._analyzer_pool)
+
+        async def _analyzer() -> AnalyzerAgent:
+            model, chroma, embedding = await self.services("model_client", "chroma_manager", "embedding_service")
+            return AnalyzerAgent(model, chroma, embedding)
+
+        async def _writer() -> WriterAgent:
+            model, chroma, embedding = await self.services("model_client", "chroma_manager", "embedding_service")
+            return WriterAgent(model, topic, chroma, embedding)
+
+        async def _assembler() -> AssemblerAgent:
+            model, = await self.services("model_client")
+            return AssemblerAgent(model)
         
         # 注册采集Agent
-        await CollectorAgent.register(
-            self.runtime,
-            type="CollectorAgent",
-            factory=lambda: CollectorAgent(self.arxiv_service)
-        )
+        if self._hosts("CollectorAgent"):
+            await CollectorAgent.register(
+                self.runtime,
+                type="CollectorAgent",
+                factory=lambda: CollectorAgent(self.arxiv_service, summarizer_pool=self._summarizer_pool)
+            )
         
         # 注册摘要Agent
-        await SummarizerAgent.register(
-            self.runtime,
-            type="SummarizerAgent",
-            factory=lambda: SummarizerAgent(self.model_client, self.chroma_manager, self.embedding_service)
-        )
+        if self._hosts("SummarizerAgent"):
+            await SummarizerAgent.register(
+                self.runtime,
+                type="SummarizerAgent",
+                factory=guarded_factory("summarize", _summarizer)
+            )
         
         # 注册分析Agent
-        await AnalyzerAgent.register(
-            self.runtime,
-            type="AnalyzerAgent",
-            factory=lambda: AnalyzerAgent(
-                self.model_client,
-                self.chroma_manager,
-                self.embedding_service
+        if self._hosts("AnalyzerAgent"):
+            await AnalyzerAgent.register(
+                self.runtime,
+                type="AnalyzerAgent",
+                factory=guarded_factory("analyze", _analyzer)
             )
-        )
         
         # 注册评级Agent
-        await GraderAgent.register(
-            self.runtime,
-            type="GraderAgent",
-            factory=lambda: GraderAgent()
-        )
+        if self._hosts("GraderAgent"):
+            await GraderAgent.register(
+                self.runtime,
+                type="GraderAgent",
+                factory=lambda: GraderAgent()
+            )
         
         # 注册撰写Agent
-        await WriterAgent.register(
-            self.runtime,
-            type="WriterAgent",
-            factory=lambda: WriterAgent(self.model_client, topic, self.chroma_manager, self.embedding_service)
-        )
+        if self._hosts("WriterAgent"):
+            await WriterAgent.register(
+                self.runtime,
+                type="WriterAgent",
+                factory=guarded_factory("write", _writer)
+            )
         
         # 注册装配Agent（注入模型用于终稿润色）
-        await AssemblerAgent.register(
-            self.runtime,
-            type="AssemblerAgent",
-            factory=lambda: AssemblerAgent(self.model_client)
-        )
+        if self._hosts("AssemblerAgent"):
+            await AssemblerAgent.register(
+                self.runtime,
+                type="AssemblerAgent",
+                factory=guarded_factory("assemble", _assembler)
+            )
         
         # 注册调度Agent
-        await CoordinatorAgent.register(
-            self.runtime,
-            type="CoordinatorAgent",
-            factory=lambda: CoordinatorAgent()
-        )
+        if self._hosts("CoordinatorAgent"):
+            await CoordinatorAgent.register(
+                self.runtime,
+                type="CoordinatorAgent",
+                factory=lambda: CoordinatorAgent(on_report=self._on_report, on_abort=self._on_abort)
+            )
         
+        self._registered = True
         logger.success("所有Agent注册完成")
-    
-    async def run(self, topic: str):
-        """执行工作流"""
-        logger.info(f"启动工作流: {topic}")
-        
-        # 设置Agent
-        await self.setup(topic)
-        
-        # 启动运行时
+
+    async def _start_runtime(self) -> None:
         self.runtime.start()
-        
-        # 发布初始任务
+
+    async def _ensure_started(self) -> None:
+        """预热服务、启动运行时并注册Agent（幂等；gRPC 运行时须先连上 host 才能注册）"""
+        self.start_warmup()
+        if not self._started:
+            await self._start_runtime()
+            self._started = True
+        await self.setup()
+
+    def _on_report(self, source: str, path: Path) -> None:
+        """CoordinatorAgent 保存报告后回调，唤醒等待该运行键的 run_topic"""
+        fut = self._pending.pop(source, None)
+        if fut is not None and not fut.done():
+            fut.set_result(path)
+
+    def _on_abort(self, source: str, reason: str) -> None:
+        """CoordinatorAgent 判定无法生成报告时回调，让等待中的 run_topic 立即失败"""
+        fut = self._pending.pop(source, None)
+        if fut is not None and not fut.done():
+            fut.set_exception(RuntimeError(reason))
+
+    async def run_topic(
+        self,
+        topic: str,
+        max_papers: Optional[int] = None,
+        sections: Optional[List[str]] = None,
+        source: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Path:
+        """在共享运行时中执行单个主题，返回报告路径
+
+        每个主题使用独立的 source 作为 Agent 实例键，因此多个主题可在同一运行时中并发执行，
+        各自拥有独立的 Coordinator/Writer/Assembler 状态，而嵌入模型、Chroma 与模型客户端共享。
+        """
+        await self._ensure_started()
+        source = source or f"job-{uuid.uuid4().hex[:8]}"
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[source] = fut
+        tracer.begin_run(source)
+        logger.info(f"提交主题: {topic} (source={source})")
         await self.runtime.publish_message(
-            PaperRequest(keyword=topic, max_count=settings.max_papers),
-            topic_id=TopicId("CollectorAgent", source="user")
+            PaperRequest(keyword=topic, max_count=max_papers or settings.max_papers, sections=sections or []),
+            topic_id=TopicId("CollectorAgent", source=source)
         )
+        try:
+            return await asyncio.wait_for(fut, timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.abort_run(source, f"超时（{timeout}s）")
+            raise
+        finally:
+            self._pending.pop(source, None)
+
+    async def abort_run(self, source: str, reason: str) -> None:
+        """中止运行键为 source 的运行：Coordinator 不再等待与保存报告，各阶段 Agent 不再开始新的工作
+
+        共享运行时中超时的主题否则会继续占用模型与审核队列，直到自然结束。
+        """
+        logger.warning(f"中止运行 {source}: {reason}")
+        topics = ["CoordinatorAgent", "CollectorAgent", "GraderAgent", "WriterAgent"]
+        topics += [pool_topic("SummarizerAgent", i, self._summarizer_pool) for i in range(self._summarizer_pool)]
+        topics += [pool_topic("AnalyzerAgent", i, self._analyzer_pool) for i in range(self._analyzer_pool)]
+        for topic_type in topics:
+            await self.runtime.publish_message(AbortRun(reason=reason), topic_id=TopicId(topic_type, source=source))
+
+    async def stop(self) -> None:
+        """等待运行时空闲后停止，并释放预热线程池"""
+        if self._started:
+            await self.runtime.stop_when_idle()
+            self._started = False
+        self.shutdown()
+    
+    async def run(self, topic: str):
+        """执行工作流：等待报告保存（或 Coordinator 判定无法生成报告）后停止运行时
+
+        与 run_topic 一样等待 Coordinator 的回调，而不是直接 stop_when_idle：
+        阶段超时计时期间队列可能暂时为空，此时停止运行时会让卡住的阶段永远得不到冲刷。
+        """
+        logger.info(f"启动工作流: {topic}")
         
-        # 等待完成
-        await self.runtime.stop_when_idle()
-        
-        # 清理资源（当前客户端无需显式关闭）
+        # 设置Agent、启动运行时并发布初始任务（服务在后台预热，与 arXiv 采集并行）
+        try:
+            await self.run_topic(topic, source="user", timeout=settings.batch_topic_timeout_s or None)
+        except RuntimeError as e:
+            logger.error(f"未生成报告: {e}")
+        except asyncio.TimeoutError:
+            # run_topic 已中止本次运行
+            logger.error(f"未生成报告: 超过 {settings.batch_topic_timeout_s}s 仍未完成")
+        finally:
+            await self.stop()
         
         logger.success("工作流执行完成")
-